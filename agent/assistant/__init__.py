@@ -4,6 +4,13 @@ Wiki Assistant Package
 This package contains the core assistant functionality for the Wiki system.
 """
 
-from .wiki_assistant import WikiAssistant
-
 __all__ = ["WikiAssistant"]
+
+
+def __getattr__(name):
+    # Resolve heavy submodules lazily so `import assistant` stays cheap
+    if name == "WikiAssistant":
+        from .wiki_assistant import WikiAssistant
+
+        return WikiAssistant
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,7 +4,7 @@ import logging
 import os
 
 from .wiki_assistant import WikiAssistant
-from .logging_utils import get_logger
+from .logging_utils import SAMPLED, get_logger
 
 
 logger = get_logger(__name__)
@@ -29,9 +29,14 @@ class A2Aagent:
             "invoke called; session_id=%s query_len=%d",
             session_id,
             len(query) if query else 0,
+            extra=SAMPLED,
+        )
+        answer = await self.assistant.answer(query, session_id)
+        logger.info(
+            "invoke completed; answer_len=%d",
+            len(answer) if answer else 0,
+            extra=SAMPLED,
         )
-        answer = await self.assistant.answer(query)
-        logger.info("invoke completed; answer_len=%d", len(answer) if answer else 0)
         return {
             "is_task_complete": True,
             "require_user_input": False,
@@ -48,6 +53,7 @@ class A2Aagent:
             "stream called; session_id=%s query_len=%d",
             session_id,
             len(query) if query else 0,
+            extra=SAMPLED,
         )
         yield {
             "is_task_complete": False,
@@ -57,7 +63,7 @@ class A2Aagent:
             "is_event": True,
         }
 
-        answer = await self.assistant.answer(query)
+        answer = await self.assistant.answer(query, session_id)
 
         yield {
             "is_task_complete": True,
@@ -2,42 +2,64 @@ from __future__ import annotations
 import os
 import logging
 
-from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
-from google.adk.tools.mcp_tool import SseConnectionParams, McpToolset
 from .logging_utils import get_logger
 
 
 logger = get_logger(__name__)
 
 
-llm_model = LiteLlm(
-    model=os.getenv("LLM_MODEL"),
-    api_base=os.getenv("LLM_API_BASE"),
-    api_key=os.getenv("LLM_API_KEY"),
-)
-
-
 def _parse_mcp_urls(raw_urls: str | None) -> list[str]:
     if not raw_urls:
         return []
     return [u.strip() for u in raw_urls.split(",") if u.strip()]
 
 
-_mcp_urls = _parse_mcp_urls(os.getenv("MCP_URL"))
-logger.info("agent.py configuring worker_agent; mcp_urls=%s", _mcp_urls)
+def _build_llm_model():
+    from google.adk.models.lite_llm import LiteLlm
+
+    return LiteLlm(
+        model=os.getenv("LLM_MODEL"),
+        api_base=os.getenv("LLM_API_BASE"),
+        api_key=os.getenv("LLM_API_KEY"),
+    )
+
+
+def _build_worker_agent():
+    from google.adk.agents import Agent
+    from google.adk.tools.mcp_tool import SseConnectionParams, McpToolset
+
+    mcp_urls = _parse_mcp_urls(os.getenv("MCP_URL"))
+    logger.info("agent.py configuring worker_agent; mcp_urls=%s", mcp_urls)
+
+    agent = Agent(
+        model=_build_llm_model(),
+        name=os.getenv("AGENT_NAME", "Wiki_Agent").replace(" ", "_"),
+        description=os.getenv(
+            "AGENT_DESCRIPTION", "Answers questions via corporate wiki using MCP"
+        ),
+        instruction=os.getenv("AGENT_SYSTEM_PROMPT", ""),
+        tools=[
+            McpToolset(connection_params=SseConnectionParams(url=url))
+            for url in mcp_urls
+        ],
+    )
+    logger.info(
+        "worker_agent initialized; name=%s", os.getenv("AGENT_NAME", "Wiki_Agent")
+    )
+    return agent
+
+
+_worker_agent = None
 
-worker_agent = Agent(
-    model=llm_model,
-    name=os.getenv("AGENT_NAME", "Wiki_Agent").replace(" ", "_"),
-    description=os.getenv(
-        "AGENT_DESCRIPTION", "Answers questions via corporate wiki using MCP"
-    ),
-    instruction=os.getenv("AGENT_SYSTEM_PROMPT"),
-    tools=[
-        McpToolset(connection_params=SseConnectionParams(url=url)) for url in _mcp_urls
-    ],
-)
-logger.info("worker_agent initialized; name=%s", os.getenv("AGENT_NAME", "Wiki_Agent"))
 
-root_agent = worker_agent
+def __getattr__(name: str):
+    # google-adk is only imported, and the agent only built, when an ADK
+    # runner asks for it; the A2A serving path never touches this module.
+    global _worker_agent
+    if name in {"root_agent", "worker_agent"}:
+        if _worker_agent is None:
+            _worker_agent = _build_worker_agent()
+        return _worker_agent
+    if name == "llm_model":
+        return __getattr__("root_agent").model
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,20 @@
+import asyncio
+from typing import Dict, Optional
+
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.tasks import TaskUpdater
 from a2a.types import (
     Task,
     TaskState,
-    UnsupportedOperationError,
 )
 from a2a.utils import (
     new_agent_text_message,
     new_task,
 )
-from a2a.utils.errors import ServerError
 from .a2a_agent import A2Aagent
-from .logging_utils import get_logger
+from .diagnostics import Diagnostics
+from .logging_utils import SAMPLED, get_logger, request_context
 
 
 logger = get_logger(__name__)
@@ -21,9 +23,12 @@ logger = get_logger(__name__)
 class MyAgentExecutor(AgentExecutor):
     """AgentExecutor implementation for our Wiki agent."""
 
-    def __init__(self):
+    def __init__(self, diagnostics: Optional[Diagnostics] = None):
         logger.info("Initializing MyAgentExecutor")
         self.agent = A2Aagent()
+        self.diagnostics = diagnostics or Diagnostics()
+        # A2A task id -> asyncio task running `execute`, so `cancel` can stop it
+        self._running_tasks: Dict[str, asyncio.Task] = {}
 
     async def execute(
         self,
@@ -32,7 +37,9 @@ class MyAgentExecutor(AgentExecutor):
     ) -> None:
         query = context.get_user_input()
         logger.info(
-            "execute called; context_id=%s", getattr(context, "context_id", None)
+            "execute called; context_id=%s",
+            getattr(context, "context_id", None),
+            extra=SAMPLED,
         )
         task = context.current_task
 
@@ -42,6 +49,24 @@ class MyAgentExecutor(AgentExecutor):
             logger.info("Created new task; task_id=%s", task.id)
         updater = TaskUpdater(event_queue, task.id, task.context_id)
 
+        running = asyncio.current_task()
+        if running is not None:
+            self._running_tasks[task.id] = running
+
+        # Tag every log line of this request with the task id
+        with request_context(task.id), self.diagnostics.profile_request(task.id):
+            try:
+                await self._consume_stream(query, task, updater)
+            except asyncio.CancelledError:
+                logger.info("Task execution cancelled; task_id=%s", task.id)
+                raise
+            finally:
+                self._running_tasks.pop(task.id, None)
+
+    async def _consume_stream(
+        self, query: str, task: Task, updater: TaskUpdater
+    ) -> None:
+        """Translate agent stream items into A2A task status updates."""
         async for item in self.agent.stream(query, task.context_id):
             is_task_complete = item["is_task_complete"]
             require_user_input = item["require_user_input"]
@@ -56,14 +81,14 @@ class MyAgentExecutor(AgentExecutor):
                 )
                 break
             if is_event:
-                logger.info("Stream event; task_id=%s", task.id)
+                logger.info("Stream event; task_id=%s", task.id, extra=SAMPLED)
                 await updater.update_status(
                     TaskState.working,
                     new_agent_text_message(item["content"], task.context_id, task.id),
                 )
                 continue
             if not is_task_complete and not require_user_input:
-                logger.info("Working update; task_id=%s", task.id)
+                logger.info("Working update; task_id=%s", task.id, extra=SAMPLED)
                 await updater.update_status(
                     TaskState.working,
                     new_agent_text_message(item["content"], task.context_id, task.id),
@@ -78,14 +103,45 @@ class MyAgentExecutor(AgentExecutor):
                 )
                 break
             if is_task_complete and not require_user_input:
-                logger.info("Task completed; task_id=%s", task.id)
+                logger.info("Task completed; task_id=%s", task.id, extra=SAMPLED)
                 await updater.update_status(
                     TaskState.completed,
                     new_agent_text_message(item["content"], task.context_id, task.id),
                 )
                 break
 
+    async def drain(self, timeout: float) -> None:
+        """Wait up to `timeout` seconds for running tasks, then cancel the rest."""
+        running = [task for task in self._running_tasks.values() if not task.done()]
+        if not running:
+            return
+        logger.info("Draining %d running tasks; timeout=%.1fs", len(running), timeout)
+        _, pending = await asyncio.wait(running, timeout=timeout)
+        if pending:
+            logger.warning(
+                "Cancelling %d tasks still running after drain", len(pending)
+            )
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
     async def cancel(
         self, request: RequestContext, event_queue: EventQueue
     ) -> Task | None:
-        raise ServerError(error=UnsupportedOperationError())
+        """Cancel a running task and publish the `canceled` state.
+
+        Cancelling the asyncio task propagates `CancelledError` into the
+        in-flight LLM completion, MCP session and httpx requests, which close
+        their connections and release their concurrency-limiter slots.
+        """
+        task_id = request.task_id
+        running = self._running_tasks.pop(task_id, None)
+        if running is not None and not running.done():
+            running.cancel()
+            logger.info("Cancelled running task; task_id=%s", task_id)
+        else:
+            logger.info("Cancel requested for idle task; task_id=%s", task_id)
+
+        updater = TaskUpdater(event_queue, task_id, request.context_id)
+        await updater.cancel()
+        return None
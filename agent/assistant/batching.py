@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .logging_utils import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+SingleFn = Callable[[str], Awaitable[str]]
+# Keywords per question, in order; None where the batch had no usable answer
+BatchFn = Callable[[List[str]], Awaitable[List[Optional[str]]]]
+
+
+def parse_batch_keywords(content: str, count: int) -> List[Optional[str]]:
+    """
+    Parse the `{"1": "...", "2": "..."}` answer to `KEYWORD_BATCH_TEMPLATE`.
+
+    Returns one entry per question; missing or empty answers are None.
+
+    Raises:
+        ValueError: If the content is not a JSON object
+    """
+    text = (content or "").strip()
+    if text.startswith("```"):
+        # Some models wrap JSON in a fenced block despite the instructions
+        text = text.strip("`").removeprefix("json").strip()
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Batch keyword answer is not a JSON object")
+    results: List[Optional[str]] = []
+    for number in range(1, count + 1):
+        value = data.get(str(number))
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        results.append(
+            value.strip() if isinstance(value, str) and value.strip() else None
+        )
+    return results
+
+
+class KeywordBatcher:
+    """
+    Extract keywords for concurrent questions with one LLM call.
+
+    Questions that arrive within `window` seconds of the first pending one
+    (or until `max_batch` are pending) are sent together through `batch_fn`
+    and the answers are handed back to the waiting callers. Questions the
+    batch answer does not cover, or all of them when the call or its
+    parsing fails, fall back to one `single_fn` call each. A batch holding a
+    single distinct question goes straight to `single_fn`.
+
+    With `window` 0 (the default from the environment) every call goes to
+    `single_fn` directly.
+    """
+
+    def __init__(
+        self,
+        single_fn: SingleFn,
+        batch_fn: BatchFn,
+        window: float = 0.005,
+        max_batch: int = 16,
+    ):
+        """
+        Args:
+            single_fn (SingleFn): Keyword extraction for one question
+            batch_fn (BatchFn): Keyword extraction for several questions
+            window (float): Seconds to wait for more questions; 0 disables batching
+            max_batch (int): Flush as soon as this many questions are pending
+        """
+        self._single_fn = single_fn
+        self._batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, single_fn: SingleFn, batch_fn: BatchFn) -> "KeywordBatcher":
+        return cls(
+            single_fn,
+            batch_fn,
+            window=float(os.getenv("KEYWORD_BATCH_WINDOW_MS", "0")) / 1000.0,
+            max_batch=int(os.getenv("KEYWORD_BATCH_MAX", "16")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    async def __call__(self, question: str) -> str:
+        if not self.enabled:
+            return await self._single_fn(question)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((question, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        try:
+            await self._answer(batch)
+        finally:
+            # Cancelled (e.g. on shutdown) or failed before answering everyone
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Keyword batch did not finish"))
+
+    async def _answer(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        metrics.inc(
+            "keywords.batch.wait_ms",
+            int(sum(started - queued for _, _, queued in batch) * 1000),
+        )
+        # Identical questions in one window share an answer
+        questions = list(dict.fromkeys(question for question, _, _ in batch))
+        results: Dict[str, object] = {}
+
+        if len(questions) > 1:
+            metrics.inc("keywords.batches")
+            metrics.inc("keywords.batched_questions", len(batch))
+            metrics.inc(f"keywords.batch_size.{len(questions)}")
+            try:
+                answers = await self._batch_fn(questions)
+                if len(answers) != len(questions):
+                    raise ValueError("Batch keyword answer has the wrong length")
+                results.update(
+                    (q, a) for q, a in zip(questions, answers) if a is not None
+                )
+            except Exception:
+                logger.warning("Batch keyword extraction failed", exc_info=True)
+
+        missing = [q for q in questions if q not in results]
+        if len(questions) > 1 and missing:
+            metrics.inc("keywords.batch.fallbacks", len(missing))
+        if missing:
+            answers = await asyncio.gather(
+                *(self._single_fn(q) for q in missing), return_exceptions=True
+            )
+            results.update(zip(missing, answers))
+
+        calls = (1 if len(questions) > 1 else 0) + len(missing)
+        if len(batch) > calls:
+            metrics.inc("llm.calls_saved", len(batch) - calls)
+        logger.debug("Keyword batch done; questions=%d llm_calls=%d", len(batch), calls)
+
+        for question, future, _ in batch:
+            if future.done():
+                # The caller was cancelled while waiting
+                continue
+            result = results[question]
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
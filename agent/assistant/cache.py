@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Iterator, Optional, Set, Tuple
+
+
+class TTLCache:
+    """
+    In-memory cache with per-entry expiry and LRU eviction.
+
+    Used for keyword extraction and search results; `remaining()` lets the
+    warm-up job refresh entries that are about to expire.
+
+    Entries may be tagged (e.g. with the ids of the wiki documents they were
+    built from); `invalidate(tag)` drops exactly the entries carrying a tag,
+    so a changed document does not have to wait for the TTL.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1000):
+        """
+        Args:
+            ttl (float): Entry lifetime in seconds; 0 or less disables caching
+            max_entries (int): Least recently used entries are dropped beyond this
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # Reverse index: tag -> keys of the entries carrying it, and back
+        self._tagged: Dict[Hashable, Set[Hashable]] = {}
+        self._tags: Dict[Hashable, Tuple[Hashable, ...]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self.pop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = ()) -> None:
+        if not self.enabled:
+            return
+        self._untag(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        tags = tuple(dict.fromkeys(tags))
+        if tags:
+            self._tags[key] = tags
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self.pop(next(iter(self._entries)))
+
+    def remaining(self, key: Hashable) -> float:
+        """Seconds until `key` expires (0 when absent or expired)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[0] - time.monotonic())
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        self._untag(key)
+
+    def invalidate(self, tag: Hashable) -> int:
+        """Drop every entry tagged with `tag`; returns how many were dropped."""
+        keys = self._tagged.get(tag, ())
+        dropped = sum(1 for key in keys if key in self._entries)
+        for key in list(keys):
+            self.pop(key)
+        return dropped
+
+    def _untag(self, key: Hashable) -> None:
+        for tag in self._tags.pop(key, ()):
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._entries))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tagged.clear()
+        self._tags.clear()
@@ -0,0 +1,105 @@
+import json
+import os
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List
+
+from .local_index import tokenize
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class CollectionRouter:
+    """
+    Map search queries to the Outline collections likely to answer them.
+
+    The keyword -> collection table is learned from global search results:
+    every result counts one observation of its collection for each term of
+    the query that found it. `route(query)` pools the observations of the
+    query's terms and returns the collections holding at least `min_share`
+    of them, best first and at most `max_collections`. With fewer than
+    `min_observations` observations, or no dominant collection, it returns
+    nothing and the caller searches the whole wiki.
+    """
+
+    def __init__(
+        self,
+        min_share: float = 0.6,
+        min_observations: int = 5,
+        max_collections: int = 1,
+        max_terms: int = 10000,
+    ):
+        """
+        Args:
+            min_share (float): Share of observations a collection needs (0.0-1.0)
+            min_observations (int): Observations a query needs to be routed
+            max_collections (int): Collections returned per query
+            max_terms (int): Least recently seen terms are dropped beyond this
+        """
+        self.min_share = min_share
+        self.min_observations = min_observations
+        self.max_collections = max_collections
+        self.max_terms = max_terms
+        self._terms: "OrderedDict[str, Counter]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "CollectionRouter":
+        return cls(
+            min_share=float(os.getenv("COLLECTION_ROUTING_MIN_SHARE", "0.6")),
+            min_observations=int(os.getenv("COLLECTION_ROUTING_MIN_OBSERVATIONS", "5")),
+            max_collections=int(os.getenv("COLLECTION_ROUTING_MAX_COLLECTIONS", "1")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def learn(self, query: str, results: Iterable[dict]) -> None:
+        """Record the collections of a global search's results for `query`."""
+        collections = [r["collection_id"] for r in results if r.get("collection_id")]
+        if not collections:
+            return
+        for term in set(tokenize(query)):
+            counts = self._terms.get(term)
+            if counts is None:
+                counts = self._terms[term] = Counter()
+            else:
+                self._terms.move_to_end(term)
+            counts.update(collections)
+        while len(self._terms) > self.max_terms:
+            self._terms.popitem(last=False)
+
+    def route(self, query: str) -> List[str]:
+        """Collections to search first for `query`; empty for a global search."""
+        pooled: Counter = Counter()
+        for term in set(tokenize(query)):
+            counts = self._terms.get(term)
+            if counts is not None:
+                pooled.update(counts)
+        total = sum(pooled.values())
+        if not total or total < self.min_observations:
+            return []
+        return [
+            collection
+            for collection, count in pooled.most_common(self.max_collections)
+            if count / total >= self.min_share
+        ]
+
+    def load_snapshot(self, path: str) -> int:
+        """Load the table from a JSON file written by `save_snapshot`."""
+        with open(path, encoding="utf-8") as f:
+            table: Dict[str, Dict[str, int]] = json.load(f)
+        for term, counts in table.items():
+            self._terms[term] = Counter(counts)
+        logger.info("Loaded %d routing terms from %s", len(table), path)
+        return len(table)
+
+    def save_snapshot(self, path: str) -> int:
+        """Write the term -> collection counts as a JSON object."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {term: dict(counts) for term, counts in self._terms.items()},
+                f,
+                ensure_ascii=False,
+            )
+        logger.info("Saved %d routing terms to %s", len(self._terms), path)
+        return len(self._terms)
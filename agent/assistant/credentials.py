@@ -0,0 +1,181 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# (token, lifetime in seconds)
+TokenFetcher = Callable[[], Awaitable[Tuple[str, float]]]
+
+DEFAULT_TOKEN_URL = "https://iam.api.cloud.ru/api/v1/auth/token"
+
+# Shortest pause between background refreshes, however short the token lives
+MIN_REFRESH_INTERVAL = 1.0
+
+
+class StaticCredentialProvider:
+    """Hands out a fixed API key (LLM_API_KEY)."""
+
+    def __init__(self, token: Optional[str]):
+        self._token = token
+
+    async def get_token(self) -> Optional[str]:
+        return self._token
+
+    def invalidate(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RefreshingCredentialProvider:
+    """
+    Shared LLM credential that is refreshed in the background before it expires.
+
+    - `get_token()` returns the cached token without I/O while it is valid
+    - A background task refreshes it `refresh_margin` seconds before expiry
+    - Concurrent callers that find no valid token share one refresh (single-flight)
+
+    A token living no longer than `refresh_margin` is refreshed halfway
+    through its lifetime instead, and never more often than once per
+    `MIN_REFRESH_INTERVAL` seconds.
+    """
+
+    def __init__(
+        self,
+        fetch: TokenFetcher,
+        refresh_margin: float = 60.0,
+        retry_interval: float = 5.0,
+    ):
+        """
+        Args:
+            fetch (TokenFetcher): Coroutine returning (token, lifetime seconds)
+            refresh_margin (float): Refresh this many seconds before expiry
+            retry_interval (float): Delay between failed background refreshes
+        """
+        self._fetch = fetch
+        self._refresh_margin = refresh_margin
+        # Margin applied to the current token
+        self._margin = refresh_margin
+        self._retry_interval = retry_interval
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+        self._background: Optional[asyncio.Task] = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._token is not None
+            and time.monotonic() < self._expires_at - self._margin
+        )
+
+    async def get_token(self) -> Optional[str]:
+        """Return a current token, refreshing only if none is valid."""
+        self._ensure_background()
+        if self._is_fresh():
+            return self._token
+        return await self._refresh()
+
+    def invalidate(self) -> None:
+        """Mark the token stale (e.g. after a 401) so the next call refreshes it."""
+        self._expires_at = 0.0
+
+    async def _refresh(self) -> str:
+        # Single-flight: every caller awaits the same fetch
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._do_refresh())
+        inflight = self._inflight
+        # shield: a cancelled caller must not abort the refresh for the others
+        return await asyncio.shield(inflight)
+
+    async def _do_refresh(self) -> str:
+        try:
+            token, lifetime = await self._fetch()
+            self._margin = self._refresh_margin
+            if self._margin >= lifetime:
+                logger.warning(
+                    "LLM token lifetime_s=%.0f is within refresh margin %.0fs; "
+                    "refreshing at half its lifetime",
+                    lifetime,
+                    self._refresh_margin,
+                )
+                self._margin = lifetime / 2
+            self._token = token
+            self._expires_at = time.monotonic() + lifetime
+            logger.info("LLM credential refreshed; lifetime_s=%.0f", lifetime)
+            return token
+        finally:
+            self._inflight = None
+
+    def _ensure_background(self) -> None:
+        if self._background is None or self._background.done():
+            self._background = asyncio.get_running_loop().create_task(
+                self._refresh_loop()
+            )
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = self._expires_at - self._margin - time.monotonic()
+            if self._token is not None:
+                delay = max(delay, MIN_REFRESH_INTERVAL)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self._is_fresh():
+                    # Token was refreshed meanwhile (e.g. by a caller)
+                    continue
+            try:
+                await self._refresh()
+            except Exception:
+                logger.exception(
+                    "Background LLM credential refresh failed; retrying in %.0fs",
+                    self._retry_interval,
+                )
+                await asyncio.sleep(self._retry_interval)
+
+    async def close(self) -> None:
+        if self._background is not None:
+            self._background.cancel()
+            try:
+                await self._background
+            except asyncio.CancelledError:
+                pass
+            self._background = None
+
+
+def iam_token_fetcher(url: str, key_id: str, secret: str) -> TokenFetcher:
+    """Fetch an access token from an IAM endpoint with a key id and secret."""
+
+    async def fetch() -> Tuple[str, float]:
+        import httpx
+
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            resp = await client.post(url, json={"keyId": key_id, "secret": secret})
+            resp.raise_for_status()
+            data = resp.json()
+        return data["access_token"], float(data.get("expires_in", 3600))
+
+    return fetch
+
+
+def credential_provider_from_env():
+    """
+    Build the LLM credential provider from environment variables.
+
+    With LLM_KEY_ID and LLM_KEY_SECRET set, access tokens are obtained from
+    LLM_TOKEN_URL and refreshed in the background; otherwise LLM_API_KEY is
+    used as a static key.
+    """
+    key_id = os.environ.get("LLM_KEY_ID")
+    secret = os.environ.get("LLM_KEY_SECRET")
+    if key_id and secret:
+        url = os.environ.get("LLM_TOKEN_URL", DEFAULT_TOKEN_URL)
+        logger.info("Using refreshing LLM credentials; token_url=%s", url)
+        return RefreshingCredentialProvider(
+            iam_token_fetcher(url, key_id, secret),
+            refresh_margin=float(os.environ.get("LLM_TOKEN_REFRESH_MARGIN", "60")),
+        )
+    return StaticCredentialProvider(os.environ.get("LLM_API_KEY"))
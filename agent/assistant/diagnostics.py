@@ -0,0 +1,267 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Deque, Dict, List, Optional
+
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class Diagnostics:
+    """
+    Opt-in profiling and memory diagnostics for the running agent.
+
+    - Sampled CPU profiles: a `profile_rate` fraction of requests runs under
+      cProfile and the top functions are kept in a small ring buffer. cProfile
+      covers the whole event-loop thread, so a profile also contains whatever
+      other requests ran concurrently.
+    - tracemalloc snapshots: started on demand; each snapshot is diffed
+      against the previous one to show the allocation sites that grew.
+    - Event-loop lag: a heartbeat on the loop and a watchdog thread that logs
+      the loop thread's stack whenever the heartbeat stalls for longer than
+      `lag_threshold` seconds, i.e. while a slow callback is still running.
+
+    Nothing of this is set up unless enabled; `profile_request` then returns
+    a no-op context manager.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        token: Optional[str] = None,
+        profile_rate: float = 0.0,
+        lag_threshold: float = 0.25,
+        max_profiles: int = 20,
+    ):
+        """
+        Args:
+            enabled (bool): Turn diagnostics on
+            token (str): Token required on every diagnostics endpoint
+            profile_rate (float): Fraction of requests to profile (0.0-1.0)
+            lag_threshold (float): Loop stall in seconds that gets logged
+            max_profiles (int): Number of recent profiles to keep
+        """
+        if enabled and not token:
+            logger.warning("DIAGNOSTICS_ENABLED is set without DIAGNOSTICS_TOKEN")
+            enabled = False
+        self.enabled = enabled
+        self._token = token or ""
+        self.profile_rate = profile_rate
+        self.lag_threshold = lag_threshold
+        self.profiles: Deque[Dict[str, Any]] = deque(maxlen=max_profiles)
+        self._profiling = False
+        self._snapshot = None
+        self._last_beat = 0.0
+        self._max_lag = 0.0
+        self._stalls = 0
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> "Diagnostics":
+        return cls(
+            enabled=os.getenv("DIAGNOSTICS_ENABLED", "false").lower() == "true",
+            token=os.getenv("DIAGNOSTICS_TOKEN"),
+            profile_rate=float(os.getenv("DIAGNOSTICS_PROFILE_RATE", "0.01")),
+            lag_threshold=float(os.getenv("DIAGNOSTICS_LAG_THRESHOLD", "0.25")),
+        )
+
+    # Request profiling
+
+    def profile_request(self, request_id: str):
+        """Profile this request if it is sampled; otherwise a no-op."""
+        if not self.enabled or self._profiling or random.random() >= self.profile_rate:
+            return nullcontext()
+        return self._profile(request_id)
+
+    @contextmanager
+    def _profile(self, request_id: str):
+        # One profile at a time: cProfile hooks the whole thread
+        self._profiling = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._profiling = False
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+            self.profiles.append(
+                {
+                    "request_id": request_id,
+                    "at": time.time(),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "stats": out.getvalue(),
+                }
+            )
+            logger.info("Stored CPU profile; request_id=%s", request_id)
+
+    # tracemalloc
+
+    def tracemalloc_snapshot(self, top: int = 20, frames: int = 10) -> Dict[str, Any]:
+        """Take a snapshot, starting tracemalloc first if needed, and diff it."""
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._snapshot = None
+            logger.info("tracemalloc started; frames=%d", frames)
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        result: Dict[str, Any] = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"site": str(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+        if self._snapshot is not None:
+            result["diff"] = [
+                {
+                    "site": str(stat.traceback),
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in snapshot.compare_to(self._snapshot, "lineno")[:top]
+            ]
+        self._snapshot = snapshot
+        return result
+
+    def tracemalloc_stop(self) -> None:
+        import tracemalloc
+
+        tracemalloc.stop()
+        self._snapshot = None
+        logger.info("tracemalloc stopped")
+
+    # Event-loop lag
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            "Diagnostics enabled; profile_rate=%.3f lag_threshold=%.3fs",
+            self.profile_rate,
+            self.lag_threshold,
+        )
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+
+    async def _beat(self) -> None:
+        interval = self.lag_threshold / 4
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._max_lag = max(self._max_lag, now - expected)
+            self._last_beat = now
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.lag_threshold / 2):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            if stalled < self.lag_threshold or beat == reported_beat:
+                continue
+            # Report each stall once, with the stack that is blocking the loop
+            reported_beat = beat
+            self._stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logger.warning(
+                "Event loop blocked for %.3fs; loop thread stack:\n%s",
+                stalled,
+                stack,
+            )
+
+    def loop_stats(self) -> Dict[str, Any]:
+        return {
+            "max_lag_s": round(self._max_lag, 4),
+            "stalls": self._stalls,
+            "lag_threshold_s": self.lag_threshold,
+        }
+
+    # HTTP surface
+
+    def authorized(self, headers) -> bool:
+        supplied = headers.get("x-diagnostics-token") or ""
+        auth = headers.get("authorization") or ""
+        if auth.lower().startswith("bearer "):
+            supplied = auth[7:]
+        return hmac.compare_digest(supplied.encode(), self._token.encode())
+
+    def routes(self) -> List:
+        """Starlette routes under /debug; empty when diagnostics are disabled."""
+        if not self.enabled:
+            return []
+
+        from starlette.requests import Request
+        from starlette.responses import JSONResponse, PlainTextResponse
+        from starlette.routing import Route
+
+        def guarded(handler):
+            async def endpoint(request: Request):
+                if not self.authorized(request.headers):
+                    return PlainTextResponse("Forbidden", status_code=403)
+                return await handler(request)
+
+            return endpoint
+
+        async def profiles(request: Request):
+            return JSONResponse(list(self.profiles))
+
+        async def snapshot(request: Request):
+            top = int(request.query_params.get("top", "20"))
+            frames = int(request.query_params.get("frames", "10"))
+            # Snapshots walk every traced block; keep that off the event loop
+            result = await asyncio.to_thread(self.tracemalloc_snapshot, top, frames)
+            return JSONResponse(result)
+
+        async def stop_tracing(request: Request):
+            self.tracemalloc_stop()
+            return JSONResponse({"tracing": False})
+
+        async def loop(request: Request):
+            return JSONResponse(self.loop_stats())
+
+        return [
+            Route("/debug/profiles", guarded(profiles)),
+            Route("/debug/tracemalloc", guarded(snapshot)),
+            Route("/debug/tracemalloc", guarded(stop_tracing), methods=["DELETE"]),
+            Route("/debug/loop", guarded(loop)),
+        ]
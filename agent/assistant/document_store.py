@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Union
+
+from .metrics import metrics
+
+
+class StoredText:
+    """
+    A text held once by a `DocumentStore`; results and caches keep this
+    reference instead of their own copy. Read it through `text`.
+    """
+
+    __slots__ = ("key", "size", "raw_bytes", "_data", "_used", "_store")
+
+    def __init__(self, key: bytes, text: str, store: "DocumentStore"):
+        self.key = key
+        self.size = len(text)
+        self.raw_bytes = sys.getsizeof(text)
+        # The text, or its zlib-compressed UTF-8 once it has gone cold
+        self._data: Union[str, bytes] = text
+        self._used = time.monotonic()
+        self._store = store
+
+    @property
+    def compressed(self) -> bool:
+        return isinstance(self._data, bytes)
+
+    @property
+    def text(self) -> str:
+        self._used = time.monotonic()
+        data = self._data
+        if isinstance(data, bytes):
+            text = zlib.decompress(data).decode()
+            self._store._inflate(self, text)
+            return text
+        self._store._touch(self)
+        return data
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        state = "compressed" if self.compressed else "plain"
+        return f"StoredText({self.key.hex()[:8]}, {self.size} chars, {state})"
+
+
+class TextParts:
+    """A text made of plain strings and `StoredText` references, joined on read."""
+
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: Iterable[Union[str, StoredText]]):
+        self.parts = tuple(parts)
+
+    @property
+    def text(self) -> str:
+        return "".join(p if isinstance(p, str) else p.text for p in self.parts)
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.parts)
+
+
+# What results and caches hold in place of a document text
+Text = Union[str, StoredText, TextParts]
+
+
+def text_of(value: Text) -> str:
+    """The plain text of a string, stored text or text parts."""
+    return value if isinstance(value, str) else value.text
+
+
+class DocumentStore:
+    """
+    Content-addressed store that holds each retrieved document text once.
+
+    Popular pages come back in many searches; `put()` returns the same
+    `StoredText` for the same content (keyed by its BLAKE2 hash), so cached
+    results, fetched documents and session documents share one copy and
+    memory grows with the number of distinct pages rather than with traffic.
+    Texts shorter than `min_size` characters are returned as they are.
+
+    Texts not read for `cold_after` seconds are compressed with zlib and
+    decompressed again on the next read. Beyond `max_bytes` held, the least
+    recently used texts are dropped from the store; references keep their
+    text alive, but a later `put()` of it makes a new copy.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        cold_after: float = 300.0,
+        min_size: int = 2048,
+    ):
+        """
+        Args:
+            max_bytes (int): Memory held by texts before eviction; 0 disables the store
+            cold_after (float): Seconds without a read before a text is compressed
+            min_size (int): Shorter texts are not stored
+        """
+        self.max_bytes = max_bytes
+        self.cold_after = cold_after
+        self.min_size = min_size
+        # All texts, least recently used first
+        self._entries: "OrderedDict[bytes, StoredText]" = OrderedDict()
+        # Uncompressed texts, least recently used first
+        self._hot: "OrderedDict[bytes, None]" = OrderedDict()
+        self.bytes = 0
+        self.raw_bytes = 0
+
+    @classmethod
+    def from_env(cls) -> "DocumentStore":
+        return cls(
+            max_bytes=int(float(os.getenv("DOCUMENT_STORE_MAX_MB", "64")) * 1024**2),
+            cold_after=float(os.getenv("DOCUMENT_STORE_COLD_AFTER", "300")),
+            min_size=int(os.getenv("DOCUMENT_STORE_MIN_SIZE", "2048")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, text: str) -> Union[str, StoredText]:
+        """The shared reference for `text` (or `text` itself if not stored)."""
+        if not self.enabled or len(text) < self.min_size:
+            return text
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        entry = self._entries.get(key)
+        if entry is not None:
+            metrics.inc("document_store.hits")
+            entry._used = time.monotonic()
+            self._touch(entry)
+            return entry
+
+        entry = StoredText(key, text, self)
+        self._entries[key] = entry
+        self._hot[key] = None
+        self.bytes += entry.raw_bytes
+        self.raw_bytes += entry.raw_bytes
+        metrics.inc("document_store.puts")
+        self._maintain()
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        """Entries and memory held, for the metrics endpoint."""
+        return {
+            "entries": len(self._entries),
+            "compressed": len(self._entries) - len(self._hot),
+            "bytes": self.bytes,
+            "raw_bytes": self.raw_bytes,
+        }
+
+    def _owns(self, entry: StoredText) -> bool:
+        return self._entries.get(entry.key) is entry
+
+    def _touch(self, entry: StoredText) -> None:
+        if self._owns(entry):
+            self._entries.move_to_end(entry.key)
+            if entry.key in self._hot:
+                self._hot.move_to_end(entry.key)
+
+    def _inflate(self, entry: StoredText, text: str) -> None:
+        """Keep a text that is read again uncompressed while it stays hot."""
+        if not self._owns(entry):
+            return
+        self.bytes += sys.getsizeof(text) - sys.getsizeof(entry._data)
+        entry._data = text
+        self._entries.move_to_end(entry.key)
+        self._hot[entry.key] = None
+        self._maintain()
+
+    def _maintain(self) -> None:
+        cold = time.monotonic() - self.cold_after
+        while self._hot:
+            key = next(iter(self._hot))
+            entry = self._entries[key]
+            if entry._used > cold:
+                break
+            del self._hot[key]
+            data = zlib.compress(entry._data.encode())
+            self.bytes += sys.getsizeof(data) - sys.getsizeof(entry._data)
+            entry._data = data
+            metrics.inc("document_store.compressions")
+
+        while self.bytes > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._hot.pop(key, None)
+            self.bytes -= sys.getsizeof(entry._data)
+            self.raw_bytes -= entry.raw_bytes
+            metrics.inc("document_store.evictions")
@@ -0,0 +1,55 @@
+import asyncio
+import os
+from typing import Optional
+
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class ConcurrencyLimiter:
+    """
+    Bound the number of concurrent downstream calls (LLM, MCP).
+
+    Used as `async with limiter:`. A slot is released as soon as the block
+    exits, including when the surrounding task is cancelled, so a cancelled
+    request gives its capacity back immediately instead of at the end of
+    the downstream call.
+    """
+
+    def __init__(self, name: str, limit: int = 0):
+        """
+        Args:
+            name (str): Name used in logs
+            limit (int): Max concurrent holders; 0 or less means unlimited
+        """
+        self.name = name
+        self.limit = limit
+        self._semaphore: Optional[asyncio.Semaphore] = (
+            asyncio.Semaphore(limit) if limit > 0 else None
+        )
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls, name: str, env_var: str) -> "ConcurrencyLimiter":
+        return cls(name, int(os.getenv(env_var, "0")))
+
+    @property
+    def available(self) -> Optional[int]:
+        """Free slots, or None when unlimited."""
+        if self._semaphore is None:
+            return None
+        return self.limit - self.in_flight
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+        if exc_type is asyncio.CancelledError:
+            logger.debug("Released %s slot of cancelled call", self.name)
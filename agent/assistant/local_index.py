@@ -0,0 +1,543 @@
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import operator
+import re
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+_STOP_WORDS = frozenset(
+    """
+    a an and are as at be by for from how i in is it of on or that the this to
+    was what when where which who why will with you your do does can
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за
+    бы по только ее мне было вот от меня еще нет о из ему теперь когда даже ну
+    ли если уже или ни быть был него до вас нибудь опять уж вам ведь там потом
+    себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам
+    чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому
+    этого какой совсем ним здесь этом один почти мой тем чтобы нее сейчас были
+    куда зачем всех никогда можно при наконец два об другой хоть после над
+    больше тот через эти нас про всего них какая много разве три эту моя
+    впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более
+    всегда конечно всю между какие как
+    """.split()
+)
+
+# Longest suffixes first; a light stemmer, not full Snowball
+_RU_SUFFIXES = sorted(
+    """
+    иями ями ами ыми ими ого его ому ему ешь ишь ете ите ает яет ует ают яют
+    уют ать ять ить еть уть ой ей ий ый ая яя ое ее ые ие ую юю ом ем ах ях ам
+    ям ов ев ью ия ие ия ию ть ет ит ут ют ят ал ил ыл ла ло ли а я о е ы и у ю ь й
+    """.split(),
+    key=len,
+    reverse=True,
+)
+_EN_SUFFIXES = (
+    "ingly",
+    "ations",
+    "ation",
+    "ings",
+    "ing",
+    "edly",
+    "ies",
+    "ed",
+    "es",
+    "ly",
+    "s",
+)
+
+
+def _stem(token: str) -> str:
+    if token.isdigit():
+        return token
+    if "а" <= token[0] <= "я" or token[0] == "ё":
+        for suffix in _RU_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[: -len(suffix)]
+        return token
+    for suffix in _EN_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-word characters, drop stop words and stem."""
+    tokens = []
+    for raw in _TOKEN_RE.findall(text.lower().replace("ё", "е")):
+        if raw in _STOP_WORDS or len(raw) < 2:
+            continue
+        tokens.append(_stem(raw))
+    return tokens
+
+
+def document_terms(title: str, text: str) -> Tuple[int, Dict[str, int]]:
+    """
+    Token count and term frequencies of a document, as indexed by `add`.
+
+    Tokenizing is the expensive part of indexing and needs no index state,
+    so callers may run it in an executor and pass the result to `add`.
+    """
+    tokens = tokenize(f"{title} {title} {text}")
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return len(tokens), counts
+
+
+@dataclass
+class IndexedDocument:
+    key: str
+    title: str
+    url: str
+    text: str
+
+
+@dataclass
+class SearchHit:
+    document: IndexedDocument
+    score: float
+
+
+# Length norms are recomputed once the average document length has moved
+# this far (relative) from the one they were computed with
+NORM_DRIFT = 0.05
+
+# Terms in more than this share of the documents (and more than
+# COMMON_MIN_POSTINGS of them) are common: their postings are never scanned
+COMMON_SHARE = 0.1
+COMMON_MIN_POSTINGS = 4096
+# Best documents kept per common term, by term score
+CHAMPIONS = 256
+
+_score = operator.itemgetter(1)
+
+
+@dataclass
+class _IndexState:
+    """Everything `_rebuild` replaces on compaction."""
+
+    terms: Dict[str, int]
+    postings_docs: List[array]
+    postings_tfs: List[array]
+    max_tfs: array
+    docs: List[Optional[IndexedDocument]]
+    doc_lengths: array
+    by_key: Dict[str, int]
+    total_length: int
+    min_length: int
+
+
+def _rebuild(
+    terms: List[Tuple[str, int]],
+    postings_docs: List[array],
+    postings_tfs: List[array],
+    docs: List[Optional[IndexedDocument]],
+    doc_lengths: array,
+) -> _IndexState:
+    """
+    The index without tombstoned documents, from a snapshot of its state.
+
+    Reads postings only up to the snapshot's last document, so it may run in
+    a thread while the index takes new documents on the event loop.
+    """
+    upto = len(docs)
+    remap = array("i", [-1]) * upto
+    live: List[Optional[IndexedDocument]] = []
+    lengths = array("I")
+    for doc_id, doc in enumerate(docs):
+        if doc is not None:
+            remap[doc_id] = len(live)
+            live.append(doc)
+            lengths.append(doc_lengths[doc_id])
+
+    state = _IndexState(
+        terms={},
+        postings_docs=[],
+        postings_tfs=[],
+        max_tfs=array("H"),
+        docs=live,
+        doc_lengths=lengths,
+        by_key={doc.key: doc_id for doc_id, doc in enumerate(live)},
+        total_length=sum(lengths),
+        min_length=min(lengths, default=0),
+    )
+    for token, term_id in terms:
+        new_docs, new_tfs = array("I"), array("H")
+        for doc_id, tf in zip(postings_docs[term_id], postings_tfs[term_id]):
+            if doc_id >= upto:
+                break
+            new_id = remap[doc_id]
+            if new_id >= 0:
+                new_docs.append(new_id)
+                new_tfs.append(tf)
+        if new_docs:
+            state.terms[token] = len(state.postings_docs)
+            state.postings_docs.append(new_docs)
+            state.postings_tfs.append(new_tfs)
+            state.max_tfs.append(max(new_tfs))
+    return state
+
+
+class LocalSearchIndex:
+    """
+    In-process BM25 inverted index over wiki documents.
+
+    Postings are kept per term as two parallel arrays (document ids and term
+    frequencies) so the index stays compact for tens of thousands of
+    documents. Documents are keyed by URL (or a content hash); re-adding a key
+    replaces the old version, which is tombstoned and dropped on compaction.
+
+    Length norms are kept per document as it is added, computed with the
+    average length of their last full recomputation; that happens only once
+    the average drifts by more than `NORM_DRIFT`. Queries are scored with
+    MaxScore: terms go from the highest possible contribution down, and once
+    the remaining terms cannot lift a new document into the top results,
+    they only add to the documents already found.
+
+    Common terms (see `COMMON_SHARE`) only add to the documents found by the
+    other terms and to their champions, the `CHAMPIONS` documents where the
+    term scores best. Like a cutoff frequency, this leaves out documents
+    matching nothing but common terms outside their champions; the result is
+    exact whenever MaxScore rules those out anyway.
+
+    Compaction is left to the owner of the index (`needs_compaction`), which
+    can run the rebuild off the event loop with `begin_compaction()`.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        # Highest term frequency per term, for the MaxScore bounds
+        self._max_tfs = array("H")
+        self._docs: List[Optional[IndexedDocument]] = []
+        self._doc_lengths = array("I")
+        self._by_key: Dict[str, int] = {}
+        self._total_length = 0
+        # Shortest document ever added; only a bound once documents are removed
+        self._min_length = 0
+        self._live = 0
+        self._norms = array("d")
+        self._norm_avg = 0.0
+        # term id -> (postings covered, champion doc ids); built lazily
+        self._champions: Dict[int, Tuple[int, List[int]]] = {}
+        # Changes made while a compaction runs, replayed onto its result
+        self._changes: Optional[List[tuple]] = None
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def size(self) -> int:
+        """Indexed tokens across live documents."""
+        return self._total_length
+
+    def add(
+        self,
+        title: str,
+        url: str,
+        text: str,
+        key: Optional[str] = None,
+        terms: Optional[Tuple[int, Dict[str, int]]] = None,
+    ) -> None:
+        """
+        Index a document, replacing any previous version with the same key.
+
+        `terms` is the precomputed `document_terms(title, text)`, if any.
+        """
+        key = self._key(title, url, text, key)
+        if self.contains(title, url, text, key):
+            return
+        previous = self._by_key.get(key)
+        if previous is not None:
+            self._remove(previous)
+
+        length, counts = terms if terms is not None else document_terms(title, text)
+        if self._changes is not None:
+            self._changes.append((key, (title, url, text, key, (length, counts))))
+        doc_id = len(self._docs)
+        self._docs.append(IndexedDocument(key=key, title=title, url=url, text=text))
+        self._doc_lengths.append(length)
+        self._by_key[key] = doc_id
+        self._total_length += length
+        self._min_length = min(self._min_length, length) if doc_id else length
+        self._live += 1
+        if not self._norm_avg:
+            self._norm_avg = float(length or 1)
+        self._norms.append(self._norm(length))
+
+        for token, tf in counts.items():
+            tf = min(tf, 0xFFFF)
+            term_id = self._terms.get(token)
+            if term_id is None:
+                term_id = len(self._postings_docs)
+                self._terms[token] = term_id
+                self._postings_docs.append(array("I"))
+                self._postings_tfs.append(array("H"))
+                self._max_tfs.append(tf)
+            elif tf > self._max_tfs[term_id]:
+                self._max_tfs[term_id] = tf
+            # Doc ids are assigned in increasing order, so postings stay sorted
+            self._postings_docs[term_id].append(doc_id)
+            self._postings_tfs[term_id].append(tf)
+
+    def contains(
+        self, title: str, url: str, text: str, key: Optional[str] = None
+    ) -> bool:
+        """Whether this exact version of the document is already indexed."""
+        doc_id = self._by_key.get(self._key(title, url, text, key))
+        current = self._docs[doc_id] if doc_id is not None else None
+        return current is not None and current.text == text and current.title == title
+
+    def discard(self, key: str) -> bool:
+        """Remove the document indexed under `key`; False if there is none."""
+        if self._changes is not None:
+            self._changes.append((key, None))
+        doc_id = self._by_key.pop(key, None)
+        if doc_id is None or self._docs[doc_id] is None:
+            return False
+        self._remove(doc_id)
+        return True
+
+    @staticmethod
+    def _key(title: str, url: str, text: str, key: Optional[str]) -> str:
+        return key or url or hashlib.sha1(f"{title}\n{text}".encode()).hexdigest()
+
+    def _remove(self, doc_id: int) -> None:
+        self._docs[doc_id] = None
+        self._total_length -= self._doc_lengths[doc_id]
+        self._live -= 1
+
+    @property
+    def needs_compaction(self) -> bool:
+        """Whether tombstoned documents make up most of the index."""
+        return len(self._docs) > 1024 and self._live < len(self._docs) // 2
+
+    def compact(self) -> None:
+        """Rebuild the index without tombstoned documents, inline."""
+        self.end_compaction(self.begin_compaction()())
+
+    def begin_compaction(self) -> Callable[[], _IndexState]:
+        """
+        Start a compaction; returns the rebuild to run, e.g. in a thread.
+
+        The rebuild works on a snapshot and only reads the live index, which
+        keeps serving searches and taking documents until `end_compaction`.
+        """
+        if self._changes is not None:
+            raise RuntimeError("Compaction already in progress")
+        self._changes = []
+        return lambda: _rebuild(
+            list(self._terms.items()),
+            list(self._postings_docs),
+            list(self._postings_tfs),
+            list(self._docs),
+            array("I", self._doc_lengths),
+        )
+
+    def end_compaction(self, state: Optional[_IndexState]) -> None:
+        """
+        Swap in the rebuilt index and replay the changes made meanwhile.
+
+        With `state` None (the rebuild failed) the index is left as it is.
+        """
+        changes, self._changes = self._changes or [], None
+        if state is None:
+            return
+        self._terms = state.terms
+        self._postings_docs = state.postings_docs
+        self._postings_tfs = state.postings_tfs
+        self._max_tfs = state.max_tfs
+        self._docs = state.docs
+        self._doc_lengths = state.doc_lengths
+        self._by_key = state.by_key
+        self._total_length = state.total_length
+        self._min_length = state.min_length
+        self._live = len(state.docs)
+        self._recompute_norms()
+        for key, args in changes:
+            if args is None:
+                self.discard(key)
+            else:
+                self.add(*args[:3], key=args[3], terms=args[4])
+        logger.info("Compacted local index; documents=%d", self._live)
+
+    def _norm(self, length: int) -> float:
+        return self.k1 * (1.0 - self.b + self.b * length / self._norm_avg)
+
+    def _recompute_norms(self) -> None:
+        self._norm_avg = (self._total_length / self._live if self._live else 0.0) or 1.0
+        norm = self._norm
+        self._norms = array("d", map(norm, self._doc_lengths))
+        self._champions = {}
+
+    def _doc_norms(self) -> array:
+        avg = self._total_length / self._live
+        if abs(avg - self._norm_avg) > NORM_DRIFT * self._norm_avg:
+            self._recompute_norms()
+        return self._norms
+
+    def _kth_score(self, scores: Dict[int, float], limit: int) -> float:
+        """The `limit`-th best score of a live document, or 0.0."""
+        if len(scores) < limit:
+            return 0.0
+        docs = self._docs
+        best = heapq.nlargest(limit, scores.items(), key=_score)
+        if any(docs[doc_id] is None for doc_id, _ in best):
+            best = heapq.nlargest(
+                limit,
+                ((d, s) for d, s in scores.items() if docs[d] is not None),
+                key=_score,
+            )
+        return best[-1][1] if len(best) == limit else 0.0
+
+    def _champion_docs(self, term_id: int, count: int) -> List[int]:
+        """The best `count` documents for a term, plus those added since."""
+        docs = self._postings_docs[term_id]
+        cached = self._champions.get(term_id)
+        if (
+            cached is None
+            or len(cached[1]) < min(count, cached[0])
+            or len(docs) - cached[0] > cached[0] // 8
+        ):
+            tfs, norms = self._postings_tfs[term_id], self._norms
+            best = heapq.nlargest(
+                count,
+                range(len(docs)),
+                key=lambda j: tfs[j] / (tfs[j] + norms[docs[j]]),
+            )
+            cached = self._champions[term_id] = (len(docs), [docs[j] for j in best])
+        covered, champions = cached
+        return champions + docs[covered:].tolist()
+
+    @staticmethod
+    def _add_to_found(
+        scores: Dict[int, float], weight: float, docs: array, tfs: array, norms: array
+    ) -> None:
+        """Add a term's score to the documents in `scores` only."""
+        if len(scores) * max(1, len(docs).bit_length()) < len(docs):
+            for doc_id in scores:
+                j = bisect_left(docs, doc_id)
+                if j < len(docs) and docs[j] == doc_id:
+                    tf = tfs[j]
+                    scores[doc_id] += weight * tf / (tf + norms[doc_id])
+        else:
+            for doc_id, tf in zip(docs, tfs):
+                score = scores.get(doc_id)
+                if score is not None:
+                    scores[doc_id] = score + weight * tf / (tf + norms[doc_id])
+
+    def search(self, query: str, limit: int = 5) -> List[SearchHit]:
+        """Return the `limit` best documents for `query` by BM25 score."""
+        if not self._live or limit <= 0:
+            return []
+        norms = self._doc_norms()
+        n = self._live
+        k1 = self.k1
+        min_norm = self._norm(self._min_length)
+        common_df = max(COMMON_SHARE * n, COMMON_MIN_POSTINGS)
+        terms = []
+        for token in set(tokenize(query)):
+            term_id = self._terms.get(token)
+            if term_id is None:
+                continue
+            docs = self._postings_docs[term_id]
+            # Postings of tombstoned documents count until compaction
+            df = min(len(docs), n)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            weight = idf * (k1 + 1.0)
+            max_tf = self._max_tfs[term_id]
+            bound = weight * max_tf / (max_tf + min_norm)
+            terms.append((df > common_df, bound, weight, term_id))
+        # Other terms first, each group by the most it can add
+        terms.sort(key=lambda term: (term[0], -term[1]))
+        # remaining[i]: the most terms i.. can add to any document's score
+        remaining = list(itertools.accumulate(term[1] for term in reversed(terms)))
+        remaining.reverse()
+
+        scores: Dict[int, float] = {}
+        seeded = False
+        for i, (common, _, weight, term_id) in enumerate(terms):
+            docs, tfs = self._postings_docs[term_id], self._postings_tfs[term_id]
+            if common and not seeded:
+                seeded = True
+                count = max(CHAMPIONS, 8 * limit)
+                for _, _, _, common_id in terms[i:]:
+                    for doc_id in self._champion_docs(common_id, count):
+                        scores.setdefault(doc_id, 0.0)
+            threshold = self._kth_score(scores, limit)
+            if remaining[i] < threshold:
+                # No document outside `scores` can make the top `limit` any
+                # more; drop the ones that cannot either
+                floor = threshold - remaining[i]
+                scores = {d: s for d, s in scores.items() if s >= floor}
+                self._add_to_found(scores, weight, docs, tfs, norms)
+            elif common:
+                self._add_to_found(scores, weight, docs, tfs, norms)
+            elif not scores:
+                scores = {
+                    doc_id: weight * tf / (tf + norms[doc_id])
+                    for doc_id, tf in zip(docs, tfs)
+                }
+            else:
+                get = scores.get
+                for doc_id, tf in zip(docs, tfs):
+                    scores[doc_id] = get(doc_id, 0.0) + weight * tf / (
+                        tf + norms[doc_id]
+                    )
+
+        best = heapq.nlargest(
+            limit,
+            ((score, doc_id) for doc_id, score in scores.items() if self._docs[doc_id]),
+        )
+        return [SearchHit(document=self._docs[d], score=s) for s, d in best]
+
+    def add_many(self, documents: Iterable[dict]) -> int:
+        count = 0
+        for doc in documents:
+            self.add(
+                doc.get("title", ""),
+                doc.get("url", ""),
+                doc.get("text", ""),
+                key=doc.get("id"),
+            )
+            count += 1
+        return count
+
+    def load_snapshot(self, path: str) -> int:
+        """Load documents from a JSON Lines file with title/url/text (and id)."""
+        with open(path, encoding="utf-8") as f:
+            count = self.add_many(json.loads(line) for line in f if line.strip())
+        if self.needs_compaction:
+            self.compact()
+        logger.info("Loaded %d documents into local index from %s", count, path)
+        return count
+
+    def save_snapshot(self, path: str) -> int:
+        """Write live documents to a JSON Lines file readable by `load_snapshot`."""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for doc in self._docs:
+                if doc is None:
+                    continue
+                record = {"id": doc.key, "title": doc.title, "url": doc.url}
+                record["text"] = doc.text
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        logger.info("Saved %d local index documents to %s", count, path)
+        return count
@@ -1,32 +1,189 @@
+import atexit
+import contextlib
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+
+# Pass as `extra=SAMPLED` on high-volume INFO logs; they are kept with
+# probability LOG_SAMPLE_RATE while warnings and errors are always kept.
+SAMPLED = {"sampled": True}
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+_stream_handler: Optional[logging.Handler] = None
+# Loggers set up by get_logger, reconfigured by configure_logging
+_loggers: List[logging.Logger] = []
+
+_STANDARD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {
+    "message",
+    "asctime",
+    "request_id",
+    "sampled",
+    "taskName",
+}
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the traceback separate from the message."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request id bound in the current context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records logged with `extra=SAMPLED`."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or record.levelno > logging.INFO:
+            return True
+        if not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with request id and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _build_formatter() -> logging.Formatter:
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        fmt="%(asctime)s %(levelname)s %(name)s [%(request_id)s] - %(message)s",
+    )
+
+
+def _log_level() -> int:
+    return getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
+
+def _ensure_listener() -> None:
+    """Start the background thread that writes queued records to stderr."""
+    global _listener, _stream_handler
+    with _listener_lock:
+        if _listener is not None:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(_build_formatter())
+        _stream_handler = handler
+        _listener = logging.handlers.QueueListener(
+            _queue, handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
 
 
 def get_logger(name: str) -> logging.Logger:
     """Return a configured module-level logger with consistent formatting.
 
-    Honors LOG_LEVEL env var; defaults to INFO.
+    Records are put on an in-memory queue and written by a background
+    listener thread, so logging never blocks the event loop on stdout.
+    Honors LOG_LEVEL (default INFO), LOG_FORMAT (`text` or `json`) and
+    LOG_SAMPLE_RATE (fraction of `extra=SAMPLED` INFO records to keep).
     """
-    level_name = os.getenv("LOG_LEVEL", "INFO").upper()
-    level = getattr(logging, level_name, logging.INFO)
-
     logger = logging.getLogger(name)
     if logger.handlers:
         # Already configured
         return logger
 
-    logger.setLevel(level)
+    logger.setLevel(_log_level())
 
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter(
-        fmt="%(asctime)s %(levelname)s %(name)s - %(message)s",
-    )
-    handler.setFormatter(formatter)
+    _ensure_listener()
+    handler = _QueueHandler(_queue)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "1.0"))))
     logger.addHandler(handler)
     logger.propagate = False
+    _loggers.append(logger)
     return logger
 
 
+def configure_logging() -> None:
+    """Apply LOG_LEVEL, LOG_FORMAT and LOG_SAMPLE_RATE to existing loggers.
+
+    Module loggers are created at import, before `.env` is loaded; call this
+    once the environment is complete.
+    """
+    _ensure_listener()
+    _stream_handler.setFormatter(_build_formatter())
+    level = _log_level()
+    rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    logging.getLogger().setLevel(level)
+    for logger in _loggers:
+        logger.setLevel(level)
+        for handler in logger.handlers:
+            for log_filter in handler.filters:
+                if isinstance(log_filter, SamplingFilter):
+                    log_filter.rate = rate
+
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str]) -> Iterator[None]:
+    """Bind `request_id` to every record logged inside the block."""
+    token = request_id_var.set(request_id)
+    try:
+        yield
+    finally:
+        request_id_var.reset(token)
+
+
 def set_global_log_level(level_name: str) -> None:
     """Set root logger level dynamically (optional helper)."""
     level = getattr(logging, level_name.upper(), logging.INFO)
@@ -1,34 +1,119 @@
 import json
 import logging
 import asyncio
-from typing import Any, Dict, Optional
-from .logging_utils import get_logger
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+from .limits import ConcurrencyLimiter
+from .logging_utils import SAMPLED, get_logger
+from .offload import Offloader
 
-# MCP streamable HTTP client
-_mcp_import_error = None
-try:
+logger = get_logger(__name__)
+
+# One result of the server's `search` tool (or a `fetch_document` result,
+# which has no number):
+# "1. **Title**\n   URL: ...\n   ID: ...\n   Collection: ...\n"
+# "   Updated: ...\n   Ranking: ...\n   Text: ..."
+# where the ID, Collection, Updated and Ranking lines are optional
+_RESULT_HEADER_RE = re.compile(
+    r"^(?:\d+\. )?\*\*(?P<title>.*?)\*\*\n   URL: (?P<url>.*?)\n"
+    r"(?P<fields>(?:   (?:ID|Collection|Updated|Ranking): .*\n)*)   Text: ",
+    re.MULTILINE,
+)
+_FIELD_RE = re.compile(r"   (ID|Collection|Updated|Ranking): (.*)")
+
+
+def parse_search_results(text: str) -> List[Dict[str, Any]]:
+    """
+    Split the text returned by the `search` tool into individual documents.
+
+    Returns:
+        List[Dict[str, Any]]: One {"title", "url", "text", "id",
+            "collection_id", "updated_at", "ranking"} dict per result; fields
+            the server does not report (e.g. on older servers) are None
+    """
+    headers = list(_RESULT_HEADER_RE.finditer(text))
+    results = []
+    for i, match in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        fields = dict(_FIELD_RE.findall(match.group("fields")))
+        ranking = fields.get("Ranking")
+        results.append(
+            {
+                "title": match.group("title"),
+                "url": match.group("url").strip(),
+                "text": text[match.end() : end].rstrip(),
+                "id": fields.get("ID"),
+                "collection_id": fields.get("Collection"),
+                "updated_at": fields.get("Updated"),
+                "ranking": float(ranking) if ranking else None,
+            }
+        )
+    return results
+
+
+def _load_mcp():
+    """Import the MCP SDK on first use and return the streamable HTTP client parts."""
     from mcp import ClientSession
     from mcp.client.streamable_http import streamablehttp_client
-except ImportError as _e:
-    _mcp_import_error = _e
-    ClientSession = None
-    streamablehttp_client = None
 
-logger = get_logger(__name__)
+    return ClientSession, streamablehttp_client
+
+
+def _content_size(raw_content: Any) -> int:
+    """Characters of text in raw MCP content, to decide whether to offload it."""
+    items = raw_content if isinstance(raw_content, (list, tuple)) else [raw_content]
+    size = 0
+    for item in items:
+        text = (
+            item.get("text") if isinstance(item, dict) else getattr(item, "text", None)
+        )
+        if isinstance(text, str):
+            size += len(text)
+    return size
+
+
+def _is_search_failure(normalized: Dict[str, Any]) -> bool:
+    """The server reports Outline errors as a "Search failed: ..." text."""
+    return any(
+        item.get("text", "").startswith(("Search failed", "Fetch failed"))
+        for item in normalized.get("content", [])
+    )
 
 
 class McpSearchClient:
     """
     Client for communicating with the MCP search server using MCP streamable HTTP transport.
+
+    With `persistent=True` all calls share one long-lived MCP session, opened
+    by `open()` (or on first use) and validated with `initialize` and
+    `list_tools`, so no call pays for the connection and handshake. A call
+    failing with a transport error drops the session; the next call reopens
+    it, and uses a one-off session while reopening fails.
     """
 
-    def __init__(self, mcp_server_url: str, timeout: int = 30):
+    # Seconds between attempts to reopen a failed shared session
+    REOPEN_INTERVAL = 5.0
+
+    def __init__(
+        self,
+        mcp_server_url: str,
+        timeout: int = 30,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        persistent: bool = False,
+        offloader: Optional[Offloader] = None,
+    ):
         """
         Initialize the MCP client.
 
         Args:
             mcp_server_url (str): The URL of the MCP server
             timeout (int): Request timeout in seconds (default: 30)
+            limiter (ConcurrencyLimiter, optional): Bounds concurrent searches
+            persistent (bool): Share one long-lived session between calls
+            offloader (Offloader, optional): Runs normalizing and parsing of
+                large results off the event loop; inline if omitted
         """
         if not mcp_server_url or not mcp_server_url.strip():
             raise ValueError("MCP server URL cannot be empty")
@@ -38,6 +123,16 @@ class McpSearchClient:
             base = f"{base}/mcp"
         self.mcp_url = base
         self.timeout = timeout
+        self.limiter = limiter or ConcurrencyLimiter("mcp")
+        self.persistent = persistent
+        self.offloader = offloader or Offloader()
+        self.tools: List[str] = []
+        self._shared = None
+        self._owner: Optional[asyncio.Task] = None
+        self._owner_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._open_lock: Optional[asyncio.Lock] = None
+        self._next_open = 0.0
 
     def _normalize_content(self, raw_content: Any) -> Dict[str, Any]:
         """
@@ -104,62 +199,311 @@ class McpSearchClient:
 
         return {"content": normalized_items}
 
-    async def search(self, query: str) -> Dict[str, Any]:
+    async def open(self) -> List[str]:
         """
-        Search for content using the MCP server via streamable HTTP transport.
-
-        Args:
-            query (str): The search query
+        Open the shared session and check that the server offers `search`.
 
         Returns:
-            Dict[str, Any]: The search results from the MCP server
+            List[str]: Names of the tools the server offers
+
+        Raises:
+            Exception: If the server cannot be reached or lacks `search`
         """
-        try:
-            logger.info(f"Searching MCP server with query: '{query}'")
+        loop = asyncio.get_running_loop()
+        if self._owner_loop is not loop:
+            # A session opened on another (finished) event loop is unusable
+            self._shared = self._owner = None
+            self._open_lock = asyncio.Lock()
+            self._owner_loop = loop
+        async with self._open_lock:
+            if self._shared is not None:
+                return self.tools
+            ready = loop.create_future()
+            self._stop = asyncio.Event()
+            self._owner = asyncio.create_task(self._hold_session(ready, self._stop))
+            try:
+                await ready
+            except Exception:
+                self._next_open = time.monotonic() + self.REOPEN_INTERVAL
+                raise
+        logger.info("Opened shared MCP session; tools=%s", ",".join(self.tools))
+        return self.tools
 
-            # Use streamablehttp_client as context manager for each request
+    async def _hold_session(self, ready: asyncio.Future, stop: asyncio.Event) -> None:
+        # anyio requires the transport and session contexts to be entered and
+        # exited in the same task, so one task owns them for their lifetime
+        ClientSession, streamablehttp_client = _load_mcp()
+        try:
             async with streamablehttp_client(
                 url=self.mcp_url, timeout=self.timeout
             ) as streams:
                 read_stream, write_stream, get_session_id = streams
-
-                # Create client session with the streams
                 async with ClientSession(read_stream, write_stream) as session:
-                    # Initialize the session
                     await session.initialize()
+                    listed = await session.list_tools()
+                    tools = [tool.name for tool in listed.tools]
+                    if "search" not in tools:
+                        raise RuntimeError(
+                            f"MCP server at {self.mcp_url} has no search tool"
+                        )
+                    self.tools = tools
+                    self._shared = session
+                    ready.set_result(None)
+                    await stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(
+                    e if isinstance(e, Exception) else RuntimeError(repr(e))
+                )
+            elif not stop.is_set():
+                logger.warning("Shared MCP session closed", exc_info=True)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            if self._stop is stop:
+                self._shared = None
 
-                    # Call the search tool
-                    result = await session.call_tool("search", {"query": query})
-
-                    # Handle different response formats
-                    if hasattr(result, "content"):
-                        # Result is a CallToolResult object with content attribute
-                        logger.info("MCP search completed successfully")
-                        return self._normalize_content(result.content)
-                    elif isinstance(result, dict) and "content" in result:
-                        logger.info("MCP search completed successfully")
-                        return self._normalize_content(result.get("content"))
-                    else:
-                        logger.warning("Unexpected MCP response format")
-                        return {
-                            "content": [{"type": "text", "text": "No results found"}]
-                        }
+    async def _shared_session(self):
+        """The shared session, (re)opened if needed; None when unavailable."""
+        if not self.persistent:
+            return None
+        if self._shared is not None and self._owner_loop is asyncio.get_running_loop():
+            return self._shared
+        if time.monotonic() < self._next_open:
+            return None
+        try:
+            await self.open()
+        except Exception:
+            logger.warning("Could not open shared MCP session", exc_info=True)
+            return None
+        return self._shared
+
+    def _drop_shared(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+        self._shared = None
+
+    @asynccontextmanager
+    async def _session(self):
+        """Yield an initialized MCP session, holding a limiter slot meanwhile."""
+        shared = await self._shared_session()
+        if shared is not None:
+            async with self.limiter:
+                try:
+                    yield shared
+                except Exception:
+                    # Most likely a broken connection; reopen on the next call
+                    self._drop_shared()
+                    raise
+            return
+
+        ClientSession, streamablehttp_client = _load_mcp()
+
+        # The limiter slot is freed as soon as the session ends or is cancelled
+        async with self.limiter, streamablehttp_client(
+            url=self.mcp_url, timeout=self.timeout
+        ) as streams:
+            read_stream, write_stream, get_session_id = streams
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                yield session
+
+    async def _call_search(
+        self,
+        session,
+        query: str,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        mode: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        arguments: Dict[str, Any] = {"query": query}
+        if limit is not None:
+            arguments["limit"] = limit
+        if offset is not None:
+            arguments["offset"] = offset
+        if mode is not None:
+            arguments["mode"] = mode
+        if collection_id is not None:
+            arguments["collectionId"] = collection_id
+        return await self._call_tool(session, "search", arguments)
+
+    async def _call_tool(
+        self, session, name: str, arguments: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        result = await session.call_tool(name, arguments)
+
+        # Handle different response formats
+        if hasattr(result, "content"):
+            # Result is a CallToolResult object with content attribute
+            logger.info("MCP search completed successfully", extra=SAMPLED)
+            normalized = await self._normalize(result.content)
+            if getattr(result, "isError", False) or _is_search_failure(normalized):
+                normalized["isError"] = True
+            return normalized
+        elif isinstance(result, dict) and "content" in result:
+            logger.info("MCP search completed successfully", extra=SAMPLED)
+            return await self._normalize(result.get("content"))
+        else:
+            logger.warning("Unexpected MCP response format")
+            return {"content": [{"type": "text", "text": "No results found"}]}
+
+    async def _normalize(self, raw_content: Any) -> Dict[str, Any]:
+        return await self.offloader.run(
+            self._normalize_content, raw_content, size=_content_size(raw_content)
+        )
+
+    async def _parse(self, content: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Parsed results of all text items of normalized `content`."""
+        results = []
+        for item in content:
+            if item.get("type") == "text":
+                text = item.get("text", "")
+                results.extend(
+                    await self.offloader.run(parse_search_results, text, size=len(text))
+                )
+        return results
 
-        except asyncio.TimeoutError:
+    def _error_result(self, error: BaseException) -> Dict[str, Any]:
+        if isinstance(error, asyncio.TimeoutError):
             logger.error("MCP server request timed out")
-            return {
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Search request timed out. Please try again.",
-                    }
-                ]
-            }
-        except Exception as e:
+            text = "Search request timed out. Please try again."
+        else:
             logger.exception("MCP client error")
-            return {"content": [{"type": "text", "text": f"Search failed: {str(e)}"}]}
+            text = f"Search failed: {str(error)}"
+        return {"content": [{"type": "text", "text": text}], "isError": True}
+
+    async def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        mode: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search for content using the MCP server via streamable HTTP transport.
+
+        Args:
+            query (str): The search query
+            limit (int, optional): Results per page; the server default if omitted
+            offset (int, optional): Number of results to skip
+            mode (str, optional): "full" or "snippet"; the server default if omitted
+            collection_id (str, optional): Only search this Outline collection
+
+        Returns:
+            Dict[str, Any]: The search results from the MCP server; failed or
+                timed out searches carry `"isError": True`
+        """
+        try:
+            logger.info("Searching MCP server; query_len=%d", len(query), extra=SAMPLED)
+            logger.debug("MCP search query: %r", query)
+            async with self._session() as session:
+                return await self._call_search(
+                    session, query, limit, offset, mode, collection_id
+                )
+        except Exception as e:
+            return self._error_result(e)
+
+    async def search_pages(
+        self,
+        query: str,
+        page_size: int,
+        max_results: int,
+        enough: Callable[[List[Dict[str, Any]]], bool],
+        mode: Optional[str] = None,
+        collection_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fetch search results page by page over one MCP session, only as far as needed.
+
+        After every page `enough(results)` is called with all results parsed so
+        far (see `parse_search_results`); the next page is requested only when
+        it returns False, the last page was full and fewer than `max_results`
+        results were fetched.
+
+        Returns:
+            Dict[str, Any]: The content of all fetched pages, like `search()`;
+                a failure after the first page keeps the pages already fetched
+        """
+        content: List[Dict[str, Any]] = []
+        results: List[Dict[str, Any]] = []
+        pages = 0
+        try:
+            logger.info("Searching MCP server; query_len=%d", len(query), extra=SAMPLED)
+            async with self._session() as session:
+                while len(results) < max_results:
+                    limit = min(page_size, max_results - len(results))
+                    page = await self._call_search(
+                        session, query, limit, len(results), mode, collection_id
+                    )
+                    if page.get("isError"):
+                        if not pages:
+                            return page
+                        break
+                    pages += 1
+                    content.extend(page["content"])
+                    page_results = await self._parse(page["content"])
+                    results.extend(page_results)
+                    if len(page_results) < limit or enough(results):
+                        break
+        except Exception as e:
+            if not pages:
+                return self._error_result(e)
+            logger.warning("MCP search failed after %d pages", pages, exc_info=True)
+
+        logger.info(
+            "Fetched %d search pages; results=%d", pages, len(results), extra=SAMPLED
+        )
+        return {"content": content}
+
+    async def fetch_documents(
+        self, document_ids: List[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fetch full documents with the `fetch_document` tool, concurrently over one session.
+
+        Returns:
+            Dict[str, Optional[Dict[str, Any]]]: Parsed document (as in
+                `parse_search_results`) per id, or None when it could not be fetched
+        """
+
+        async def fetch_one(session, document_id: str) -> Optional[Dict[str, Any]]:
+            result = await self._call_tool(
+                session, "fetch_document", {"id": document_id}
+            )
+            if result.get("isError"):
+                logger.warning("Document fetch failed; id=%s", document_id)
+                return None
+            parsed = await self._parse(result["content"])
+            return parsed[0] if parsed else None
+
+        if not document_ids:
+            return {}
+        try:
+            async with self._session() as session:
+                documents = await asyncio.gather(
+                    *(fetch_one(session, document_id) for document_id in document_ids)
+                )
+        except Exception:
+            logger.exception("MCP document fetch failed")
+            return {document_id: None for document_id in document_ids}
+        return dict(zip(document_ids, documents))
 
     async def close(self):
-        """Close the MCP client session."""
-        # Streamable HTTP client uses per-request context managers; nothing persistent to close
+        """Close the shared MCP session, if any."""
+        owner = self._owner
+        self._drop_shared()
+        self._owner = None
+        if (
+            owner is not None
+            and not owner.done()
+            and self._owner_loop is asyncio.get_running_loop()
+        ):
+            try:
+                await asyncio.wait_for(owner, 5.0)
+            except Exception:
+                logger.warning(
+                    "Shared MCP session did not close cleanly", exc_info=True
+                )
         logger.info("MCP client closed")
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class Metrics:
+    """
+    Process-wide counters, exposed as JSON on the A2A server's `/metrics`.
+
+    Counters are plain integers updated from the event loop, so no locking is
+    needed; names are dotted, e.g. `router.small_talk` or `llm.calls_saved`.
+    Gauges report a current value (e.g. memory held) read when the snapshot
+    is taken.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, Callable[[], int]] = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        self._counters[name] += value
+
+    def gauge(self, name: str, read: Callable[[], int]) -> None:
+        """Report `read()` under `name`; registering a name again replaces it."""
+        self._gauges[name] = read
+
+    def get(self, name: str) -> int:
+        read = self._gauges.get(name)
+        if read is not None:
+            return read()
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        values = dict(self._counters)
+        values.update((name, read()) for name, read in self._gauges.items())
+        return dict(sorted(values.items()))
+
+    def reset(self) -> None:
+        self._counters.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from .logging_utils import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+
+class Offloader:
+    """
+    Run CPU-heavy stages of the retrieval pipeline off the event loop.
+
+    Inputs smaller than `min_size` characters are processed inline: handing
+    them to a pool costs more than the work itself. Larger ones go to a
+    thread pool, or, for pure-Python work marked `cpu=True`, to a process
+    pool when `processes` is set. A thread still shares the GIL with the
+    loop, but the interpreter switches threads every few milliseconds, so a
+    long stage no longer blocks other requests for its whole duration; a
+    process takes it off the GIL entirely at the cost of pickling the
+    arguments and the result.
+    """
+
+    def __init__(self, threads: int = 0, processes: int = 0, min_size: int = 65536):
+        """
+        Args:
+            threads (int): Thread pool size; 0 runs everything inline
+            processes (int): Process pool size for `cpu=True` stages; 0 uses threads
+            min_size (int): Inputs below this many characters stay inline
+        """
+        self.threads = threads
+        self.processes = processes
+        self.min_size = min_size
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "Offloader":
+        return cls(
+            threads=int(os.getenv("OFFLOAD_THREADS", "4")),
+            processes=int(os.getenv("OFFLOAD_PROCESSES", "0")),
+            min_size=int(os.getenv("OFFLOAD_MIN_SIZE", "65536")),
+        )
+
+    async def run(
+        self, fn: Callable[..., Any], *args: Any, size: int, cpu: bool = False
+    ) -> Any:
+        """
+        Call `fn(*args)` inline or in a pool, depending on `size`.
+
+        `fn` and its arguments must be picklable for `cpu=True` stages.
+        """
+        executor = self._executor(cpu) if size >= self.min_size else None
+        if executor is None:
+            return fn(*args)
+        metrics.inc(
+            "offload.process" if executor is self._process_pool else "offload.thread"
+        )
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def _executor(self, cpu: bool) -> Optional[Executor]:
+        if cpu and self.processes > 0:
+            if self._process_pool is None:
+                # spawn: forking a process that runs threads can deadlock
+                self._process_pool = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info("Started offload process pool; workers=%d", self.processes)
+            return self._process_pool
+        if self.threads > 0:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    self.threads, thread_name_prefix="offload"
+                )
+            return self._thread_pool
+        return None
+
+    def close(self) -> None:
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = None
+        self._process_pool = None
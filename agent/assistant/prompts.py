@@ -27,6 +27,32 @@ Keywords/Phrases:
 ).strip()
 
 
+KEYWORD_BATCH_TEMPLATE = (
+    """
+You are a search query optimizer for a corporate wiki system. For each of the numbered user questions below, extract the most relevant keywords and search phrases to help find the most accurate information in the wiki.
+
+Questions:
+{questions}
+
+Instructions:
+1. Handle every question independently of the others
+2. Extract 2-4 most important keywords or short phrases (1-3 words each) per question
+3. Focus on technical terms, product names, processes, policies, or specific concepts
+4. Avoid generic words like "what", "how", "when", "where", "why"
+5. Separate keywords/phrases with a comma
+6. Do not translate keywords/phrases to English, use the language of the word in the question
+7. Return only a JSON object that maps each question number (as a string) to its keywords, no explanations
+
+Example:
+Questions:
+1. What is our remote work policy?
+2. Как настроить Jenkins pipeline?
+
+{{"1": "remote, work, policy", "2": "Jenkins, настройка, pipeline"}}
+"""
+).strip()
+
+
 QA_TEMPLATE = (
     """You are a helpful corporate wiki assistant. Your role is to provide accurate information based on the available documents in the wiki.
 
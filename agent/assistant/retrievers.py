@@ -1,56 +1,523 @@
 import asyncio
 import logging
-from dataclasses import dataclass
-from typing import List
+from collections import deque
+from typing import Dict, List, Optional, Tuple
 
-from .mcp_client import McpSearchClient
-from .logging_utils import get_logger
+from .cache import TTLCache
+from .collection_router import CollectionRouter
+from .document_store import DocumentStore, StoredText, Text, TextParts, text_of
+from .local_index import LocalSearchIndex, document_terms
+from .mcp_client import McpSearchClient, parse_search_results
+from .metrics import metrics
+from .offload import Offloader
+from .logging_utils import SAMPLED, get_logger
 
 logger = get_logger(__name__)
 
 
-@dataclass
 class RetrievedDocument:
-    page_content: str
-    metadata: dict
+    """A retrieved document; its content may reference the shared document store."""
+
+    __slots__ = ("content", "metadata")
+
+    def __init__(self, page_content: Text, metadata: dict):
+        self.content = page_content
+        self.metadata = metadata
+
+    @property
+    def page_content(self) -> str:
+        return text_of(self.content)
+
+    def __repr__(self) -> str:
+        return f"RetrievedDocument({len(self.content)} chars, {self.metadata!r})"
+
+
+def _count_results(text: Text) -> int:
+    """Search results in a result text, counted by their URL lines."""
+    parts = text.parts if isinstance(text, TextParts) else (text,)
+    # Headers stay plain strings when texts move to the document store
+    return sum(p.count("\n   URL: ") for p in parts if isinstance(p, str))
+
+
+def _cache_key(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _document_key(hit: dict) -> tuple:
+    return (hit["id"], hit["updated_at"])
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about 4 characters per token)."""
+    return len(text) // 4
 
 
 class McpKeywordEnhancedRetriever:
     """Keyword-enhanced retriever without LangChain.
 
-    Expects a callable `keyword_fn(question: str) -> str` that returns comma-separated keywords.
+    Expects an async callable `keyword_fn(question: str) -> str` that returns comma-separated keywords.
+
+    With a `local_index`, every document returned by MCP is also indexed
+    locally, and the index answers the search when MCP fails or does not
+    respond within `search_deadline` seconds. With `local_first=True` the
+    index is asked first and MCP is skipped when its best hit scores at
+    least `local_min_score`.
+
+    Optional `keyword_cache` and `search_cache` keep extracted keywords per
+    question and successful MCP results per keyword query; `warm()` fills
+    them ahead of user traffic.
+
+    With `page_size` set, MCP results are fetched in pages of that size and
+    further pages are requested only while the context is below
+    `context_token_budget` tokens, the last hit still ranks at least
+    `min_ranking` and fewer than `max_results` results were fetched.
+
+    With `snippet_mode`, MCP returns short excerpts with document ids in a
+    single page of `max_results` (no paging); only the `fetch_top_k` best
+    hits are then fetched in full (concurrently) and the rest stay
+    snippets. The search and the fetch share one `search_deadline`. Full
+    documents are memoized in `document_cache` by id and update time, so an
+    edited document is fetched again.
+
+    Cached search results and documents are tagged with the ids of the wiki
+    documents they contain; `invalidate_document()` drops exactly those, e.g.
+    when Outline reports a change, so the caches can use long TTLs.
+
+    Parsing large MCP payloads, tokenizing documents for the local index and
+    compacting it run through `offloader`, off the event loop once they are
+    large enough.
+
+    With a `collection_router`, MCP is first asked within the collections the
+    router picks for the keyword query, and the whole wiki is searched only
+    when they return nothing. Global results teach the router.
+
+    With a `document_store`, the texts of cached search results, fetched
+    documents and the returned documents are references into the store,
+    which holds each distinct text once.
     """
 
-    def __init__(self, mcp_client: McpSearchClient, keyword_fn):
+    def __init__(
+        self,
+        mcp_client: McpSearchClient,
+        keyword_fn,
+        local_index: Optional[LocalSearchIndex] = None,
+        search_deadline: Optional[float] = None,
+        local_first: bool = False,
+        local_min_score: float = 5.0,
+        local_limit: int = 2,
+        keyword_cache: Optional[TTLCache] = None,
+        search_cache: Optional[TTLCache] = None,
+        page_size: int = 0,
+        max_results: int = 4,
+        context_token_budget: int = 1500,
+        min_ranking: float = 0.0,
+        snippet_mode: bool = False,
+        fetch_top_k: int = 2,
+        document_cache: Optional[TTLCache] = None,
+        offloader: Optional[Offloader] = None,
+        collection_router: Optional[CollectionRouter] = None,
+        document_store: Optional[DocumentStore] = None,
+    ):
         self.mcp_client = mcp_client
         self.keyword_fn = keyword_fn
+        self.local_index = local_index
+        self.search_deadline = search_deadline
+        self.local_first = local_first
+        self.local_min_score = local_min_score
+        self.local_limit = local_limit
+        self.keyword_cache = keyword_cache
+        self.search_cache = search_cache
+        self.page_size = page_size
+        self.max_results = max_results
+        self.context_token_budget = context_token_budget
+        self.min_ranking = min_ranking
+        self.snippet_mode = snippet_mode
+        self.fetch_top_k = fetch_top_k
+        self.document_cache = document_cache
+        # Without an offloader everything runs inline
+        self.offloader = offloader or Offloader()
+        self.collection_router = collection_router
+        self.document_store = document_store
+        # Bumped by every invalidation; results of searches that were running
+        # meanwhile are not cached, they may predate the change
+        self._generation = 0
+        self._compaction: Optional[asyncio.Future] = None
 
     async def invoke(self, query: str) -> List[RetrievedDocument]:
         return await self._ainvoke(query)
 
     async def _ainvoke(self, query: str) -> List[RetrievedDocument]:
-        logger.info(f"🤔 Original question: '{query}'")
+        logger.debug("🤔 Original question: %r", query)
 
         try:
-            extracted_keywords = self.keyword_fn(query).strip()
-            logger.info(f"🔑 Extracted keywords: '{extracted_keywords}'")
+            extracted_keywords = await self._keywords(query)
+            logger.info("🔑 Extracted keywords: %r", extracted_keywords, extra=SAMPLED)
 
-            mcp_result = await self.mcp_client.search(extracted_keywords)
-            documents = self._parse_mcp_response(mcp_result)
-            logger.info(f"📄 MCP server returned {len(documents)} documents")
+            documents = await self._search(extracted_keywords, query)
+            logger.info("📄 Search returned %d documents", len(documents), extra=SAMPLED)
             return documents
 
         except Exception as e:
             logger.exception("❌ Error in keyword extraction or MCP search")
-            logger.info(f"🔄 Falling back to original query: '{query}'")
+            logger.info("🔄 Falling back to original query; query_len=%d", len(query))
             try:
-                mcp_result = await self.mcp_client.search(query)
-                documents = self._parse_mcp_response(mcp_result)
-                return documents
+                return await self._search(query, query)
             except Exception as fallback_error:
                 logger.exception("❌ Fallback search also failed")
                 return []
 
+    async def _search(
+        self, search_query: str, question: str
+    ) -> List[RetrievedDocument]:
+        """Search MCP, using the local index first or as a fallback if configured."""
+        local_query = f"{search_query} {question}"
+        if self.local_index is not None and self.local_first:
+            documents = self._search_local(local_query, self.local_min_score)
+            if documents:
+                logger.info("📚 Served search from local index", extra=SAMPLED)
+                return documents
+
+        deadline = None
+        if self.search_deadline is not None:
+            deadline = asyncio.get_running_loop().time() + self.search_deadline
+        mcp_result = await self._mcp_search(search_query)
+        if mcp_result is None or mcp_result.get("isError"):
+            if self.local_index is None:
+                return self._parse_mcp_response(mcp_result or {})
+            documents = self._search_local(local_query)
+            logger.warning(
+                "MCP search unavailable; local index returned %d documents",
+                len(documents),
+            )
+            return documents
+
+        hits = await self._snippet_hits(mcp_result)
+        if hits:
+            return await self._expand_snippets(hits, deadline)
+        return self._parse_mcp_response(mcp_result)
+
+    async def warm(self, question: str, refresh_within: float = 0.0) -> None:
+        """
+        Run keyword extraction and MCP search for `question` to fill the caches.
+
+        Cached entries are reused unless they expire within `refresh_within`
+        seconds, in which case they are recomputed.
+        """
+        keywords = await self._keywords(question, refresh_within)
+        mcp_result = await self._mcp_search(keywords or question, refresh_within)
+        if mcp_result is not None and not mcp_result.get("isError"):
+            hits = await self._snippet_hits(mcp_result)
+            if hits:
+                await self._expand_snippets(hits)
+
+    async def _keywords(self, question: str, refresh_within: float = 0.0) -> str:
+        cache = self.keyword_cache
+        key = _cache_key(question)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None and cache.remaining(key) > refresh_within:
+            metrics.inc("cache.keywords.hits")
+            return cached
+
+        keywords = (await self.keyword_fn(question)).strip()
+        if cache is not None and keywords:
+            cache.set(key, keywords)
+        return keywords
+
+    async def _mcp_search(
+        self, search_query: str, refresh_within: float = 0.0
+    ) -> Optional[dict]:
+        """MCP search with deadline and cache; None when the deadline passed."""
+        cache = self.search_cache
+        key = _cache_key(search_query)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None and cache.remaining(key) > refresh_within:
+            metrics.inc("cache.search.hits")
+            return cached
+
+        generation = self._generation
+        try:
+            mcp_result, results = await asyncio.wait_for(
+                self._routed_search(search_query), self.search_deadline
+            )
+        except asyncio.TimeoutError:
+            logger.warning("MCP search exceeded %.1fs deadline", self.search_deadline)
+            return None
+
+        if not mcp_result.get("isError"):
+            await self._index_results(results)
+            mcp_result = self._store_results(mcp_result, results)
+            if cache is not None and generation == self._generation:
+                cache.set(
+                    key,
+                    mcp_result,
+                    tags=[r["id"] for r in results if r["id"] is not None],
+                )
+        return mcp_result
+
+    async def _routed_search(self, search_query: str) -> Tuple[dict, List[dict]]:
+        """
+        MCP search in the routed collections first, then in the whole wiki.
+
+        Returns:
+            Tuple[dict, List[dict]]: The MCP result and its parsed hits
+        """
+        router = self.collection_router
+        for collection_id in router.route(search_query) if router else []:
+            mcp_result = await self._search_mcp(search_query, collection_id)
+            if not mcp_result.get("isError"):
+                results = await self._parse_results(mcp_result)
+                if results:
+                    metrics.inc("collections.routed")
+                    return mcp_result, results
+            metrics.inc("collections.fallbacks")
+
+        mcp_result = await self._search_mcp(search_query)
+        if mcp_result.get("isError"):
+            return mcp_result, []
+        results = await self._parse_results(mcp_result)
+        if router is not None:
+            metrics.inc("collections.global")
+            router.learn(search_query, results)
+        return mcp_result, results
+
+    async def _search_mcp(
+        self, search_query: str, collection_id: Optional[str] = None
+    ) -> dict:
+        if self.snippet_mode:
+            # The context is mostly the fetched full texts, so the size of the
+            # snippets says nothing about it; one page holds every candidate
+            return await self.mcp_client.search(
+                search_query,
+                limit=self.max_results,
+                mode="snippet",
+                collection_id=collection_id,
+            )
+        if self.page_size > 0:
+            return await self.mcp_client.search_pages(
+                search_query,
+                self.page_size,
+                self.max_results,
+                self._enough,
+                collection_id=collection_id,
+            )
+        return await self.mcp_client.search(search_query, collection_id=collection_id)
+
+    def _enough(self, results: List[dict]) -> bool:
+        """Whether the results fetched so far make a sufficient context."""
+        tokens = sum(estimate_tokens(r["text"]) for r in results)
+        if tokens >= self.context_token_budget:
+            return True
+        # Later pages rank lower still, so stop once hits fall below the threshold
+        last_ranking = results[-1]["ranking"] if results else None
+        return last_ranking is not None and last_ranking < self.min_ranking
+
+    def _store_results(self, mcp_result: dict, results: List[dict]) -> dict:
+        """
+        `mcp_result` with the texts of its results moved to the document store.
+
+        Headers and separators stay plain strings, so the content reads
+        exactly as before; only texts of at least the store's `min_size` move.
+        """
+        store = self.document_store
+        if store is None or not store.enabled:
+            return mcp_result
+        pending = deque(r["text"] for r in results if len(r["text"]) >= store.min_size)
+        if not pending:
+            return mcp_result
+
+        content = []
+        for item in mcp_result.get("content") or []:
+            text = item.get("text")
+            parts, position = [], 0
+            while pending and isinstance(text, str):
+                start = text.find(pending[0], position)
+                if start < 0:
+                    # The next result is on a later page
+                    break
+                body = pending.popleft()
+                parts += [text[position:start], store.put(body)]
+                position = start + len(body)
+            if parts:
+                parts.append(text[position:])
+                item = dict(item, text=TextParts(parts))
+            content.append(item)
+        return dict(mcp_result, content=content)
+
+    async def _parse_results(self, mcp_result: dict) -> List[dict]:
+        hits = []
+        for item in mcp_result.get("content") or []:
+            if item.get("type") == "text":
+                text = text_of(item.get("text", ""))
+                hits.extend(
+                    await self.offloader.run(parse_search_results, text, size=len(text))
+                )
+        return hits
+
+    async def _snippet_hits(self, mcp_result: dict) -> List[dict]:
+        """Parsed hits of a snippet-mode result; empty for full-text results."""
+        if not self.snippet_mode:
+            return []
+        hits = await self._parse_results(mcp_result)
+        # A server without snippet mode ignores `mode` and returns full
+        # documents without ids
+        if not hits or any(hit["id"] is None for hit in hits):
+            return []
+        return hits
+
+    async def _expand_snippets(
+        self, hits: List[dict], deadline: Optional[float] = None
+    ) -> List[RetrievedDocument]:
+        """Replace the top hits' snippets with full documents, fetched by `deadline`."""
+        cache = self.document_cache
+        full = {}
+        missing = []
+        for hit in hits[: self.fetch_top_k]:
+            cached = cache.get(_document_key(hit)) if cache is not None else None
+            if cached is not None:
+                metrics.inc("cache.documents.hits")
+                full[hit["id"]] = cached
+            else:
+                missing.append(hit)
+
+        if missing:
+            generation = self._generation
+            # What the search left of the deadline
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+            try:
+                fetched = await asyncio.wait_for(
+                    self.mcp_client.fetch_documents([hit["id"] for hit in missing]),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Document fetch exceeded %.1fs search deadline",
+                    self.search_deadline,
+                )
+                fetched = {}
+            for hit in missing:
+                document = fetched.get(hit["id"])
+                if document is None:
+                    continue
+                metrics.inc("documents.fetched")
+                await self._index_document(document, key=hit["id"])
+                if self.document_store is not None:
+                    document = dict(
+                        document, text=self.document_store.put(document["text"])
+                    )
+                full[hit["id"]] = document
+                if cache is not None and generation == self._generation:
+                    cache.set(_document_key(hit), document, tags=[hit["id"]])
+
+        documents = []
+        for hit in hits:
+            document = full.get(hit["id"], hit)
+            head = f"**{document['title']}**\nURL: {document['url']}\nText: "
+            text = document["text"]
+            documents.append(
+                RetrievedDocument(
+                    page_content=(
+                        TextParts((head, text))
+                        if isinstance(text, StoredText)
+                        else head + text
+                    ),
+                    metadata={
+                        "source": "mcp_search",
+                        "id": hit["id"],
+                        "url": hit["url"],
+                        "ranking": hit["ranking"],
+                        "full_text": hit["id"] in full,
+                    },
+                )
+            )
+        return documents
+
+    def _search_local(
+        self, query: str, min_score: float = 0.0
+    ) -> List[RetrievedDocument]:
+        hits = self.local_index.search(query, limit=self.local_limit)
+        if not hits or hits[0].score < min_score:
+            return []
+        return [
+            RetrievedDocument(
+                page_content=(
+                    f"**{hit.document.title}**\n"
+                    f"URL: {hit.document.url}\n"
+                    f"Text: {hit.document.text}"
+                ),
+                metadata={
+                    "source": "local_index",
+                    "url": hit.document.url,
+                    "score": hit.score,
+                },
+            )
+            for hit in hits
+        ]
+
+    def invalidate_document(
+        self, document_id: str, deleted: bool = False
+    ) -> Dict[str, int]:
+        """
+        Drop the cached search results and documents that contain `document_id`.
+
+        With `deleted`, the document is also removed from the local index.
+
+        Returns:
+            Dict[str, int]: Number of entries dropped per cache
+        """
+        self._generation += 1
+        dropped = {}
+        for name, cache in (
+            ("search", self.search_cache),
+            ("documents", self.document_cache),
+        ):
+            if cache is not None:
+                dropped[name] = cache.invalidate(document_id)
+        if deleted and self.local_index is not None:
+            dropped["local_index"] = int(self.local_index.discard(document_id))
+        return dropped
+
+    async def _index_results(self, results: List[dict]) -> None:
+        if self.local_index is None:
+            return
+        for result in results:
+            # Snippets are indexed once fetched in full
+            if self.snippet_mode and result["id"] is not None:
+                continue
+            await self._index_document(result, key=result["id"])
+
+    async def _index_document(self, document: dict, key: Optional[str] = None) -> None:
+        index = self.local_index
+        if index is None:
+            return
+        title, url, text = document["title"], document["url"], document["text"]
+        if index.contains(title, url, text, key):
+            return
+        # Tokenizing is pure Python and by far the slowest step; the index
+        # itself is only updated on the event loop
+        terms = await self.offloader.run(
+            document_terms, title, text, size=len(text), cpu=True
+        )
+        index.add(title, url, text, key=key, terms=terms)
+        if index.needs_compaction and (
+            self._compaction is None or self._compaction.done()
+        ):
+            self._compaction = asyncio.ensure_future(self._compact_index())
+
+    async def _compact_index(self) -> None:
+        # Rebuilding walks every posting; the index keeps serving meanwhile
+        # and replays the documents added before the rebuilt one is swapped in
+        index = self.local_index
+        rebuild = index.begin_compaction()
+        rebuilt = None
+        try:
+            rebuilt = await self.offloader.run(rebuild, size=index.size)
+        except Exception:
+            logger.exception("Local index compaction failed")
+        finally:
+            index.end_compaction(rebuilt)
+
     def _parse_mcp_response(self, mcp_result: dict) -> List[RetrievedDocument]:
         documents: List[RetrievedDocument] = []
 
@@ -59,10 +526,12 @@ class McpKeywordEnhancedRetriever:
                 for content_item in mcp_result["content"]:
                     if content_item.get("type") == "text":
                         text = content_item.get("text", "")
+                        # Texts moved to the document store are always results
+                        plain = text if isinstance(text, str) else ""
                         if (
                             text
-                            and not text.startswith("No results found")
-                            and not text.startswith("Search failed")
+                            and not plain.startswith("No results found")
+                            and not plain.startswith("Search failed")
                         ):
                             documents.append(
                                 RetrievedDocument(
@@ -70,6 +539,8 @@ class McpKeywordEnhancedRetriever:
                                     metadata={
                                         "source": "mcp_search",
                                         "query": "search_result",
+                                        # One text holds every result in full mode
+                                        "results": max(1, _count_results(text)),
                                     },
                                 )
                             )
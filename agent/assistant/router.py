@@ -0,0 +1,137 @@
+import re
+from enum import Enum
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-яё]", re.IGNORECASE)
+
+_GREETINGS = frozenset(
+    """
+    hi hello hey yo hiya greetings morning evening
+    привет приветствую здравствуй здравствуйте здорово хай добрый доброе утро
+    день вечер салют
+    """.split()
+)
+_THANKS = frozenset(
+    """
+    thanks thank thx ty cheers great cool ok okay nice perfect awesome
+    спасибо спс благодарю пасиб отлично супер класс понятно ясно ок окей хорошо
+    круто
+    """.split()
+)
+_GOODBYES = frozenset(
+    """
+    bye goodbye later cya
+    пока свидания до встречи всего доброго
+    """.split()
+)
+# Words that may pad a small-talk message without making it a question
+_FILLER = frozenset(
+    """
+    you there again so much very a the all good bot
+    тебе вам бот большое очень всем еще раз ну и а
+    """.split()
+)
+
+# Markers of a message that only makes sense with the previous turn
+_FOLLOW_UP = frozenset(
+    """
+    more detail details elaborate example examples about it that this those these
+    there step steps why tell explain show
+    подробнее подробно детали поясни поясните объясни объясните пример примеры
+    еще насчет про это этом этого этот эта эти него нее них там тут шаг шаги
+    почему зачем расскажи расскажите покажи покажите
+    """.split()
+)
+_FOLLOW_UP_MAX_WORDS = 6
+# Function words that never make a message a new question; any other word
+# missing from the previous question, however short ("VPN", "API"), does
+_STOP_WORDS = frozenset(
+    """
+    a an the of to in on at by for from with and or but is are was be do does
+    did can could how what which who when where it its me my we our i
+    в во на о об обо по с со к ко у из от до за для при без над под и а но или
+    ли же бы не ни да нет то так как что где когда кто мне нам меня нас мы я ты
+    вы он она оно они его ее их ей им можно какой какая какие каким
+    """.split()
+)
+
+
+class Route(str, Enum):
+    EMPTY = "empty"
+    SMALL_TALK = "small_talk"
+    FOLLOW_UP = "follow_up"
+    WIKI = "wiki"
+
+
+def _words(message: str) -> list:
+    return _WORD_RE.findall(message.lower().replace("ё", "е"))
+
+
+def classify(message: str, previous_question: str = "") -> Route:
+    """
+    Classify a user message with cheap rules, no LLM call.
+
+    A message is a follow-up only when the session has a previous question,
+    the message is short, contains a follow-up marker ("подробнее", "why",
+    "это") and brings no new content words that would need a new search.
+
+    Args:
+        message (str): The user's message
+        previous_question (str): The session's previous wiki question, if any
+
+    Returns:
+        Route: EMPTY, SMALL_TALK, FOLLOW_UP or WIKI
+    """
+    words = _words(message or "")
+    if not words:
+        return Route.EMPTY
+
+    small_talk = _GREETINGS | _THANKS | _GOODBYES
+    if len(words) <= 5 and all(w in small_talk or w in _FILLER for w in words):
+        if any(w in small_talk for w in words):
+            return Route.SMALL_TALK
+
+    if previous_question and len(words) <= _FOLLOW_UP_MAX_WORDS:
+        known = set(_words(previous_question)) | _FOLLOW_UP | _FILLER
+        new_terms = [
+            w for w in words if not w.isdigit() and w not in known | _STOP_WORDS
+        ]
+        if not new_terms and any(w in _FOLLOW_UP for w in words):
+            return Route.FOLLOW_UP
+
+    return Route.WIKI
+
+
+def canned_reply(message: str, route: Route) -> str:
+    """Reply to small talk or an empty message without calling the LLM."""
+    russian = bool(_CYRILLIC_RE.search(message or ""))
+    words = set(_words(message or ""))
+
+    if route is Route.EMPTY:
+        if russian:
+            return "Задайте вопрос о корпоративной вики, и я поищу ответ."
+        return "Ask me a question about the corporate wiki and I will look it up."
+    if words & _GOODBYES:
+        return "До встречи! 👋" if russian else "Goodbye! 👋"
+    if words & _THANKS:
+        if russian:
+            return "Пожалуйста! Если появятся вопросы по вики, спрашивайте."
+        return "You're welcome! Ask me anything else about the wiki."
+    if russian:
+        return "Привет! 👋 Я помогаю искать информацию в корпоративной вики. Что вас интересует?"
+    return "Hi! 👋 I help find information in the corporate wiki. What would you like to know?"
+
+
+def no_documents_reply(question: str) -> str:
+    """Answer used when retrieval found nothing, instead of a QA LLM call."""
+    if _CYRILLIC_RE.search(question or ""):
+        return (
+            "К сожалению, я не нашёл в вики информации по этому вопросу. "
+            "Попробуйте переформулировать вопрос другими словами или обратитесь "
+            "к администраторам вики, если считаете, что эта информация должна там быть."
+        )
+    return (
+        "Sorry, I couldn't find information on this topic in the wiki. "
+        "Try rephrasing your question with different keywords, or contact the "
+        "wiki administrators if you believe this information should be there."
+    )
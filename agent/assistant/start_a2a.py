@@ -1,4 +1,6 @@
 import os
+import time
+from contextlib import asynccontextmanager
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
@@ -8,27 +10,132 @@ from a2a.types import (
     AgentCard,
 )
 from dotenv import load_dotenv
-from .logging_utils import get_logger, set_global_log_level
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from .logging_utils import configure_logging, get_logger
 
 from .agent_task_manager import MyAgentExecutor
+from .diagnostics import Diagnostics
+from .metrics import metrics
+from .warmup import WarmUp
+from .webhooks import OutlineWebhook
+
+import logging
+
+
+logger = get_logger(__name__)
 
-try:
-    from phoenix.otel import register  # type: ignore
-except Exception:  # pragma: no cover - optional dependency
 
-    def register(*args, **kwargs):  # type: ignore
+def register(*args, **kwargs):
+    """Register Phoenix tracing; phoenix is imported only when tracing is enabled."""
+    try:
+        from phoenix.otel import register as phoenix_register  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency
+        logger.warning("ENABLE_PHOENIX is set but arize-phoenix-otel is not installed")
         return None
+    return phoenix_register(*args, **kwargs)
 
 
-import logging
+async def metrics_endpoint(request: Request) -> JSONResponse:
+    """Process counters, e.g. router decisions and saved LLM calls."""
+    return JSONResponse(metrics.snapshot())
 
 
-load_dotenv()
-set_global_log_level(os.getenv("LOG_LEVEL", "INFO"))
-logger = get_logger(__name__)
+def shutdown_timeout() -> float:
+    """Seconds in-flight requests get to finish on shutdown."""
+    return float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
+
+def drain_timeout(app) -> float:
+    """
+    What is left of the shutdown timeout once the server stopped accepting requests.
+
+    Uvicorn first waits up to the same timeout for open connections, so
+    draining for the full timeout again could double the shutdown time.
+    """
+    started = getattr(app.state, "shutdown_started", None)
+    if started is None:
+        return shutdown_timeout()
+    return max(0.0, shutdown_timeout() - (time.monotonic() - started))
+
+
+def build_app():
+    """Build the A2A Starlette application from environment settings."""
+    capabilities = AgentCapabilities(streaming=True)
+    diagnostics = Diagnostics.from_env()
+    my_agent_executor = MyAgentExecutor(diagnostics=diagnostics)
+    agent_card = AgentCard(
+        name=os.getenv("AGENT_NAME", "Wiki Agent"),
+        description=os.getenv(
+            "AGENT_DESCRIPTION", "Answers questions via corporate wiki using MCP"
+        ),
+        url=os.getenv("URL_AGENT"),
+        version=os.getenv("AGENT_VERSION", "1.0.0"),
+        default_input_modes=my_agent_executor.agent.SUPPORTED_CONTENT_TYPES,
+        default_output_modes=my_agent_executor.agent.SUPPORTED_CONTENT_TYPES,
+        capabilities=capabilities,
+        skills=[],
+    )
+    logger.info(
+        "Agent card created; name=%s version=%s",
+        agent_card.name,
+        agent_card.version,
+    )
+    assistant = my_agent_executor.agent.assistant
+    warmup = WarmUp.from_env(assistant.warm)
+    webhook = OutlineWebhook.from_env(assistant.invalidate_document)
+    startup_checks: dict = {}
+
+    async def ready_endpoint(request: Request) -> JSONResponse:
+        """Readiness: 503 until the startup cache warm-up has finished."""
+        status = dict(warmup.status(), startup=startup_checks)
+        return JSONResponse(status, status_code=200 if warmup.ready else 503)
+
+    request_handler = DefaultRequestHandler(
+        agent_executor=my_agent_executor,
+        task_store=InMemoryTaskStore(),
+    )
+    server = A2AStarletteApplication(
+        agent_card=agent_card, http_handler=request_handler
+    )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Uvicorn opens the port only after startup, so the first request
+        # finds the connections open and LiteLLM imported
+        await diagnostics.start()
+        startup_checks.update(await assistant.start())
+        failed = [name for name, check in startup_checks.items() if not check["ok"]]
+        if failed and os.getenv("STARTUP_STRICT", "false").lower() == "true":
+            await assistant.close()
+            await diagnostics.stop()
+            raise RuntimeError(f"Startup checks failed: {', '.join(failed)}")
+        await warmup.start()
+        try:
+            yield
+        finally:
+            # Uvicorn has stopped accepting requests; let running tasks finish
+            await warmup.stop()
+            await my_agent_executor.drain(drain_timeout(app))
+            await assistant.close()
+            await diagnostics.stop()
+
+    return server.build(
+        routes=[
+            Route("/metrics", metrics_endpoint),
+            Route("/ready", ready_endpoint),
+            *diagnostics.routes(),
+            *webhook.routes(),
+        ],
+        lifespan=lifespan,
+    )
 
 
 def main():
+    load_dotenv()
+    configure_logging()
     try:
         logger.info("Starting A2A application")
         if os.getenv("ENABLE_PHOENIX", "false").lower() == "true":
@@ -38,37 +145,25 @@ def main():
                 auto_instrument=True,
             )
 
-        capabilities = AgentCapabilities(streaming=True)
-        my_agent_executor = MyAgentExecutor()
-        agent_card = AgentCard(
-            name=os.getenv("AGENT_NAME", "Wiki Agent"),
-            description=os.getenv(
-                "AGENT_DESCRIPTION", "Answers questions via corporate wiki using MCP"
-            ),
-            url=os.getenv("URL_AGENT"),
-            version=os.getenv("AGENT_VERSION", "1.0.0"),
-            default_input_modes=my_agent_executor.agent.SUPPORTED_CONTENT_TYPES,
-            default_output_modes=my_agent_executor.agent.SUPPORTED_CONTENT_TYPES,
-            capabilities=capabilities,
-            skills=[],
-        )
-        logger.info(
-            "Agent card created; name=%s version=%s",
-            agent_card.name,
-            agent_card.version,
-        )
-        request_handler = DefaultRequestHandler(
-            agent_executor=my_agent_executor,
-            task_store=InMemoryTaskStore(),
-        )
-        server = A2AStarletteApplication(
-            agent_card=agent_card, http_handler=request_handler
-        )
+        app = build_app()
         import uvicorn
 
+        class Server(uvicorn.Server):
+            async def shutdown(self, sockets=None):
+                # Start of the shutdown deadline shared with the lifespan's drain
+                app.state.shutdown_started = time.monotonic()
+                await super().shutdown(sockets)
+
         port = int(os.getenv("PORT", 10000))
         logger.info("Starting uvicorn on port %d", port)
-        uvicorn.run(server.build(), host="0.0.0.0", port=port)
+        Server(
+            uvicorn.Config(
+                app,
+                host="0.0.0.0",
+                port=port,
+                timeout_graceful_shutdown=int(shutdown_timeout()),
+            )
+        ).run()
     except Exception as e:
         logger.exception("An error occurred during server startup")
         exit(1)
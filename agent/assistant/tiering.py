@@ -0,0 +1,139 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Answers in which a model says the documents do not answer the question
+_NO_ANSWER_RE = re.compile(
+    r"не наш[её]л|нет информации|недостаточно информации|не могу ответить"
+    r"|не содерж|don'?t have (?:any )?information|couldn'?t find|could not find"
+    r"|no (?:relevant )?information|not enough information|cannot answer"
+    r"|can'?t answer|do(?:es)? not (?:contain|mention)",
+    re.IGNORECASE,
+)
+# What the QA prompt has a model suggest after such an answer
+_SUGGESTION_RE = re.compile(
+    r"переформулир|обратит|администратор|rephras|contact|administrator",
+    re.IGNORECASE,
+)
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+# Longer answers carry content besides what the documents do not cover
+_REFUSAL_MAX_CHARS = 400
+
+
+def _is_refusal(answer: str) -> bool:
+    """
+    Whether `answer` is a refusal: short, and mostly says the documents do
+    not answer the question (plus the suggestions the prompt asks for).
+
+    The prompt also has the model note what the documents do not cover, so
+    a "does not mention" in an answer with content is not a refusal.
+    """
+    text = answer.strip()
+    if len(text) > _REFUSAL_MAX_CHARS:
+        return False
+    sentences = _SENTENCE_RE.findall(text)
+    refused = [s for s in sentences if _NO_ANSWER_RE.search(s)]
+    if not refused:
+        return False
+    padding = [s for s in sentences if s not in refused and _SUGGESTION_RE.search(s)]
+    covered = sum(len(s) for s in refused + padding)
+    return covered * 3 >= sum(len(s) for s in sentences) * 2
+
+
+def normalize_model(model: Optional[str]) -> Optional[str]:
+    """Add the `hosted_vllm/` provider prefix LiteLLM needs, if missing."""
+    if not model:
+        return model
+    if "/" in model and model.split("/", 1)[0] in {"hosted_vllm"}:
+        return model
+    return f"hosted_vllm/{model}"
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """The model (and endpoint) one pipeline stage calls."""
+
+    model: Optional[str]
+    api_base: Optional[str]
+
+
+def tiers_from_env() -> Dict[str, ModelTier]:
+    """
+    Models per stage: `qa` (LLM_MODEL), `keyword` (LLM_KEYWORD_MODEL, falls
+    back to the QA model) and, when LLM_QA_SMALL_MODEL is set, `qa_small`.
+    Each stage may point at its own endpoint with `*_API_BASE`.
+    """
+    api_base = os.getenv("LLM_API_BASE")
+    qa = ModelTier(normalize_model(os.getenv("LLM_MODEL")), api_base)
+    tiers = {
+        "qa": qa,
+        "keyword": ModelTier(
+            normalize_model(os.getenv("LLM_KEYWORD_MODEL")) or qa.model,
+            os.getenv("LLM_KEYWORD_API_BASE") or api_base,
+        ),
+    }
+    small = os.getenv("LLM_QA_SMALL_MODEL")
+    if small:
+        tiers["qa_small"] = ModelTier(
+            normalize_model(small), os.getenv("LLM_QA_SMALL_API_BASE") or api_base
+        )
+    return tiers
+
+
+class EscalationPolicy:
+    """
+    Decide whether a question is answered by the small QA model or the large one.
+
+    Before the call, a large context (`max_context_tokens`) or many
+    documents (`max_documents`) send the question straight to the large
+    model. After it, the small model's answer is escalated when it is empty,
+    was cut off by the token limit, or is a refusal (a short answer that
+    mostly says the documents do not answer the question) although some
+    were found.
+    """
+
+    def __init__(
+        self,
+        max_context_tokens: int = 3000,
+        max_documents: int = 3,
+        escalate_no_answer: bool = True,
+    ):
+        """
+        Args:
+            max_context_tokens (int): Larger contexts skip the small model; 0 disables
+            max_documents (int): More documents skip the small model; 0 disables
+            escalate_no_answer (bool): Escalate "no information" answers
+        """
+        self.max_context_tokens = max_context_tokens
+        self.max_documents = max_documents
+        self.escalate_no_answer = escalate_no_answer
+
+    @classmethod
+    def from_env(cls) -> "EscalationPolicy":
+        return cls(
+            max_context_tokens=int(os.getenv("QA_SMALL_MAX_CONTEXT_TOKENS", "3000")),
+            max_documents=int(os.getenv("QA_SMALL_MAX_DOCUMENTS", "3")),
+            escalate_no_answer=os.getenv("QA_ESCALATE_NO_ANSWER", "true").lower()
+            == "true",
+        )
+
+    def before(self, documents: int, context_tokens: int) -> Optional[str]:
+        """Reason to skip the small model, or None to try it."""
+        if self.max_context_tokens and context_tokens > self.max_context_tokens:
+            return "context"
+        if self.max_documents and documents > self.max_documents:
+            return "documents"
+        return None
+
+    def after(
+        self, answer: str, documents: int, finish_reason: Optional[str] = None
+    ) -> Optional[str]:
+        """Reason to escalate the small model's answer, or None to keep it."""
+        if not (answer or "").strip():
+            return "empty"
+        if finish_reason == "length":
+            return "truncated"
+        if self.escalate_no_answer and documents and _is_refusal(answer):
+            return "no_answer"
+        return None
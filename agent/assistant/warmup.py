@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# (question, refresh_within seconds)
+WarmFn = Callable[[str, float], Awaitable[None]]
+
+
+def load_top_questions(path: str, limit: int) -> List[str]:
+    """
+    Most frequent questions of a query log: plain text (one question per line)
+    or JSON Lines with a `question` or `text` field.
+    """
+    counts: Counter = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                line = (record.get("question") or record.get("text") or "").strip()
+            if line:
+                counts[line] += 1
+    return [question for question, _ in counts.most_common(limit)]
+
+
+class WarmUp:
+    """
+    Warm the keyword and search caches from a query log.
+
+    The first pass starts with the app; `ready` turns true once it has
+    finished (or right away without a query log), which is what `/ready`
+    reports. With an `interval`, the pass repeats and refreshes entries that
+    would expire before the next run.
+    """
+
+    def __init__(
+        self,
+        warm_fn: WarmFn,
+        query_log: Optional[str] = None,
+        top_n: int = 50,
+        concurrency: int = 2,
+        interval: float = 0.0,
+    ):
+        """
+        Args:
+            warm_fn (WarmFn): Coroutine warming one question
+            query_log (str, optional): Path to the query log
+            top_n (int): Number of most frequent questions to warm
+            concurrency (int): Questions warmed at the same time
+            interval (float): Seconds between passes; 0 runs a single pass
+        """
+        self._warm_fn = warm_fn
+        self.query_log = query_log
+        self.top_n = top_n
+        self.concurrency = max(1, concurrency)
+        self.interval = interval
+        self.ready = False
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.runs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, warm_fn: WarmFn) -> "WarmUp":
+        return cls(
+            warm_fn,
+            query_log=os.getenv("WARMUP_QUERY_LOG") or None,
+            top_n=int(os.getenv("WARMUP_TOP_N", "50")),
+            concurrency=int(os.getenv("WARMUP_CONCURRENCY", "2")),
+            interval=float(os.getenv("WARMUP_INTERVAL", "600")),
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup": {
+                "total": self.total,
+                "done": self.done,
+                "failed": self.failed,
+                "runs": self.runs,
+            },
+        }
+
+    async def start(self) -> None:
+        if not self.query_log:
+            self.ready = True
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        # First pass fills the caches; later passes only refresh entries
+        # that would expire before the next one
+        refresh_within = 0.0
+        while True:
+            try:
+                await self.run_once(refresh_within)
+            except Exception:
+                logger.exception("Warm-up pass failed")
+            self.ready = True
+            if self.interval <= 0:
+                return
+            refresh_within = self.interval
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, refresh_within: float = 0.0) -> None:
+        questions = await asyncio.to_thread(
+            load_top_questions, self.query_log, self.top_n
+        )
+        self.total = len(questions)
+        self.done = 0
+        self.failed = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def warm(question: str) -> None:
+            async with semaphore:
+                try:
+                    await self._warm_fn(question, refresh_within)
+                except Exception:
+                    self.failed += 1
+                    logger.warning("Warm-up failed for a question", exc_info=True)
+                finally:
+                    self.done += 1
+
+        logger.info("Warm-up started; questions=%d", self.total)
+        await asyncio.gather(*(warm(q) for q in questions))
+        self.runs += 1
+        logger.info("Warm-up finished; questions=%d failed=%d", self.total, self.failed)
@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from .logging_utils import get_logger
+from .metrics import metrics
+
+logger = get_logger(__name__)
+
+# (document id, deleted) -> entries dropped per cache
+InvalidateFn = Callable[[str, bool], Dict[str, int]]
+
+# Events after which the document is no longer searchable; its entry in the
+# local index is dropped as well
+DELETE_EVENTS = {
+    "documents.delete",
+    "documents.permanent_delete",
+    "documents.archive",
+    "documents.unpublish",
+}
+
+
+def outline_signature(secret: str, timestamp: str, body: bytes) -> str:
+    """HMAC-SHA256 of `<timestamp>.<body>`, as Outline signs webhook deliveries."""
+    message = timestamp.encode() + b"." + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class OutlineWebhook:
+    """
+    Receiver for Outline webhooks that invalidates caches on document changes.
+
+    Every `documents.*` event (update, move, delete, archive, ...) drops the
+    cached entries built from that document through `invalidate`; other
+    events are acknowledged and ignored. Deliveries must carry a valid
+    `Outline-Signature` header for the subscription's signing secret, so the
+    endpoint is only mounted when `secret` is set. Invalidation is
+    idempotent, so a replayed delivery does no harm.
+    """
+
+    def __init__(
+        self,
+        invalidate: InvalidateFn,
+        secret: Optional[str] = None,
+        path: str = "/webhooks/outline",
+    ):
+        """
+        Args:
+            invalidate (InvalidateFn): Drops the cache entries of one document
+            secret (str, optional): Signing secret of the webhook subscription
+            path (str): Route of the endpoint
+        """
+        self._invalidate = invalidate
+        self._secret = secret or ""
+        self.path = path
+
+    @classmethod
+    def from_env(cls, invalidate: InvalidateFn) -> "OutlineWebhook":
+        return cls(
+            invalidate,
+            secret=os.getenv("OUTLINE_WEBHOOK_SECRET"),
+            path=os.getenv("OUTLINE_WEBHOOK_PATH", "/webhooks/outline"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._secret)
+
+    def verify(self, body: bytes, header: str) -> bool:
+        """Check an `Outline-Signature: t=<timestamp>,s=<signature>` header."""
+        parts = dict(
+            part.split("=", 1) for part in (header or "").split(",") if "=" in part
+        )
+        timestamp, signature = parts.get("t"), parts.get("s")
+        if not timestamp or not signature:
+            return False
+        expected = outline_signature(self._secret, timestamp, body)
+        return hmac.compare_digest(expected, signature)
+
+    def handle(self, delivery: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        """Invalidate the document of one delivery; None if it is not about one."""
+        event = delivery.get("event") or ""
+        payload = delivery.get("payload") or {}
+        document_id = payload.get("id") or (payload.get("model") or {}).get("id")
+        if not event.startswith("documents.") or not document_id:
+            metrics.inc("webhook.outline.ignored")
+            return None
+
+        dropped = self._invalidate(document_id, event in DELETE_EVENTS)
+        metrics.inc("webhook.outline.events")
+        for name, count in dropped.items():
+            metrics.inc(f"webhook.outline.invalidated.{name}", count)
+        logger.info("Outline webhook %s for document %s handled", event, document_id)
+        return dropped
+
+    def routes(self) -> List:
+        """The Starlette route of the endpoint; empty when no secret is set."""
+        if not self.enabled:
+            return []
+
+        from starlette.requests import Request
+        from starlette.responses import JSONResponse, PlainTextResponse
+        from starlette.routing import Route
+
+        async def endpoint(request: Request):
+            body = await request.body()
+            if not self.verify(body, request.headers.get("outline-signature")):
+                metrics.inc("webhook.outline.rejected")
+                logger.warning("Rejected Outline webhook with a bad signature")
+                return PlainTextResponse("Forbidden", status_code=403)
+            try:
+                delivery = json.loads(body)
+            except ValueError:
+                return PlainTextResponse("Bad Request", status_code=400)
+            if not isinstance(delivery, dict):
+                return PlainTextResponse("Bad Request", status_code=400)
+            dropped = self.handle(delivery)
+            return JSONResponse({"invalidated": dropped})
+
+        return [Route(self.path, endpoint, methods=["POST"])]
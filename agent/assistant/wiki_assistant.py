@@ -1,17 +1,83 @@
+import asyncio
+import importlib
 import logging
 import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
 
 from dotenv import load_dotenv
-from litellm import completion
 
+from .batching import KeywordBatcher, parse_batch_keywords
+from .cache import TTLCache
+from .collection_router import CollectionRouter
+from .credentials import credential_provider_from_env
+from .document_store import DocumentStore
+from .limits import ConcurrencyLimiter
+from .local_index import LocalSearchIndex
 from .mcp_client import McpSearchClient
-from .prompts import KEYWORD_EXTRACTION_TEMPLATE, QA_TEMPLATE
-from .retrievers import McpKeywordEnhancedRetriever, RetrievedDocument
-from .logging_utils import get_logger
+from .metrics import metrics
+from .offload import Offloader
+from .prompts import (
+    KEYWORD_BATCH_TEMPLATE,
+    KEYWORD_EXTRACTION_TEMPLATE,
+    QA_TEMPLATE,
+)
+from .retrievers import McpKeywordEnhancedRetriever, RetrievedDocument, estimate_tokens
+from .router import Route, canned_reply, classify, no_documents_reply
+from .tiering import EscalationPolicy, tiers_from_env
+from .logging_utils import SAMPLED, get_logger
 
 logger = get_logger(__name__)
 
 
+async def acompletion(**kwargs):
+    """Call `litellm.acompletion`, importing LiteLLM on first use.
+
+    LiteLLM takes seconds to import, so it stays out of the import path of
+    the package and is only loaded when the first LLM call is made. The call
+    is async so that cancelling the caller aborts the in-flight HTTP request.
+    """
+    from litellm import acompletion as litellm_acompletion
+
+    return await litellm_acompletion(**kwargs)
+
+
+async def _timed_check(name: str, check) -> dict:
+    """Await a startup check; report its outcome and duration instead of raising."""
+    started = time.perf_counter()
+    try:
+        await check
+    except Exception as e:
+        logger.error("Startup check %s failed: %s", name, e)
+        result = {"ok": False, "error": str(e)}
+    else:
+        result = {"ok": True}
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _uses_document(document: RetrievedDocument, document_id: str) -> bool:
+    """Whether a retrieved document is, or (a full-text result) lists, `document_id`."""
+    return (
+        document.metadata.get("id") == document_id
+        or f"   ID: {document_id}\n" in document.page_content
+    )
+
+
+# Sessions (A2A context ids) kept in memory, least recently used dropped first
+MAX_SESSIONS = 1000
+MAX_HISTORY = 20
+
+
+@dataclass
+class _Session:
+    history: list = field(default_factory=list)
+    question: str = ""
+    documents: list = field(default_factory=list)
+
+
 class WikiAssistant:
     """
     A corporate wiki assistant that uses MCP server for document retrieval and LLM for answering questions.
@@ -28,33 +94,75 @@ class WikiAssistant:
 
         self._load_environment()
         logger.info("Initializing WikiAssistant components")
+        # Shared by the MCP client and the retriever
+        self._offloader = Offloader.from_env()
         self._setup_mcp_client()
         self._setup_llm()
         self._setup_chains()
         logger.info("WikiAssistant initialized successfully")
-        self._chat_history = []
-
-    async def answer(self, question: str) -> str:
+        self._router_enabled = (
+            os.environ.get("ROUTER_ENABLED", "true").lower() == "true"
+        )
+        self._sessions: "OrderedDict[Optional[str], _Session]" = OrderedDict()
+        self._chat_history = self._session(None).history
+
+    def _session(self, session_id: Optional[str]) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+            if len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    async def answer(self, question: str, session_id: Optional[str] = None) -> str:
         """
         Answer a user question using the wiki knowledge base.
 
+        Small talk and empty messages get a canned reply, and short follow-ups
+        reuse the documents retrieved for the previous question of the same
+        session, so neither pays for keyword extraction and search.
+
         Args:
             question (str): The user's question
+            session_id (str, optional): Conversation id (A2A context id)
 
         Returns:
             str: The assistant's answer
         """
         logger.info(
-            "Answer called with question length=%d", len(question) if question else 0
+            "Answer called with question length=%d",
+            len(question) if question else 0,
+            extra=SAMPLED,
+        )
+        session = self._session(session_id)
+        route = (
+            classify(question, session.question) if self._router_enabled else Route.WIKI
         )
+        metrics.inc(f"router.{route.value}")
+        if route in (Route.EMPTY, Route.SMALL_TALK):
+            # Neither keyword extraction nor QA is needed
+            metrics.inc("llm.calls_saved", 2)
+            logger.info("Routed message as %s", route.value, extra=SAMPLED)
+            return canned_reply(question, route)
+
         try:
             result = await self._qa_chain_with_context(
-                {"question": question, "chat_history": self._chat_history}
+                {
+                    "question": question,
+                    "chat_history": session.history,
+                    "session": session,
+                    "route": route,
+                }
             )
             answer = result["answer"]
-            self._chat_history.append((question, answer))
+            session.history.append((question, answer))
+            del session.history[:-MAX_HISTORY]
             logger.info(
-                "Answer produced successfully; history_len=%d", len(self._chat_history)
+                "Answer produced successfully; history_len=%d",
+                len(session.history),
+                extra=SAMPLED,
             )
             return answer
         except Exception as e:
@@ -64,6 +172,92 @@ class WikiAssistant:
             logger.exception("Error in answer method")
             return error_response
 
+    async def warm(self, question: str, refresh_within: float = 0.0) -> None:
+        """
+        Fill the keyword and search caches for `question` without answering.
+
+        Args:
+            question (str): A question from the query log
+            refresh_within (float): Recompute entries expiring within this many seconds
+        """
+        if classify(question) is not Route.WIKI:
+            return
+        await self._enhanced_retriever.warm(question, refresh_within)
+
+    def invalidate_document(self, document_id: str, deleted: bool = False) -> dict:
+        """
+        Forget everything cached from a changed wiki document.
+
+        Drops the cached search results and full documents that contain it
+        and the documents kept for follow-up questions in sessions that used
+        it, so the next question searches again.
+
+        Args:
+            document_id (str): Outline document id
+            deleted (bool): The document is gone; also drop it from the local index
+
+        Returns:
+            dict: Number of entries dropped per cache
+        """
+        dropped = self._enhanced_retriever.invalidate_document(document_id, deleted)
+        dropped["sessions"] = 0
+        for session in self._sessions.values():
+            if any(_uses_document(d, document_id) for d in session.documents):
+                session.documents = []
+                dropped["sessions"] += 1
+        logger.info(
+            "Invalidated document %s; %s",
+            document_id,
+            " ".join(f"{name}={count}" for name, count in dropped.items()),
+        )
+        return dropped
+
+    async def start(self) -> dict:
+        """
+        Open connections ahead of the first request.
+
+        Imports LiteLLM (seconds in a fresh process), opens and validates the
+        shared MCP session and makes a one-token LLM call, which also resolves
+        DNS, sets up TLS and LiteLLM's HTTP client. A failed check is logged
+        and reported, not raised: MCP is reopened on the next search and the
+        local index covers for it meanwhile.
+
+        Returns:
+            dict: Outcome and duration of each check, e.g.
+                {"mcp": {"ok": True, "seconds": 0.12}, ...}
+        """
+        checks = {
+            "litellm_import": await _timed_check(
+                "litellm_import", asyncio.to_thread(importlib.import_module, "litellm")
+            )
+        }
+        if self._mcp_client.persistent:
+            checks["mcp"] = await _timed_check("mcp", self._mcp_client.open())
+        if os.environ.get("STARTUP_LLM_CHECK", "true").lower() == "true":
+            # One check per distinct model; every stage uses the QA model by default
+            checked = set()
+            for stage, tier in self._tiers.items():
+                if tier in checked:
+                    continue
+                checked.add(tier)
+                name = "llm" if stage == "qa" else f"llm.{stage}"
+                checks[name] = await _timed_check(
+                    name,
+                    self._llm_completion(
+                        stage,
+                        label="startup",
+                        messages=[{"role": "user", "content": "ping"}],
+                        max_tokens=1,
+                    ),
+                )
+        logger.info(
+            "Startup checks done; %s",
+            " ".join(
+                f"{name}={'ok' if c['ok'] else 'failed'}" for name, c in checks.items()
+            ),
+        )
+        return checks
+
     def _load_environment(self) -> None:
         """Load environment variables and validate required settings."""
         load_dotenv()
@@ -73,103 +267,268 @@ class WikiAssistant:
 
     def _setup_mcp_client(self) -> None:
         """Set up the MCP client."""
-        self._mcp_client = McpSearchClient(self._mcp_server_url)
-        logger.info(f"🔗 Connected to MCP server at: {self._mcp_server_url}")
+        self._mcp_client = McpSearchClient(
+            self._mcp_server_url,
+            limiter=ConcurrencyLimiter.from_env("mcp", "MAX_CONCURRENT_MCP_CALLS"),
+            persistent=os.environ.get("MCP_PERSISTENT_SESSION", "true").lower()
+            == "true",
+            offloader=self._offloader,
+        )
+        logger.info("🔗 Connected to MCP server at: %s", self._mcp_server_url)
 
     def _setup_llm(self) -> None:
         """Set up LiteLLM configuration from environment."""
-        self._llm_model = os.environ.get("LLM_MODEL")
-        self._llm_api_base = os.environ.get("LLM_API_BASE")
-        self._llm_api_key = os.environ.get("LLM_API_KEY")
-
-        # Normalize model to include provider prefix if missing
-        def normalize_model(model: str | None, api_base: str | None) -> str | None:
-            if not model:
-                return model
-            if "/" in model and model.split("/", 1)[0] in {"hosted_vllm"}:
-                return model
-            provider = "hosted_vllm"
-            return f"{provider}/{model}"
-
-        self._llm_model = normalize_model(self._llm_model, self._llm_api_base)
+        self._tiers = tiers_from_env()
+        self._escalation = EscalationPolicy.from_env()
+        self._llm_model = self._tiers["qa"].model
+        self._llm_api_base = self._tiers["qa"].api_base
+        self._credentials = credential_provider_from_env()
+        self._llm_limiter = ConcurrencyLimiter.from_env(
+            "llm", "MAX_CONCURRENT_LLM_CALLS"
+        )
         logger.info(
-            "LLM configuration loaded; model=%s api_base=%s",
-            self._llm_model,
-            self._llm_api_base,
+            "LLM configuration loaded; %s",
+            " ".join(
+                f"{stage}={tier.model}@{tier.api_base}"
+                for stage, tier in self._tiers.items()
+            ),
         )
 
-    def _is_token_error(self, error: Exception) -> bool:
-        """Check if the error is related to token expiration or authentication."""
-        error_str = str(error).lower()
-        token_error_indicators = [
-            "unauthorized",
-            "authentication",
-            "token",
-            "expired",
-            "invalid",
-            "401",
-            "403",
-        ]
-        return any(indicator in error_str for indicator in token_error_indicators)
-
-    def _retry_with_token_refresh(self, operation, *args, **kwargs):
-        """Retry an operation with token refresh if authentication fails."""
-        try:
-            return operation(*args, **kwargs)
-        except Exception as e:
-            if self._is_token_error(e):
-                logger.warning("🔄 Token appears to be expired, refreshing...")
+    async def _llm_completion(
+        self, stage: str = "qa", label: Optional[str] = None, **kwargs
+    ):
+        """Run one LLM completion of a pipeline stage with the shared credential.
+
+        `stage` selects the model tier (`qa`, `qa_small` or `keyword`); calls,
+        latency and tokens are counted per stage as `llm.<stage>.*` metrics,
+        or as `llm.<label>.*` for calls outside the pipeline such as the
+        startup check.
+
+        The token comes from the credential provider, which refreshes it in
+        the background, so no call waits on a failed request plus a retry.
+        A 401 only marks the credential stale for the following calls.
+        """
+        tier = self._tiers[stage]
+        label = label or stage
+        api_key = await self._credentials.get_token()
+        async with self._llm_limiter:
+            started = time.perf_counter()
+            try:
+                response = await acompletion(
+                    model=tier.model,
+                    api_base=tier.api_base,
+                    api_key=api_key,
+                    **kwargs,
+                )
+            except Exception as e:
+                metrics.inc(f"llm.{label}.errors")
+                if getattr(e, "status_code", None) == 401:
+                    logger.warning("LLM rejected credential; scheduling refresh")
+                    self._credentials.invalidate()
+                raise
+        metrics.inc(f"llm.{label}.calls")
+        metrics.inc(
+            f"llm.{label}.latency_ms", int((time.perf_counter() - started) * 1000)
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.inc(
+                f"llm.{label}.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0
+            )
+            metrics.inc(
+                f"llm.{label}.completion_tokens",
+                getattr(usage, "completion_tokens", 0) or 0,
+            )
+        return response
+
+    async def _qa_completion(self, messages: list, documents: int, context: str):
+        """
+        Answer with the small QA model when the question looks easy, and with
+        the large one otherwise or when the small model's answer is escalated.
+        """
+        if "qa_small" in self._tiers:
+            reason = self._escalation.before(documents, estimate_tokens(context))
+            if reason is None:
+                metrics.inc("qa.small.attempts")
                 try:
-                    self._refresh_llm_token()
-                    # Recreate chains with new token
-                    self._setup_chains()
-                    logger.info("🔄 Retrying operation with fresh token...")
-                    return operation(*args, **kwargs)
-                except Exception as refresh_error:
-                    logger.error(f"❌ Failed to refresh token: {refresh_error}")
-                    raise e  # Re-raise original error
+                    response = await self._llm_completion(
+                        "qa_small", messages=messages, temperature=0.3
+                    )
+                except Exception:
+                    logger.warning("Small QA model failed", exc_info=True)
+                    reason = "error"
+                else:
+                    choice = response.choices[0] if response.choices else None
+                    content = choice.message["content"] if choice else ""
+                    reason = self._escalation.after(
+                        content, documents, getattr(choice, "finish_reason", None)
+                    )
+                if reason is None:
+                    metrics.inc("qa.small.answers")
+                    return response
+                metrics.inc("qa.escalated")
+                metrics.inc(f"qa.escalated.{reason}")
             else:
-                raise e
+                metrics.inc(f"qa.small.skipped.{reason}")
+            logger.info("QA goes to the large model; reason=%s", reason, extra=SAMPLED)
+        return await self._llm_completion("qa", messages=messages, temperature=0.3)
 
     def _setup_chains(self) -> None:
         """Set up all processing chains including keyword extraction and QA."""
         logger.info("Setting up retrieval and QA chains")
 
-        def keyword_fn(question: str) -> str:
+        async def keyword_fn(question: str) -> str:
             prompt = KEYWORD_EXTRACTION_TEMPLATE.format(question=question)
-            resp = completion(
-                model=self._llm_model,
+            resp = await self._llm_completion(
+                "keyword",
                 messages=[
                     {"role": "system", "content": "Extract keywords for search"},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.2,
-                api_base=self._llm_api_base,
-                api_key=self._llm_api_key,
             )
             return resp.choices[0].message["content"] if resp and resp.choices else ""
 
+        async def batch_keyword_fn(questions: list) -> list:
+            numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+            resp = await self._llm_completion(
+                "keyword",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "Extract keywords for search, one entry per question",
+                    },
+                    {
+                        "role": "user",
+                        "content": KEYWORD_BATCH_TEMPLATE.format(questions=numbered),
+                    },
+                ],
+                temperature=0.2,
+                response_format={"type": "json_object"},
+            )
+            content = (
+                resp.choices[0].message["content"] if resp and resp.choices else ""
+            )
+            return parse_batch_keywords(content, len(questions))
+
+        self._keyword_batcher = KeywordBatcher.from_env(keyword_fn, batch_keyword_fn)
+        self._setup_local_index()
+        self._setup_collection_router()
+        self._setup_document_store()
+        deadline = float(os.environ.get("MCP_SEARCH_DEADLINE", "10"))
+        max_entries = int(os.environ.get("CACHE_MAX_ENTRIES", "1000"))
         self._enhanced_retriever = McpKeywordEnhancedRetriever(
-            mcp_client=self._mcp_client, keyword_fn=keyword_fn
+            mcp_client=self._mcp_client,
+            keyword_fn=self._keyword_batcher,
+            local_index=self._local_index,
+            search_deadline=deadline if deadline > 0 else None,
+            local_first=os.environ.get("LOCAL_INDEX_MODE", "fallback").lower()
+            == "first",
+            local_min_score=float(os.environ.get("LOCAL_INDEX_MIN_SCORE", "5.0")),
+            keyword_cache=TTLCache(
+                float(os.environ.get("KEYWORD_CACHE_TTL", "3600")), max_entries
+            ),
+            search_cache=TTLCache(
+                float(os.environ.get("SEARCH_CACHE_TTL", "600")), max_entries
+            ),
+            page_size=int(os.environ.get("SEARCH_PAGE_SIZE", "1")),
+            max_results=int(os.environ.get("SEARCH_MAX_RESULTS", "4")),
+            context_token_budget=int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500")),
+            min_ranking=float(os.environ.get("SEARCH_MIN_RANKING", "0")),
+            snippet_mode=os.environ.get("SEARCH_MODE", "snippet").lower() == "snippet",
+            fetch_top_k=int(os.environ.get("FETCH_TOP_K", "2")),
+            document_cache=TTLCache(
+                float(os.environ.get("DOCUMENT_CACHE_TTL", "86400")), max_entries
+            ),
+            offloader=self._offloader,
+            collection_router=self._collection_router,
+            document_store=self._document_store,
         )
 
         # Create QA chain with context
         self._qa_chain_with_context = self._create_qa_chain_with_context()
         logger.info("Chains set up successfully")
 
+    def _setup_local_index(self) -> None:
+        """Set up the local BM25 index used when MCP search is unavailable."""
+        self._local_index = None
+        self._local_index_snapshot = os.environ.get("LOCAL_INDEX_SNAPSHOT")
+        if os.environ.get("LOCAL_INDEX_ENABLED", "true").lower() != "true":
+            return
+
+        self._local_index = LocalSearchIndex()
+        snapshot = self._local_index_snapshot
+        if snapshot and os.path.exists(snapshot):
+            try:
+                self._local_index.load_snapshot(snapshot)
+            except Exception:
+                logger.exception("Failed to load local index snapshot %s", snapshot)
+
+    def _setup_document_store(self) -> None:
+        """Set up the shared store for retrieved texts and its memory gauges."""
+        self._document_store = DocumentStore.from_env()
+        store = self._document_store
+        for name in store.stats():
+            metrics.gauge(
+                f"document_store.{name}", lambda name=name: store.stats()[name]
+            )
+
+    def _setup_collection_router(self) -> None:
+        """Set up routing of searches to likely Outline collections."""
+        self._collection_router = None
+        self._collection_router_snapshot = os.environ.get("COLLECTION_ROUTING_SNAPSHOT")
+        if os.environ.get("COLLECTION_ROUTING_ENABLED", "false").lower() != "true":
+            return
+
+        self._collection_router = CollectionRouter.from_env()
+        snapshot = self._collection_router_snapshot
+        if snapshot and os.path.exists(snapshot):
+            try:
+                self._collection_router.load_snapshot(snapshot)
+            except Exception:
+                logger.exception(
+                    "Failed to load collection routing snapshot %s", snapshot
+                )
+
     def _create_qa_chain_with_context(self):
         """Create a QA chain that includes document context and system prompt."""
 
         async def qa_with_context(inputs):
             question = inputs["question"]
             chat_history = inputs.get("chat_history", [])
-            logger.info("Running QA with context; history_len=%d", len(chat_history))
-
-            # Retrieve documents via MCP using keyword extraction
-            documents: list[RetrievedDocument] = await self._enhanced_retriever.invoke(
-                question
+            logger.info(
+                "Running QA with context; history_len=%d",
+                len(chat_history),
+                extra=SAMPLED,
             )
-            logger.info("Retrieved %d documents for QA", len(documents))
+
+            session: _Session = inputs.get("session") or _Session()
+            prompt_question = question
+            if inputs.get("route") is Route.FOLLOW_UP and session.documents:
+                # Answer from the previous turn's documents, skipping keywords
+                # and search
+                metrics.inc("llm.calls_saved")
+                documents = session.documents
+                prompt_question = (
+                    f"{question}\n(Follow-up to the previous question: "
+                    f"{session.question})"
+                )
+                logger.info("Reusing %d documents for follow-up", len(documents))
+            else:
+                # Retrieve documents via MCP using keyword extraction
+                documents: list[
+                    RetrievedDocument
+                ] = await self._enhanced_retriever.invoke(question)
+                session.question = question
+                session.documents = documents
+                logger.info(
+                    "Retrieved %d documents for QA", len(documents), extra=SAMPLED
+                )
+
+            if not documents and self._router_enabled:
+                # The QA prompt could only say that nothing was found
+                metrics.inc("llm.calls_saved")
+                return {"answer": no_documents_reply(question)}
 
             if documents:
                 doc_text = "\n\n".join(
@@ -181,27 +540,24 @@ class WikiAssistant:
             else:
                 doc_text = "No relevant documents found."
 
-            def llm_call():
-                prompt = QA_TEMPLATE.format(documents=doc_text, question=question)
-                return completion(
-                    model=self._llm_model,
-                    messages=[
-                        {"role": "system", "content": "Answer strictly from documents"},
-                        {"role": "user", "content": prompt},
-                    ],
-                    temperature=0.3,
-                    api_base=self._llm_api_base,
-                    api_key=self._llm_api_key,
-                )
-
-            response = self._retry_with_token_refresh(llm_call)
+            prompt = QA_TEMPLATE.format(documents=doc_text, question=prompt_question)
+            response = await self._qa_completion(
+                [
+                    {"role": "system", "content": "Answer strictly from documents"},
+                    {"role": "user", "content": prompt},
+                ],
+                sum(doc.metadata.get("results", 1) for doc in documents),
+                doc_text,
+            )
             content = (
                 response.choices[0].message["content"]
                 if response and response.choices
                 else ""
             )
             logger.info(
-                "QA LLM call completed; answer_len=%d", len(content) if content else 0
+                "QA LLM call completed; answer_len=%d",
+                len(content) if content else 0,
+                extra=SAMPLED,
             )
             return {"answer": content}
 
@@ -209,24 +565,31 @@ class WikiAssistant:
 
     @property
     def chat_history(self) -> list:
-        """Get the current chat history."""
+        """Get the chat history of calls made without a session id."""
         return self._chat_history.copy()
 
     async def close(self):
-        """Close the MCP client connection."""
+        """
+        Close the MCP session and the offload pools, stop credential refresh
+        and save the local index and the collection routing table. Call it
+        once the assistant is done; nothing is closed on garbage collection.
+        """
+        if hasattr(self, "_credentials"):
+            await self._credentials.close()
+        if getattr(self, "_local_index", None) and self._local_index_snapshot:
+            try:
+                self._local_index.save_snapshot(self._local_index_snapshot)
+            except Exception:
+                logger.exception("Failed to save local index snapshot")
+        if getattr(self, "_collection_router", None) and (
+            self._collection_router_snapshot
+        ):
+            try:
+                self._collection_router.save_snapshot(self._collection_router_snapshot)
+            except Exception:
+                logger.exception("Failed to save collection routing snapshot")
         if hasattr(self, "_mcp_client"):
             await self._mcp_client.close()
             logger.info("🔌 MCP client connection closed")
-
-    def __del__(self):
-        """Cleanup when the object is destroyed."""
-        try:
-            import asyncio
-
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(self.close())
-            else:
-                loop.run_until_complete(self.close())
-        except:
-            pass  # Ignore cleanup errors
+        if hasattr(self, "_offloader"):
+            self._offloader.close()
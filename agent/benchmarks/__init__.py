@@ -0,0 +1,6 @@
+"""
+Benchmark suite for the Wiki assistant.
+
+Runs the assistant against local stand-ins for the MCP server and the
+OpenAI-compatible LLM endpoint, so results are reproducible offline.
+"""
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compare a benchmark run against a saved baseline and flag regressions.
+
+Exits with status 1 when any scenario/concurrency pair regresses beyond the
+configured tolerances, so it can gate CI jobs.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+
+Key = Tuple[str, int]
+
+
+def _index(report: Dict[str, Any]) -> Dict[Key, Dict[str, Any]]:
+    return {(row["scenario"], row["concurrency"]): row for row in report["results"]}
+
+
+def _pct_change(old: float, new: float) -> float:
+    if not old:
+        return 0.0
+    return (new - old) / old * 100.0
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    latency_tolerance: float,
+    throughput_tolerance: float,
+    rss_tolerance: float,
+) -> List[str]:
+    """Return human-readable regression messages (empty when none)."""
+    regressions: List[str] = []
+    base_rows = _index(baseline)
+    for key, row in sorted(_index(current).items()):
+        base = base_rows.get(key)
+        if base is None:
+            continue
+        label = f"{key[0]} c={key[1]}"
+
+        for pct in ("p50", "p95", "p99"):
+            change = _pct_change(base["latency_ms"][pct], row["latency_ms"][pct])
+            if change > latency_tolerance:
+                regressions.append(
+                    f"{label}: {pct} latency {base['latency_ms'][pct]}ms -> "
+                    f"{row['latency_ms'][pct]}ms (+{change:.1f}%)"
+                )
+
+        change = _pct_change(base["throughput_rps"], row["throughput_rps"])
+        if -change > throughput_tolerance:
+            regressions.append(
+                f"{label}: throughput {base['throughput_rps']} -> "
+                f"{row['throughput_rps']} rps ({change:.1f}%)"
+            )
+
+        if base.get("rss_bytes") and row.get("rss_bytes"):
+            change = _pct_change(base["rss_bytes"], row["rss_bytes"])
+            if change > rss_tolerance:
+                regressions.append(
+                    f"{label}: RSS {base['rss_bytes'] // 2**20}MiB -> "
+                    f"{row['rss_bytes'] // 2**20}MiB (+{change:.1f}%)"
+                )
+
+        if row["errors"] > base["errors"]:
+            regressions.append(f"{label}: errors {base['errors']} -> {row['errors']}")
+
+    base_startup, startup = baseline.get("startup"), current.get("startup")
+    if base_startup and startup:
+        pairs = [
+            (f"import {module}", base_startup["import_s"][module], timings)
+            for module, timings in startup["import_s"].items()
+            if module in base_startup["import_s"]
+        ]
+        pairs += [
+            (key, base_startup[key], startup[key])
+            for key in ("ready_s", "first_request_s")
+            if key in base_startup and key in startup
+        ]
+        for label, base, row in pairs:
+            change = _pct_change(base["median"], row["median"])
+            # Sub-50ms differences are process-spawn noise, not regressions
+            if change > latency_tolerance and row["median"] - base["median"] > 0.05:
+                regressions.append(
+                    f"startup {label}: {base['median']}s -> {row['median']}s "
+                    f"(+{change:.1f}%)"
+                )
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("baseline", help="Saved baseline JSON")
+    parser.add_argument("current", help="Current run JSON")
+    parser.add_argument(
+        "--latency-tolerance", type=float, default=15.0, help="Allowed % increase"
+    )
+    parser.add_argument(
+        "--throughput-tolerance", type=float, default=10.0, help="Allowed % decrease"
+    )
+    parser.add_argument(
+        "--rss-tolerance", type=float, default=20.0, help="Allowed % increase"
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = compare(
+        baseline,
+        current,
+        args.latency_tolerance,
+        args.throughput_tolerance,
+        args.rss_tolerance,
+    )
+    if regressions:
+        print("Regressions detected:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("No regressions detected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
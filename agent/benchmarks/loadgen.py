@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Replay a question log against an A2A endpoint and report throughput, error
+rate, TTFT and latency percentiles per time window.
+
+Two load models:
+
+- open loop (`--rate`): requests arrive as a Poisson process at the target
+  rate regardless of how fast the server answers, like production traffic
+- closed loop (`--concurrency`): a fixed number of clients, each sending the
+  next question as soon as the previous answer arrives
+
+Without `--url` the benchmark stand-ins and a local A2A server are started,
+so the run is fully offline:
+
+    python -m benchmarks.loadgen --questions questions.txt --rate 5 --duration 60
+    python -m benchmarks.loadgen --url https://agent.example --token $TOKEN \\
+        --concurrency 8 --stream
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+import httpx
+
+from .run import configure_env, percentile, run_a2a_server
+from .serving_paths import DEFAULT_QUESTIONS
+from .stand_ins import StandInConfig, run_stand_ins
+
+
+@dataclass
+class Sample:
+    started_s: float
+    finished_s: float
+    latency_ms: float
+    # Time to the first streamed event; equals latency for send_message
+    ttft_ms: float
+    error: Optional[str] = None
+
+
+def load_questions(path: Optional[str]) -> List[str]:
+    """
+    Read a question log: plain text (one question per line) or JSON Lines with
+    a `question` or `text` field. Repeated questions keep their weight.
+    """
+    if not path:
+        return list(DEFAULT_QUESTIONS)
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                record = json.loads(line)
+                line = record.get("question") or record.get("text") or ""
+            if line:
+                questions.append(line)
+    if not questions:
+        raise ValueError(f"No questions in {path}")
+    return questions
+
+
+def _failed_state(result: Any) -> bool:
+    from a2a.types import TaskState
+
+    status = getattr(result, "status", None)
+    return getattr(status, "state", None) == TaskState.failed
+
+
+class LoadGenerator:
+    def __init__(self, client, stream: bool):
+        self.client = client
+        self.stream = stream
+        self.samples: List[Sample] = []
+        self.in_flight = 0
+        self.t0 = time.perf_counter()
+
+    def _message(self, question: str) -> Dict[str, Any]:
+        return {
+            "message": {
+                "role": "user",
+                "parts": [{"kind": "text", "text": question}],
+                "messageId": uuid4().hex,
+            }
+        }
+
+    async def one(self, question: str) -> None:
+        from a2a.types import (
+            MessageSendParams,
+            SendMessageRequest,
+            SendStreamingMessageRequest,
+        )
+
+        started = time.perf_counter()
+        first_event: Optional[float] = None
+        error = None
+        self.in_flight += 1
+        try:
+            params = MessageSendParams(**self._message(question))
+            if self.stream:
+                request = SendStreamingMessageRequest(id=str(uuid4()), params=params)
+                async for event in self.client.send_message_streaming(request):
+                    if first_event is None:
+                        first_event = time.perf_counter()
+                    if hasattr(event.root, "error"):
+                        error = "rpc_error"
+                    elif _failed_state(event.root.result):
+                        error = "task_failed"
+            else:
+                request = SendMessageRequest(id=str(uuid4()), params=params)
+                response = await self.client.send_message(request)
+                if hasattr(response.root, "error"):
+                    error = "rpc_error"
+                elif _failed_state(response.root.result):
+                    error = "task_failed"
+        except Exception as e:
+            error = type(e).__name__
+        finally:
+            self.in_flight -= 1
+
+        finished = time.perf_counter()
+        latency_ms = (finished - started) * 1000.0
+        self.samples.append(
+            Sample(
+                started_s=started - self.t0,
+                finished_s=finished - self.t0,
+                latency_ms=latency_ms,
+                ttft_ms=(
+                    (first_event - started) * 1000.0 if first_event else latency_ms
+                ),
+                error=error,
+            )
+        )
+
+    async def open_loop(
+        self, questions: Iterator[str], rate: float, duration: float, max_in_flight: int
+    ) -> int:
+        """Poisson arrivals at `rate`/s for `duration` seconds; returns drops."""
+        tasks = set()
+        dropped = 0
+        deadline = self.t0 + duration
+        next_arrival = time.perf_counter()
+        while True:
+            next_arrival += random.expovariate(rate)
+            if next_arrival >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if self.in_flight >= max_in_flight:
+                # The generator itself must not become the bottleneck
+                dropped += 1
+                continue
+            task = asyncio.create_task(self.one(next(questions)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return dropped
+
+    async def closed_loop(
+        self, questions: Iterator[str], concurrency: int, duration: float
+    ) -> None:
+        deadline = self.t0 + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                await self.one(next(questions))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def summarize(samples: List[Sample], duration_s: float) -> Dict[str, Any]:
+    ok = [s for s in samples if s.error is None]
+    latencies = [s.latency_ms for s in ok]
+    ttfts = [s.ttft_ms for s in ok]
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4)
+        if samples
+        else 0.0,
+        "error_kinds": errors,
+        "throughput_rps": round(len(ok) / duration_s, 3) if duration_s else 0.0,
+        "latency_ms": {
+            p: round(percentile(latencies, v), 2)
+            for p, v in (("p50", 50), ("p95", 95), ("p99", 99))
+        },
+        "ttft_ms": {
+            p: round(percentile(ttfts, v), 2)
+            for p, v in (("p50", 50), ("p95", 95), ("p99", 99))
+        },
+    }
+
+
+def windows(samples: List[Sample], window_s: float) -> List[Dict[str, Any]]:
+    """Summaries of the requests that finished in each `window_s` interval."""
+    buckets: Dict[int, List[Sample]] = {}
+    for s in samples:
+        buckets.setdefault(int(s.finished_s // window_s), []).append(s)
+    rows = []
+    for index in sorted(buckets):
+        row = {"start_s": round(index * window_s, 3)}
+        row.update(summarize(buckets[index], window_s))
+        rows.append(row)
+    return rows
+
+
+def _print_row(label: str, row: Dict[str, Any]) -> None:
+    print(
+        f"{label:>8} n={row['requests']:<5} rps={row['throughput_rps']:<8} "
+        f"err={row['error_rate']:<6} "
+        f"p50={row['latency_ms']['p50']:<8} p95={row['latency_ms']['p95']:<8} "
+        f"p99={row['latency_ms']['p99']:<8} ttft_p50={row['ttft_ms']['p50']}"
+    )
+
+
+async def _report_live(generator: LoadGenerator, window_s: float) -> None:
+    index = 0
+    while True:
+        await asyncio.sleep(window_s)
+        done = [
+            s
+            for s in generator.samples
+            if index * window_s <= s.finished_s < (index + 1) * window_s
+        ]
+        _print_row(f"{index * window_s:.0f}s", summarize(done, window_s))
+        index += 1
+
+
+async def run(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    from a2a.client import A2ACardResolver, A2AClient
+
+    questions = load_questions(args.questions)
+    if args.shuffle:
+        random.shuffle(questions)
+    cycle = itertools.cycle(questions)
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(args.timeout), limits=limits
+    ) as httpx_client:
+        if args.token:
+            httpx_client.headers["Authorization"] = f"Bearer {args.token}"
+        card = await A2ACardResolver(
+            httpx_client=httpx_client, base_url=base_url
+        ).get_agent_card()
+        client = A2AClient(httpx_client=httpx_client, agent_card=card)
+
+        generator = LoadGenerator(client, stream=args.stream)
+        reporter = asyncio.create_task(_report_live(generator, args.window))
+        dropped = 0
+        try:
+            if args.rate:
+                dropped = await generator.open_loop(
+                    cycle, args.rate, args.duration, args.max_in_flight
+                )
+            else:
+                await generator.closed_loop(cycle, args.concurrency, args.duration)
+        finally:
+            reporter.cancel()
+        elapsed = time.perf_counter() - generator.t0
+
+    summary = summarize(generator.samples, elapsed)
+    summary["dropped"] = dropped
+    return {
+        "meta": {
+            "url": base_url,
+            "mode": "open" if args.rate else "closed",
+            "rate": args.rate,
+            "concurrency": None if args.rate else args.concurrency,
+            "stream": args.stream,
+            "duration_s": round(elapsed, 3),
+            "questions": len(questions),
+        },
+        "summary": summary,
+        "windows": windows(generator.samples, args.window),
+        "samples": [asdict(s) for s in generator.samples] if args.samples else [],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="A2A load generator")
+    parser.add_argument("--url", help="A2A base URL; default: local stand-ins")
+    parser.add_argument("--token", default=os.getenv("A2A_TOKEN"))
+    parser.add_argument("--questions", help="Question log (text or JSON Lines)")
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--rate", type=float, help="Open loop: arrivals per second")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Closed loop: concurrent clients"
+    )
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--window", type=float, default=5.0, help="Report window, s")
+    parser.add_argument("--stream", action="store_true", help="Use message/stream")
+    parser.add_argument("--timeout", type=float, default=5 * 60.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--samples", action="store_true", help="Keep raw samples")
+    parser.add_argument("--output", "-o", default="benchmarks/results/loadgen.json")
+    parser.add_argument("--mcp-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    with ExitStack() as stack:
+        base_url = args.url
+        if not base_url:
+            stand_ins = stack.enter_context(
+                run_stand_ins(
+                    StandInConfig(
+                        mcp_latency_ms=args.mcp_latency_ms,
+                        llm_latency_ms=args.llm_latency_ms,
+                    )
+                )
+            )
+            base_url, _ = stack.enter_context(run_a2a_server(configure_env(stand_ins)))
+        report = asyncio.run(run(args, base_url))
+
+    _print_row("total", report["summary"])
+    if report["summary"]["dropped"]:
+        print(f"dropped {report['summary']['dropped']} arrivals (max in flight)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
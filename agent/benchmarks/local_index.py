@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Query latency of the local BM25 index on a synthetic corpus.
+
+Documents are drawn from a Zipf-distributed vocabulary, so a few terms
+occur in most documents and most terms in a handful. Queries are timed by
+kind:
+
+- `rare`: terms from the tail of the vocabulary
+- `mixed`: one rare term and two common ones
+- `common`: only terms from the head of the vocabulary
+- `after_add`: a mixed query right after a document is added
+
+    python -m benchmarks.local_index --docs 30000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from .run import percentile
+
+
+def _vocabulary(size: int) -> List[str]:
+    rng = random.Random(1)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+def _timed(fn: Callable[[], Any], runs: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return {
+        "p50": round(percentile(samples, 50), 2),
+        "p95": round(percentile(samples, 95), 2),
+        "max": round(max(samples), 2),
+    }
+
+
+def main() -> int:
+    from assistant.local_index import LocalSearchIndex
+
+    parser = argparse.ArgumentParser(description="Local index query benchmark")
+    parser.add_argument("--docs", type=int, default=30000)
+    parser.add_argument("--doc-tokens", type=int, default=300)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", "-o", default="benchmarks/results/local_index.json")
+    args = parser.parse_args()
+
+    rng = random.Random(2)
+    words = _vocabulary(args.vocabulary)
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    index = LocalSearchIndex()
+    started = time.perf_counter()
+    for i in range(args.docs):
+        text = " ".join(rng.choices(words, weights, k=args.doc_tokens))
+        index.add(f"Doc {i}", f"https://wiki.local/doc/{i}", text)
+    build_s = time.perf_counter() - started
+
+    head, tail = words[:20], words[2000:20000]
+    queries = {
+        "rare": lambda: " ".join(rng.sample(tail, 3)),
+        "mixed": lambda: " ".join([rng.choice(tail)] + rng.sample(head, 2)),
+        "common": lambda: " ".join(rng.sample(head, 3)),
+    }
+    results: Dict[str, Any] = {}
+    for kind, make in queries.items():
+        results[kind] = _timed(lambda: index.search(make()), args.queries)
+
+    def after_add() -> None:
+        index.add("New", "", " ".join(rng.choices(words, weights, k=args.doc_tokens)))
+        index.search(queries["mixed"]())
+
+    results["after_add"] = _timed(after_add, args.queries)
+
+    for kind, row in results.items():
+        print(f"{kind:>10} p50={row['p50']}ms p95={row['p95']}ms max={row['max']}ms")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(
+            {"docs": args.docs, "build_s": round(build_s, 1), "results": results},
+            f,
+            indent=2,
+        )
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Event-loop lag of the retrieval pipeline with multi-megabyte search payloads.
+
+Concurrent `McpKeywordEnhancedRetriever.invoke` calls run against the MCP
+stand-in with large documents and the local index enabled, while a
+heartbeat task measures how late the loop wakes it up. Each variant uses a
+different `Offloader` configuration:
+
+- `inline`: parsing and tokenizing on the event loop
+- `thread`: in a thread pool
+- `process`: tokenizing in a process pool, parsing in the thread pool
+
+`--path` picks how the retriever searches: `pages` (the default) fetches
+one result per page with `search_pages`, `snippet` searches snippets and
+fetches the top documents with `fetch_documents`, and `search` takes all
+results in one `search` call.
+
+    python -m benchmarks.loop_lag --doc-chars 1000000 --requests 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from .run import percentile
+from .stand_ins import StandInConfig, run_stand_ins
+
+VARIANTS = {
+    "inline": {"threads": 0, "processes": 0},
+    "thread": {"threads": 4, "processes": 0},
+    "process": {"threads": 4, "processes": 2},
+}
+
+# Retriever settings for each search path
+PATHS = {
+    "pages": {"page_size": 1},
+    "snippet": {"snippet_mode": True},
+    "search": {},
+}
+
+
+async def _heartbeat(lags: List[float], interval: float) -> None:
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000.0)
+
+
+async def run_variant(
+    mcp_url: str, variant: str, path: str, requests: int, concurrency: int
+) -> Dict[str, Any]:
+    from assistant.local_index import LocalSearchIndex, document_terms
+    from assistant.mcp_client import McpSearchClient
+    from assistant.offload import Offloader
+    from assistant.retrievers import McpKeywordEnhancedRetriever
+
+    offloader = Offloader(min_size=65536, **VARIANTS[variant])
+    # Start the pools before measuring; spawning workers takes a while
+    await offloader.run(document_terms, "", "x" * 65536, size=65536, cpu=True)
+    counter = iter(range(requests))
+
+    async def keywords(question: str) -> str:
+        return question
+
+    retriever = McpKeywordEnhancedRetriever(
+        McpSearchClient(mcp_url, offloader=offloader),
+        keywords,
+        local_index=LocalSearchIndex(),
+        offloader=offloader,
+        **PATHS[path],
+    )
+
+    async def worker() -> None:
+        # Distinct queries: the stand-in's documents change with the query,
+        # so every request parses and re-indexes all of them
+        for i in counter:
+            await retriever.invoke(f"vpn setup {i}")
+
+    lags: List[float] = []
+    heartbeat = asyncio.create_task(_heartbeat(lags, 0.005))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        heartbeat.cancel()
+        offloader.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "variant": variant,
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 3),
+        "lag_ms": {
+            "p50": round(percentile(lags, 50), 2),
+            "p99": round(percentile(lags, 99), 2),
+            "max": round(max(lags, default=0.0), 2),
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Event-loop lag benchmark")
+    parser.add_argument("--doc-chars", type=int, default=1_000_000)
+    parser.add_argument("--results", type=int, default=4, help="Documents per search")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--path", choices=list(PATHS), default="pages")
+    parser.add_argument("--output", "-o", default="benchmarks/results/loop_lag.json")
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        mcp_latency_ms=5.0, mcp_results=args.results, mcp_doc_chars=args.doc_chars
+    )
+    rows = []
+    with run_stand_ins(config) as stand_ins:
+        for variant in args.variants.split(","):
+            row = asyncio.run(
+                run_variant(
+                    f"{stand_ins.mcp_url}/mcp",
+                    variant,
+                    args.path,
+                    args.requests,
+                    args.concurrency,
+                )
+            )
+            rows.append(row)
+            print(
+                f"{variant:>8} rps={row['throughput_rps']:<7} "
+                f"lag p50={row['lag_ms']['p50']}ms p99={row['lag_ms']['p99']}ms "
+                f"max={row['lag_ms']['max']}ms"
+            )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "payload_mb": args.doc_chars * args.results / 1e6,
+                "path": args.path,
+                "results": rows,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
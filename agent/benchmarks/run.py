@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite against local stand-ins and write results to JSON.
+
+Usage (from the `agent` directory):
+
+    python -m benchmarks.run --output benchmarks/results/current.json
+    python -m benchmarks.compare benchmarks/results/baseline.json \
+        benchmarks/results/current.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from .stand_ins import (
+    StandInConfig,
+    StandIns,
+    agent_root,
+    free_port,
+    run_stand_ins,
+    wait_for_port,
+)
+from .startup import measure_startup
+
+
+QUESTION = "Как настроить VPN для удалённой работы?"
+SCENARIOS = ("mcp_client.search", "wiki_assistant.answer", "a2a.send_message")
+# Every request repeats QUESTION and the LLM stand-in returns the same
+# keywords, so with these caches on all but the first request are cache hits
+CACHE_TTLS = ("KEYWORD_CACHE_TTL", "SEARCH_CACHE_TTL", "DOCUMENT_CACHE_TTL")
+# Scenarios measured with caches off and again, as `<scenario>.cached`, on
+CACHED_SCENARIOS = ("wiki_assistant.answer", "a2a.send_message")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Resident set size of `pid` (defaults to this process)."""
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid == os.getpid():
+        import resource
+
+        # ru_maxrss is KiB on Linux and bytes on macOS; this is peak, not current
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+    return 0
+
+
+async def run_level(
+    call: Callable[[], Awaitable[Any]],
+    concurrency: int,
+    total_requests: int,
+) -> Dict[str, Any]:
+    """Drive `call` with `concurrency` workers until `total_requests` are done."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total_requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+    }
+
+
+def configure_env(stand_ins: StandIns, caches: bool = False) -> Dict[str, str]:
+    """
+    Point the assistant at the stand-ins through its usual environment.
+
+    Without `caches` the keyword, search and document caches are disabled, so
+    every request runs keyword extraction, MCP search and document fetches.
+    """
+    env = {
+        "MCP_URL": stand_ins.mcp_url,
+        "LLM_MODEL": "hosted_vllm/fake-model",
+        "LLM_API_BASE": stand_ins.llm_api_base,
+        "LLM_API_KEY": "benchmark",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        "ENABLE_PHOENIX": "false",
+    }
+    for name in CACHE_TTLS:
+        if caches:
+            os.environ.pop(name, None)
+        else:
+            env[name] = "0"
+    os.environ.update(env)
+    return env
+
+
+async def bench_mcp_client(
+    stand_ins: StandIns, levels: List[int], requests: int
+) -> List[Dict[str, Any]]:
+    from assistant.mcp_client import McpSearchClient
+
+    client = McpSearchClient(stand_ins.mcp_url)
+    results = []
+    for level in levels:
+        result = await run_level(lambda: client.search("VPN, setup"), level, requests)
+        result["rss_bytes"] = rss_bytes()
+        results.append(result)
+    await client.close()
+    return results
+
+
+async def bench_wiki_assistant(
+    stand_ins: StandIns, levels: List[int], requests: int
+) -> List[Dict[str, Any]]:
+    from assistant.wiki_assistant import WikiAssistant
+
+    assistant = WikiAssistant(mcp_server_url=stand_ins.mcp_url)
+    # Open connections like the A2A app's startup does, so the first measured
+    # request is not a cold one
+    await assistant.start()
+    results = []
+    for level in levels:
+        result = await run_level(lambda: assistant.answer(QUESTION), level, requests)
+        result["rss_bytes"] = rss_bytes()
+        results.append(result)
+    await assistant.close()
+    return results
+
+
+@contextmanager
+def run_a2a_server(env: Dict[str, str]) -> Iterator[Tuple[str, subprocess.Popen]]:
+    """Start `python -m assistant.start_a2a` on a free port; yield (url, process)."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server_env = dict(os.environ, **env, PORT=str(port), URL_AGENT=base_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "assistant.start_a2a"],
+        cwd=agent_root(),
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port, timeout=60.0)
+        yield base_url, process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def bench_a2a_app(
+    stand_ins: StandIns, env: Dict[str, str], levels: List[int], requests: int
+) -> List[Dict[str, Any]]:
+    import httpx
+    from a2a.client import A2ACardResolver, A2AClient
+    from a2a.types import MessageSendParams, SendMessageRequest
+
+    results = []
+    with run_a2a_server(env) as (base_url, process):
+        limits = httpx.Limits(max_connections=max(levels) * 2)
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(5 * 60.0), limits=limits
+        ) as httpx_client:
+            card = await A2ACardResolver(
+                httpx_client=httpx_client, base_url=base_url
+            ).get_agent_card()
+            client = A2AClient(httpx_client=httpx_client, agent_card=card)
+
+            async def send() -> None:
+                request = SendMessageRequest(
+                    id=str(uuid4()),
+                    params=MessageSendParams(
+                        message={
+                            "role": "user",
+                            "parts": [{"kind": "text", "text": QUESTION}],
+                            "messageId": uuid4().hex,
+                        }
+                    ),
+                )
+                response = await client.send_message(request)
+                if hasattr(response.root, "error"):
+                    raise RuntimeError(str(response.root.error))
+
+            for level in levels:
+                result = await run_level(send, level, requests)
+                result["rss_bytes"] = rss_bytes(process.pid)
+                results.append(result)
+    return results
+
+
+async def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    config = StandInConfig(
+        mcp_latency_ms=args.mcp_latency_ms,
+        mcp_results=args.mcp_results,
+        mcp_doc_chars=args.mcp_doc_chars,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_answer_chars=args.llm_answer_chars,
+    )
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    scenarios = [s for s in args.scenarios.split(",") if s.strip()]
+    cache_modes = [m.strip() == "on" for m in args.caches.split(",") if m.strip()]
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": levels,
+            "requests_per_level": args.requests,
+            "caches": args.caches,
+            "stand_ins": config.__dict__,
+        },
+        "results": [],
+    }
+
+    with run_stand_ins(config) as stand_ins:
+        for caches in cache_modes:
+            env = configure_env(stand_ins, caches)
+            for scenario in scenarios:
+                if caches and scenario not in CACHED_SCENARIOS:
+                    continue
+                if scenario == "mcp_client.search":
+                    rows = await bench_mcp_client(stand_ins, levels, args.requests)
+                elif scenario == "wiki_assistant.answer":
+                    rows = await bench_wiki_assistant(stand_ins, levels, args.requests)
+                elif scenario == "a2a.send_message":
+                    rows = await bench_a2a_app(stand_ins, env, levels, args.requests)
+                else:
+                    raise ValueError(f"Unknown scenario: {scenario}")
+                name = f"{scenario}.cached" if caches else scenario
+                for row in rows:
+                    row["scenario"] = name
+                    report["results"].append(row)
+                    print(
+                        f"{name:<30} c={row['concurrency']:<3} "
+                        f"rps={row['throughput_rps']:<8} "
+                        f"p50={row['latency_ms']['p50']:<8} "
+                        f"p95={row['latency_ms']['p95']:<8} "
+                        f"p99={row['latency_ms']['p99']:<8} "
+                        f"errors={row['errors']}"
+                    )
+
+        if args.startup_repeats > 0:
+            env = configure_env(stand_ins)
+            report["startup"] = measure_startup(env, QUESTION, args.startup_repeats)
+            startup = report["startup"]
+            print(
+                f"{'startup':<30} import={startup['import_s']['assistant']['median']}s "
+                f"import_a2a={startup['import_s']['assistant.start_a2a']['median']}s "
+                f"ready={startup['ready_s']['median']}s "
+                f"first_request={startup['first_request_s']['median']}s"
+            )
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the Wiki assistant benchmarks")
+    parser.add_argument(
+        "--output", "-o", default="benchmarks/results/current.json", help="JSON output"
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument(
+        "--caches",
+        default="off,on",
+        help="Cache modes to run: off (every request searches), on (repo defaults)",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=32, help="Requests per concurrency level"
+    )
+    parser.add_argument(
+        "--startup-repeats",
+        type=int,
+        default=3,
+        help="Cold-start samples (import and first request); 0 to skip",
+    )
+    parser.add_argument("--mcp-latency-ms", type=float, default=50.0)
+    parser.add_argument("--mcp-results", type=int, default=2)
+    parser.add_argument("--mcp-doc-chars", type=int, default=4000)
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--llm-answer-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_suite(args))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Compare the two serving paths on the same stand-ins and question set:
+
+- `adk`: the google-adk `root_agent` from `assistant/agent.py`, where the LLM
+  decides when to call the MCP `search` tool through `McpToolset` over SSE
+- `pipeline`: the fixed keyword -> search -> QA pipeline in `WikiAssistant`
+
+For every question the harness reports LLM round-trips, prompt/completion
+tokens and tool calls (as counted by the stand-ins) and end-to-end latency.
+The pipeline runs with its caches off and a fresh session per question, like
+the ADK agent, so every question pays for its own search:
+
+    python -m benchmarks.serving_paths -o benchmarks/results/serving_paths.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+from uuid import uuid4
+
+import httpx
+
+from .run import configure_env
+from .stand_ins import StandInConfig, StandIns, run_stand_ins
+
+
+DEFAULT_QUESTIONS = [
+    "Как настроить VPN для удалённой работы?",
+    "What is our remote work policy?",
+    "Где найти инструкцию по онбордингу сотрудников?",
+    "How do I configure the Jenkins pipeline?",
+    "Какие есть PaaS сервисы в cloud.ru?",
+]
+
+
+async def _stats(client: httpx.AsyncClient, url: str) -> Dict[str, int]:
+    return (await client.get(f"{url}/stats")).json()
+
+
+async def _reset(client: httpx.AsyncClient, url: str) -> None:
+    await client.post(f"{url}/stats/reset")
+
+
+async def measure(
+    stand_ins: StandIns, ask: Callable[[str], Awaitable[Any]], question: str
+) -> Dict[str, Any]:
+    """Run one question and collect stand-in counters for it."""
+    llm_url = stand_ins.llm_api_base.rsplit("/v1", 1)[0]
+    async with httpx.AsyncClient() as client:
+        await _reset(client, llm_url)
+        await _reset(client, stand_ins.mcp_url)
+        started = time.perf_counter()
+        error = None
+        try:
+            await ask(question)
+        except Exception as e:
+            error = repr(e)
+        latency_ms = (time.perf_counter() - started) * 1000.0
+        llm = await _stats(client, llm_url)
+        mcp = await _stats(client, stand_ins.mcp_url)
+
+    return {
+        "question": question,
+        "latency_ms": round(latency_ms, 2),
+        "llm_round_trips": llm.get("requests", 0),
+        "prompt_tokens": llm.get("prompt_tokens", 0),
+        "completion_tokens": llm.get("completion_tokens", 0),
+        "tool_calls": mcp.get("tool_calls", 0),
+        "error": error,
+    }
+
+
+async def pipeline_asker(stand_ins: StandIns):
+    from assistant.wiki_assistant import WikiAssistant
+
+    assistant = WikiAssistant(mcp_server_url=stand_ins.mcp_url)
+
+    async def ask(question: str) -> str:
+        # A fresh session per question: no follow-up routing, no history
+        return await assistant.answer(question, session_id=uuid4().hex)
+
+    return ask, assistant.close
+
+
+async def adk_asker(stand_ins: StandIns):
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from assistant.prompts import QA_TEMPLATE
+
+    # Give the ADK agent the same answering rules as the pipeline's QA prompt
+    # unless a deployment prompt is configured
+    os.environ.setdefault(
+        "AGENT_SYSTEM_PROMPT", QA_TEMPLATE.split("Based on the following documents")[0]
+    )
+    # agent.py reads comma-separated SSE URLs from MCP_URL
+    os.environ["MCP_URL"] = f"{stand_ins.mcp_url}/sse"
+    try:
+        from assistant import agent
+
+        root_agent = agent.root_agent
+    finally:
+        os.environ["MCP_URL"] = stand_ins.mcp_url
+
+    runner = InMemoryRunner(agent=root_agent, app_name="serving_paths")
+
+    async def ask(question: str) -> str:
+        # A fresh session per question so history does not inflate prompts
+        session = await runner.session_service.create_session(
+            app_name="serving_paths", user_id="bench"
+        )
+        answer = ""
+        async for event in runner.run_async(
+            user_id="bench",
+            session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=question)]),
+        ):
+            if event.is_final_response() and event.content and event.content.parts:
+                answer = "".join(p.text or "" for p in event.content.parts)
+        return answer
+
+    async def close() -> None:
+        for tool in root_agent.tools:
+            closer = getattr(tool, "close", None)
+            if closer is not None:
+                await closer()
+        await runner.close()
+
+    return ask, close
+
+
+def _summary(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in rows if not r["error"]]
+    summary: Dict[str, Any] = {"questions": len(rows), "errors": len(rows) - len(ok)}
+    for key in (
+        "latency_ms",
+        "llm_round_trips",
+        "prompt_tokens",
+        "completion_tokens",
+        "tool_calls",
+    ):
+        values = [r[key] for r in ok]
+        summary[key] = {
+            "mean": round(statistics.mean(values), 2) if values else 0.0,
+            "median": round(statistics.median(values), 2) if values else 0.0,
+            "total": round(sum(values), 2),
+        }
+    return summary
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    config = StandInConfig(
+        mcp_latency_ms=args.mcp_latency_ms,
+        mcp_results=args.mcp_results,
+        mcp_doc_chars=args.mcp_doc_chars,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_answer_chars=args.llm_answer_chars,
+    )
+    report: Dict[str, Any] = {"stand_ins": config.__dict__, "paths": {}}
+
+    with run_stand_ins(config) as stand_ins:
+        configure_env(stand_ins)
+        for path, factory in (("pipeline", pipeline_asker), ("adk", adk_asker)):
+            ask, close = await factory(stand_ins)
+            try:
+                # One unmeasured question pays for lazy imports and connections
+                await ask(questions[0])
+                rows = [await measure(stand_ins, ask, q) for q in questions]
+            finally:
+                await close()
+            report["paths"][path] = {"summary": _summary(rows), "questions": rows}
+
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare the ADK agent and the WikiAssistant pipeline"
+    )
+    parser.add_argument(
+        "--output", "-o", default="benchmarks/results/serving_paths.json"
+    )
+    parser.add_argument("--questions", help="File with one question per line")
+    parser.add_argument("--mcp-latency-ms", type=float, default=50.0)
+    parser.add_argument("--mcp-results", type=int, default=2)
+    parser.add_argument("--mcp-doc-chars", type=int, default=4000)
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--llm-answer-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    print(
+        f"{'path':<10} {'latency_ms':>11} {'llm_calls':>10} "
+        f"{'prompt_tok':>11} {'compl_tok':>10} {'tool_calls':>11} {'errors':>7}"
+    )
+    for path, data in report["paths"].items():
+        s = data["summary"]
+        print(
+            f"{path:<10} {s['latency_ms']['mean']:>11} "
+            f"{s['llm_round_trips']['mean']:>10} "
+            f"{s['prompt_tokens']['mean']:>11} "
+            f"{s['completion_tokens']['mean']:>10} "
+            f"{s['tool_calls']['mean']:>11} {s['errors']:>7}"
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
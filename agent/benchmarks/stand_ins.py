@@ -0,0 +1,371 @@
+"""
+Local stand-ins for the MCP search server and the LLM endpoint.
+
+Both servers run in a single process so that their CPU and memory usage
+do not pollute the measurements of the code under test:
+
+    python -m benchmarks.stand_ins --mcp-port 3901 --llm-port 3902
+
+The fake MCP server exposes the `search` (full and snippet mode) and
+`fetch_document` tools with the same text format as
+`mcp-server/src/mcp.server.ts` over streamable HTTP (`/mcp`) and SSE (`/sse`).
+The fake LLM server implements the subset of the OpenAI
+`/v1/chat/completions` API used by LiteLLM, including tool calls: when the
+request offers tools and no tool result is present yet, it asks for `search`.
+
+Both servers count requests, tokens and tool calls; `GET /stats` returns the
+counters and `POST /stats/reset` clears them.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from collections import Counter
+from typing import Iterator, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+KEYWORD_SYSTEM_PROMPT = "Extract keywords for search"
+KEYWORD_BATCH_SYSTEM_PROMPT = "Extract keywords for search, one entry per question"
+
+
+@dataclass
+class StandInConfig:
+    mcp_latency_ms: float = 50.0
+    mcp_results: int = 2
+    mcp_doc_chars: int = 4000
+    mcp_collections: int = 1
+    llm_latency_ms: float = 100.0
+    llm_answer_chars: int = 400
+
+
+def _stats_routes(stats: Counter) -> list:
+    async def get_stats(request: Request) -> JSONResponse:
+        return JSONResponse(dict(stats))
+
+    async def reset_stats(request: Request) -> JSONResponse:
+        stats.clear()
+        return JSONResponse({})
+
+    return [
+        Route("/stats", get_stats, methods=["GET"]),
+        Route("/stats/reset", reset_stats, methods=["POST"]),
+    ]
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# Fixed, so that fetched documents stay memoized across a benchmark run
+_UPDATED_AT = "2024-01-01T00:00:00.000Z"
+_SNIPPET_CHARS = 200
+
+
+def _document_body(index: int, query: str, size: int) -> str:
+    sentence = f"Document {index} about {query}. "
+    return (sentence * (size // len(sentence) + 1))[:size]
+
+
+def _collection(index: int, query: str, collections: int) -> str:
+    """Collection of a hit: two thirds of a query's hits share one collection."""
+    home = zlib.crc32(query.encode()) % collections
+    return f"col-{home if index % 3 else (home + 1) % collections}"
+
+
+def _make_document(
+    index: int, query: str, size: int, mode: str = "full", collections: int = 1
+) -> str:
+    header = (
+        f"{index}. **Wiki page {index}: {query}**\n"
+        f"   URL: https://wiki.local/doc/{index}\n"
+        f"   ID: doc-{index}:{query}\n"
+        f"   Collection: {_collection(index, query, collections)}\n"
+        f"   Updated: {_UPDATED_AT}\n"
+    )
+    if mode == "snippet":
+        size = min(size, _SNIPPET_CHARS)
+    return (
+        f"{header}"
+        f"   Ranking: {1.0 / index:.3f}\n"
+        f"   Text: {_document_body(index, query, size)}"
+    )
+
+
+def build_mcp_app(config: StandInConfig, stats: Optional[Counter] = None) -> Starlette:
+    """Fake MCP server with a `search` tool served over streamable HTTP and SSE."""
+    from mcp.server.fastmcp import FastMCP
+
+    stats = Counter() if stats is None else stats
+    mcp = FastMCP("fake-search-server", host="127.0.0.1", log_level="WARNING")
+
+    @mcp.tool()
+    async def search(
+        query: str,
+        limit: int = 2,
+        offset: int = 0,
+        mode: str = "full",
+        collectionId: Optional[str] = None,
+    ) -> str:
+        """Search the fake wiki; `mcp_results` hits exist for every query."""
+        stats["tool_calls"] += 1
+        if collectionId is not None:
+            stats["collection_searches"] += 1
+        await asyncio.sleep(config.mcp_latency_ms / 1000.0)
+        collections = config.mcp_collections
+        hits = [
+            index
+            for index in range(1, config.mcp_results + 1)
+            if collectionId is None
+            or _collection(index, query, collections) == collectionId
+        ][offset : offset + limit]
+        if not hits:
+            text = f'No results found for query: "{query}"'
+        else:
+            results = "\n\n".join(
+                _make_document(index, query, config.mcp_doc_chars, mode, collections)
+                for index in hits
+            )
+            text = f'Found {len(hits)} results for "{query}":\n\n{results}'
+        stats["bytes_sent"] += len(text.encode())
+        return text
+
+    @mcp.tool()
+    async def fetch_document(id: str) -> str:
+        """Full text of a document returned by `search` in snippet mode."""
+        stats["tool_calls"] += 1
+        stats["documents_fetched"] += 1
+        await asyncio.sleep(config.mcp_latency_ms / 1000.0)
+        index, _, query = id.removeprefix("doc-").partition(":")
+        text = (
+            f"**Wiki page {index}: {query}**\n"
+            f"   URL: https://wiki.local/doc/{index}\n"
+            f"   ID: {id}\n"
+            f"   Collection: {_collection(int(index), query, config.mcp_collections)}\n"
+            f"   Updated: {_UPDATED_AT}\n"
+            f"   Text: {_document_body(int(index), query, config.mcp_doc_chars)}"
+        )
+        stats["bytes_sent"] += len(text.encode())
+        return text
+
+    # The streamable HTTP app owns the session-manager lifespan; the SSE
+    # routes (used by google-adk's McpToolset) are stateless and can share it.
+    app = mcp.streamable_http_app()
+    app.router.routes.extend(mcp.sse_app().routes)
+    app.router.routes.extend(_stats_routes(stats))
+    return app
+
+
+def build_llm_app(config: StandInConfig, stats: Optional[Counter] = None) -> Starlette:
+    """Fake OpenAI-compatible chat completions endpoint."""
+    stats = Counter() if stats is None else stats
+    answer = ("Plain text answer based on the wiki documents. " * 100)[
+        : config.llm_answer_chars
+    ]
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        messages = body.get("messages") or []
+        prompt = "".join(str(m.get("content") or "") for m in messages)
+        await asyncio.sleep(config.llm_latency_ms / 1000.0)
+
+        system = messages[0].get("content") if messages else ""
+        tools = body.get("tools") or []
+        has_tool_result = any(m.get("role") == "tool" for m in messages)
+        tool_calls = None
+        if system == KEYWORD_SYSTEM_PROMPT:
+            content = "wiki, policy, setup"
+        elif system == KEYWORD_BATCH_SYSTEM_PROMPT:
+            questions = re.findall(r"^(\d+)\. ", messages[-1]["content"], re.M)
+            # The template's own example is numbered too; answer every number
+            content = json.dumps({n: "wiki, policy, setup" for n in questions})
+        elif tools and not has_tool_result:
+            names = [t.get("function", {}).get("name") for t in tools]
+            content = None
+            tool_calls = [
+                {
+                    "id": f"call_{time.monotonic_ns()}",
+                    "type": "function",
+                    "function": {
+                        "name": "search" if "search" in names else names[0],
+                        "arguments": json.dumps({"query": "wiki, policy, setup"}),
+                    },
+                }
+            ]
+        else:
+            content = answer
+
+        prompt_tokens = _approx_tokens(prompt + json.dumps(tools))
+        completion_tokens = _approx_tokens(content or json.dumps(tool_calls))
+        stats["requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+
+        return JSONResponse(
+            {
+                "id": f"chatcmpl-{time.monotonic_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if tool_calls else "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    async def models(request: Request) -> JSONResponse:
+        return JSONResponse({"object": "list", "data": [{"id": "fake-model"}]})
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/chat/completions", chat_completions, methods=["POST"]),
+            Route("/v1/models", models, methods=["GET"]),
+            *_stats_routes(stats),
+        ]
+    )
+
+
+async def serve(config: StandInConfig, mcp_port: int, llm_port: int) -> None:
+    servers = [
+        uvicorn.Server(
+            uvicorn.Config(
+                build_mcp_app(config),
+                host="127.0.0.1",
+                port=mcp_port,
+                log_level="warning",
+            )
+        ),
+        uvicorn.Server(
+            uvicorn.Config(
+                build_llm_app(config),
+                host="127.0.0.1",
+                port=llm_port,
+                log_level="warning",
+            )
+        ),
+    ]
+    await asyncio.gather(*(s.serve() for s in servers))
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError):
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        time.sleep(0.05)
+    raise TimeoutError(f"Port {port} did not open within {timeout}s")
+
+
+@dataclass
+class StandIns:
+    mcp_url: str
+    llm_api_base: str
+    process: subprocess.Popen
+
+
+@contextlib.contextmanager
+def run_stand_ins(config: Optional[StandInConfig] = None) -> Iterator[StandIns]:
+    """Start the stand-ins in a subprocess and stop them on exit."""
+    config = config or StandInConfig()
+    mcp_port, llm_port = free_port(), free_port()
+    cmd = [
+        sys.executable,
+        "-m",
+        "benchmarks.stand_ins",
+        "--mcp-port",
+        str(mcp_port),
+        "--llm-port",
+        str(llm_port),
+        "--mcp-latency-ms",
+        str(config.mcp_latency_ms),
+        "--mcp-results",
+        str(config.mcp_results),
+        "--mcp-doc-chars",
+        str(config.mcp_doc_chars),
+        "--mcp-collections",
+        str(config.mcp_collections),
+        "--llm-latency-ms",
+        str(config.llm_latency_ms),
+        "--llm-answer-chars",
+        str(config.llm_answer_chars),
+    ]
+    process = subprocess.Popen(cmd, cwd=agent_root())
+    try:
+        wait_for_port(mcp_port)
+        wait_for_port(llm_port)
+        yield StandIns(
+            mcp_url=f"http://127.0.0.1:{mcp_port}",
+            llm_api_base=f"http://127.0.0.1:{llm_port}/v1",
+            process=process,
+        )
+    finally:
+        process.terminate()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            process.wait(timeout=10)
+        if process.poll() is None:
+            process.kill()
+
+
+def agent_root() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run fake MCP and LLM servers")
+    parser.add_argument("--mcp-port", type=int, default=3901)
+    parser.add_argument("--llm-port", type=int, default=3902)
+    parser.add_argument("--mcp-latency-ms", type=float, default=50.0)
+    parser.add_argument("--mcp-results", type=int, default=2)
+    parser.add_argument("--mcp-doc-chars", type=int, default=4000)
+    parser.add_argument("--mcp-collections", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--llm-answer-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    config = StandInConfig(
+        mcp_latency_ms=args.mcp_latency_ms,
+        mcp_results=args.mcp_results,
+        mcp_doc_chars=args.mcp_doc_chars,
+        mcp_collections=args.mcp_collections,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_answer_chars=args.llm_answer_chars,
+    )
+    asyncio.run(serve(config, args.mcp_port, args.llm_port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Cold-start measurements for the agent process.
+
+Every sample runs in a fresh interpreter so nothing is shared with the
+benchmark process:
+
+- `import_s`: time to `import <module>` for the package and the A2A entry point
+- `first_request_s`: time from spawning `python -m assistant.start_a2a` until
+  the first A2A `message/send` returns, split into `ready_s` (port open) and
+  the first request itself
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+from uuid import uuid4
+
+from .stand_ins import agent_root, free_port, wait_for_port
+
+
+IMPORT_PROBE = (
+    "import sys, time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def measure_import(module: str, env: Dict[str, str]) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+        cwd=agent_root(),
+        env=env,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_request(env: Dict[str, str], question: str) -> Dict[str, float]:
+    import httpx
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server_env = dict(env, PORT=str(port), URL_AGENT=base_url)
+    payload = {
+        "jsonrpc": "2.0",
+        "id": str(uuid4()),
+        "method": "message/send",
+        "params": {
+            "message": {
+                "role": "user",
+                "parts": [{"kind": "text", "text": question}],
+                "messageId": uuid4().hex,
+            }
+        },
+    }
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "assistant.start_a2a"],
+        cwd=agent_root(),
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port, timeout=60.0)
+        ready = time.perf_counter()
+        response = httpx.post(f"{base_url}/", json=payload, timeout=5 * 60.0)
+        response.raise_for_status()
+        if "error" in response.json():
+            raise RuntimeError(json.dumps(response.json()["error"]))
+        done = time.perf_counter()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        "ready_s": ready - started,
+        "first_request_only_s": done - ready,
+        "first_request_s": done - started,
+    }
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def measure_startup(
+    env: Dict[str, str], question: str, repeats: int = 3
+) -> Dict[str, Any]:
+    """Return cold-start timings (seconds) for imports and the first request."""
+    full_env = dict(os.environ, **env)
+    report: Dict[str, Any] = {"repeats": repeats, "import_s": {}}
+
+    for module in ("assistant", "assistant.start_a2a"):
+        samples = [measure_import(module, full_env) for _ in range(repeats)]
+        report["import_s"][module] = _summary(samples)
+
+    runs = [measure_first_request(full_env, question) for _ in range(repeats)]
+    for key in ("ready_s", "first_request_only_s", "first_request_s"):
+        report[key] = _summary([run[key] for run in runs])
+    return report
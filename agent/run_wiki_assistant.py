@@ -6,11 +6,13 @@ import argparse
 
 from dotenv import load_dotenv
 
+from assistant.logging_utils import configure_logging
 from assistant.wiki_assistant import WikiAssistant
 
 
 async def run_once(question: str) -> int:
     load_dotenv()
+    configure_logging()
 
     # MCP_URL supports comma-separated SSE URLs (env.example)
     mcp_urls = [
@@ -36,6 +38,7 @@ async def run_once(question: str) -> int:
 
 async def run_repl() -> int:
     load_dotenv()
+    configure_logging()
 
     # MCP_URL supports comma-separated SSE URLs (env.example)
     mcp_urls = [
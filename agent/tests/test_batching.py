@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from assistant.batching import KeywordBatcher, parse_batch_keywords
+
+
+def test_parse_fenced_json():
+    content = '```json\n{"1": "vpn, setup", "2": "mail"}\n```'
+    assert parse_batch_keywords(content, 2) == ["vpn, setup", "mail"]
+
+
+def test_parse_list_values():
+    assert parse_batch_keywords('{"1": ["vpn", "setup"]}', 1) == ["vpn, setup"]
+
+
+def test_parse_missing_and_empty_numbers():
+    content = '{"1": "vpn", "3": "  ", "4": 5}'
+    assert parse_batch_keywords(content, 4) == ["vpn", None, None, None]
+
+
+@pytest.mark.parametrize("content", ["", "not json", '["vpn"]'])
+def test_parse_rejects_other_answers(content):
+    with pytest.raises(ValueError):
+        parse_batch_keywords(content, 1)
+
+
+def _batcher(batch_fn, single_calls: list) -> KeywordBatcher:
+    async def single_fn(question: str) -> str:
+        single_calls.append(question)
+        return f"single {question}"
+
+    return KeywordBatcher(single_fn, batch_fn, window=0.01, max_batch=16)
+
+
+def test_questions_missing_from_batch_fall_back_one_by_one():
+    single_calls = []
+
+    async def batch_fn(questions):
+        return [f"batch {q}" if q != "b" else None for q in questions]
+
+    async def run():
+        batcher = _batcher(batch_fn, single_calls)
+        return await asyncio.gather(*(batcher(q) for q in ("a", "b", "c", "a")))
+
+    assert asyncio.run(run()) == ["batch a", "single b", "batch c", "batch a"]
+    assert single_calls == ["b"]
+
+
+def test_failed_batch_falls_back_for_every_question():
+    single_calls = []
+
+    async def batch_fn(questions):
+        raise ValueError("Batch keyword answer is not a JSON object")
+
+    async def run():
+        batcher = _batcher(batch_fn, single_calls)
+        return await asyncio.gather(*(batcher(q) for q in ("a", "b")))
+
+    assert asyncio.run(run()) == ["single a", "single b"]
+    assert sorted(single_calls) == ["a", "b"]
+
+
+def test_cancelled_batch_fails_waiting_callers():
+    async def batch_fn(questions):
+        await asyncio.sleep(10)
+
+    async def run():
+        batcher = _batcher(batch_fn, [])
+        callers = [asyncio.ensure_future(batcher(q)) for q in ("a", "b")]
+        while not batcher._tasks:
+            await asyncio.sleep(0.005)
+        for task in batcher._tasks:
+            task.cancel()
+        return await asyncio.wait_for(
+            asyncio.gather(*callers, return_exceptions=True), 1
+        )
+
+    results = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
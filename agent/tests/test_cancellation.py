@@ -0,0 +1,96 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events import EventQueue
+from a2a.types import Message, MessageSendParams, Part, Role, TaskState, TextPart
+
+from assistant import wiki_assistant
+from assistant.agent_task_manager import MyAgentExecutor
+from assistant.mcp_client import McpSearchClient
+
+
+def _request(text: str) -> RequestContext:
+    message = Message(
+        role=Role.user,
+        parts=[Part(root=TextPart(text=text))],
+        message_id=uuid4().hex,
+    )
+    return RequestContext(request=MessageSendParams(message=message))
+
+
+def test_cancel_stops_downstream_calls(monkeypatch):
+    monkeypatch.setenv("MCP_URL", "http://127.0.0.1:9")
+    monkeypatch.setenv("MAX_CONCURRENT_LLM_CALLS", "1")
+    monkeypatch.setenv("MAX_CONCURRENT_MCP_CALLS", "1")
+
+    llm_calls = []
+    search_calls = []
+
+    async def run() -> None:
+        keyword_started = asyncio.Event()
+        keyword_cancelled = asyncio.Event()
+
+        async def fake_acompletion(**kwargs):
+            system = kwargs["messages"][0]["content"]
+            llm_calls.append(system)
+            keyword_started.set()
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                keyword_cancelled.set()
+                raise
+
+        async def fake_search(self, query):
+            search_calls.append(query)
+            return {"content": []}
+
+        monkeypatch.setattr(wiki_assistant, "acompletion", fake_acompletion)
+        monkeypatch.setattr(McpSearchClient, "search", fake_search)
+
+        executor = MyAgentExecutor()
+        limiter = executor.agent.assistant._llm_limiter
+        queue = EventQueue()
+        running = asyncio.create_task(executor.execute(_request("VPN?"), queue))
+
+        task = await asyncio.wait_for(queue.dequeue_event(), timeout=5)
+        await asyncio.wait_for(keyword_started.wait(), timeout=5)
+        assert limiter.available == 0
+
+        cancel_queue = EventQueue()
+        await executor.cancel(
+            RequestContext(task_id=task.id, context_id=task.context_id, task=task),
+            cancel_queue,
+        )
+
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(running, timeout=5)
+        assert keyword_cancelled.is_set()
+        # Capacity is returned as soon as the cancelled call unwinds
+        assert limiter.available == 1
+        assert limiter.in_flight == 0
+
+        event = await asyncio.wait_for(cancel_queue.dequeue_event(), timeout=5)
+        assert event.status.state == TaskState.canceled
+
+        # Nothing downstream of the cancelled keyword call ever runs
+        await asyncio.sleep(0.05)
+        assert search_calls == []
+        assert llm_calls == ["Extract keywords for search"]
+        assert executor._running_tasks == {}
+
+    asyncio.run(run())
+
+
+def test_cancel_of_unknown_task_reports_canceled():
+    async def run() -> None:
+        executor = MyAgentExecutor()
+        queue = EventQueue()
+        await executor.cancel(
+            RequestContext(task_id="missing", context_id="ctx"), queue
+        )
+        event = await asyncio.wait_for(queue.dequeue_event(), timeout=5)
+        assert event.status.state == TaskState.canceled
+
+    asyncio.run(run())
@@ -0,0 +1,106 @@
+import asyncio
+
+from assistant import credentials
+from assistant.credentials import RefreshingCredentialProvider
+
+
+class FakeFetcher:
+    """Hands out token-1, token-2, ...; each fetch waits for `release` if set."""
+
+    def __init__(self, lifetime: float = 3600.0, release: asyncio.Event = None):
+        self.lifetime = lifetime
+        self.release = release
+        self.calls = 0
+        self.started = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        return f"token-{self.calls}", self.lifetime
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def run():
+        fetch = FakeFetcher(release=asyncio.Event())
+        provider = RefreshingCredentialProvider(fetch)
+        callers = [asyncio.ensure_future(provider.get_token()) for _ in range(10)]
+        await fetch.started.wait()
+        fetch.release.set()
+        tokens = await asyncio.gather(*callers)
+        await provider.close()
+        return fetch.calls, tokens
+
+    calls, tokens = asyncio.run(run())
+    assert calls == 1
+    assert tokens == ["token-1"] * 10
+
+
+def test_cancelled_caller_does_not_abort_the_refresh():
+    async def run():
+        fetch = FakeFetcher(release=asyncio.Event())
+        provider = RefreshingCredentialProvider(fetch)
+        first = asyncio.ensure_future(provider.get_token())
+        await fetch.started.wait()
+        second = asyncio.ensure_future(provider.get_token())
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        fetch.release.set()
+        token = await second
+        await provider.close()
+        return first.cancelled(), token, fetch.calls
+
+    cancelled, token, calls = asyncio.run(run())
+    assert cancelled
+    assert token == "token-1"
+    assert calls == 1
+
+
+def test_short_lived_tokens_do_not_spin(monkeypatch):
+    monkeypatch.setattr(credentials, "MIN_REFRESH_INTERVAL", 0.05)
+
+    async def run():
+        fetch = FakeFetcher(lifetime=0.0)
+        provider = RefreshingCredentialProvider(fetch, refresh_margin=60.0)
+        await provider.get_token()
+        await asyncio.sleep(0.3)
+        await provider.close()
+        return fetch.calls
+
+    # One fetch per MIN_REFRESH_INTERVAL, not one per loop iteration
+    assert 2 <= asyncio.run(run()) <= 8
+
+
+def test_invalidate_refetches_on_next_call():
+    async def run():
+        fetch = FakeFetcher()
+        provider = RefreshingCredentialProvider(fetch)
+        tokens = [await provider.get_token(), await provider.get_token()]
+        provider.invalidate()
+        tokens.append(await provider.get_token())
+        await provider.close()
+        return fetch.calls, tokens
+
+    calls, tokens = asyncio.run(run())
+    assert calls == 2
+    assert tokens == ["token-1", "token-1", "token-2"]
+
+
+def test_close_stops_background_refresh(monkeypatch):
+    monkeypatch.setattr(credentials, "MIN_REFRESH_INTERVAL", 0.01)
+
+    async def run():
+        fetch = FakeFetcher(lifetime=0.0)
+        provider = RefreshingCredentialProvider(fetch)
+        await provider.get_token()
+        background = provider._background
+        await provider.close()
+        calls = fetch.calls
+        await asyncio.sleep(0.1)
+        return background.done(), calls, fetch.calls
+
+    done, calls_at_close, calls_later = asyncio.run(run())
+    assert done
+    assert calls_later == calls_at_close
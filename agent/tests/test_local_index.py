@@ -0,0 +1,143 @@
+import asyncio
+import math
+import random
+
+import pytest
+
+from assistant.local_index import LocalSearchIndex, document_terms, tokenize
+
+WORDS = [f"w{i}" for i in range(300)]
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+
+
+def _text(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, WEIGHTS, k=rng.randint(5, 60)))
+
+
+def _brute_force(terms: dict, query: str, k1=1.2, b=0.75) -> dict:
+    """BM25 score of every matching document ({key: document_terms(...)})."""
+    n = len(terms)
+    avg = sum(length for length, _ in terms.values()) / n
+    scores = {}
+    for token in set(tokenize(query)):
+        df = sum(token in counts for _, counts in terms.values())
+        if not df:
+            continue
+        idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        for key, (length, counts) in terms.items():
+            tf = counts.get(token)
+            if tf:
+                norm = k1 * (1.0 - b + b * length / avg)
+                scores[key] = scores.get(key, 0.0) + idf * (k1 + 1.0) * tf / (tf + norm)
+    return scores
+
+
+def _assert_matches(index: LocalSearchIndex, corpus: dict, queries: list) -> None:
+    # Norms are computed with the exact average length after a compaction
+    index.compact()
+    assert len(index) == len(corpus)
+    terms = {key: document_terms(*doc) for key, doc in corpus.items()}
+    for query in queries:
+        expected = _brute_force(terms, query)
+        hits = index.search(query, 5)
+        # Documents with equal scores may come in any order
+        best = sorted(expected.values(), reverse=True)[:5]
+        assert [hit.score for hit in hits] == pytest.approx(best), query
+        for hit in hits:
+            key = hit.document.key
+            assert hit.score == pytest.approx(expected[key])
+            assert (hit.document.title, hit.document.text) == corpus[key]
+
+
+def _queries(rng: random.Random, count: int = 40) -> list:
+    head, tail = WORDS[:10], WORDS[50:]
+    return [" ".join(rng.sample(tail, 2) + rng.sample(head, 1)) for _ in range(count)]
+
+
+def _fill(index: LocalSearchIndex, rng: random.Random, count: int) -> dict:
+    corpus = {}
+    for i in range(count):
+        key, title, text = f"doc-{i}", f"Page {i}", _text(rng)
+        index.add(title, f"https://wiki.local/{i}", text, key=key)
+        corpus[key] = (title, text)
+    return corpus
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(1)
+    index = LocalSearchIndex()
+    corpus = _fill(index, rng, 400)
+    _assert_matches(index, corpus, _queries(rng))
+
+
+def test_replacing_a_document_under_its_key():
+    index = LocalSearchIndex()
+    index.add("VPN", "https://wiki.local/vpn", "openvpn client setup", key="vpn")
+    index.add("VPN", "https://wiki.local/vpn", "wireguard tunnel setup", key="vpn")
+
+    assert len(index) == 1
+    assert index.search("openvpn") == []
+    (hit,) = index.search("wireguard")
+    assert hit.document.text == "wireguard tunnel setup"
+
+
+def test_discard():
+    rng = random.Random(2)
+    index = LocalSearchIndex()
+    corpus = _fill(index, rng, 100)
+    for key in list(corpus)[::3]:
+        assert index.discard(key)
+        assert not index.discard(key)
+        del corpus[key]
+    assert not index.discard("missing")
+    _assert_matches(index, corpus, _queries(rng))
+
+
+def test_compaction_while_documents_are_added():
+    rng = random.Random(3)
+    index = LocalSearchIndex()
+    corpus = _fill(index, rng, 2000)
+    for key in list(corpus)[:1500]:
+        index.discard(key)
+        del corpus[key]
+    assert index.needs_compaction
+
+    async def compact_concurrently() -> None:
+        rebuild = index.begin_compaction()
+        task = asyncio.ensure_future(asyncio.to_thread(rebuild))
+        i = 0
+        while not task.done() or i < 50:
+            key, text = f"new-{i}", _text(rng)
+            index.add(f"New {i}", "", text, key=key)
+            corpus[key] = (f"New {i}", text)
+            # Replace and discard documents the rebuild may have copied
+            replaced = f"doc-{1500 + i}"
+            text = _text(rng)
+            index.add("Replaced", "", text, key=replaced)
+            corpus[replaced] = ("Replaced", text)
+            index.discard(f"doc-{1999 - i}")
+            corpus.pop(f"doc-{1999 - i}", None)
+            i += 1
+            await asyncio.sleep(0)
+        index.end_compaction(await task)
+
+    asyncio.run(compact_concurrently())
+    assert not index.needs_compaction
+    _assert_matches(index, corpus, _queries(rng))
+
+
+def test_snapshot_round_trip(tmp_path):
+    rng = random.Random(4)
+    index = LocalSearchIndex()
+    corpus = _fill(index, rng, 200)
+    index.discard("doc-7")
+    del corpus["doc-7"]
+    path = str(tmp_path / "index.jsonl")
+
+    assert index.save_snapshot(path) == 199
+    loaded = LocalSearchIndex()
+    assert loaded.load_snapshot(path) == 199
+    assert loaded.contains(
+        *corpus["doc-3"][:1], "https://wiki.local/3", corpus["doc-3"][1], key="doc-3"
+    )
+    _assert_matches(loaded, corpus, _queries(rng))
@@ -0,0 +1,25 @@
+import logging
+
+from assistant import logging_utils
+from assistant.logging_utils import JsonFormatter, SamplingFilter, configure_logging
+
+
+def test_configure_logging_applies_settings_loaded_after_import(monkeypatch):
+    monkeypatch.delenv("LOG_FORMAT", raising=False)
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    logger = logging_utils.get_logger("tests.configure_logging")
+
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    monkeypatch.setenv("LOG_SAMPLE_RATE", "0.25")
+    try:
+        configure_logging()
+        assert logger.level == logging.WARNING
+        assert isinstance(logging_utils._stream_handler.formatter, JsonFormatter)
+        (sampling,) = [
+            f for f in logger.handlers[0].filters if isinstance(f, SamplingFilter)
+        ]
+        assert sampling.rate == 0.25
+    finally:
+        monkeypatch.undo()
+        configure_logging()
@@ -0,0 +1,60 @@
+import pytest
+
+from assistant.router import Route, classify
+
+MAIL = "Как настроить почту на телефоне?"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "а про VPN?",
+        "это про API?",
+        "а про SSO там?",
+        "what about it for VPN?",
+        "а как это сделать в Jira?",
+    ],
+)
+def test_new_terms_start_a_search(message):
+    assert classify(message, MAIL) is Route.WIKI
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "подробнее",
+        "а почему?",
+        "расскажи подробнее про это",
+        "а что насчет шаг 2?",
+        "почту на телефоне подробнее?",
+        "tell me more about it",
+    ],
+)
+def test_follow_ups(message):
+    assert classify(message, MAIL) is Route.FOLLOW_UP
+
+
+def test_follow_up_needs_previous_question():
+    assert classify("подробнее") is Route.WIKI
+
+
+def test_long_message_is_a_new_question():
+    assert (
+        classify("а почему это так и что там с ним делать дальше", MAIL) is Route.WIKI
+    )
+
+
+@pytest.mark.parametrize(
+    "message", ["Привет!", "спасибо большое", "hi there", "ok thanks", "пока"]
+)
+def test_small_talk(message):
+    assert classify(message, MAIL) is Route.SMALL_TALK
+
+
+@pytest.mark.parametrize("message", ["", "   ", "?!"])
+def test_empty(message):
+    assert classify(message) is Route.EMPTY
+
+
+def test_question_with_greeting_is_not_small_talk():
+    assert classify("Привет, как подключить VPN?") is Route.WIKI
@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from assistant import wiki_assistant
+from assistant.mcp_client import McpSearchClient
+
+# Settings that change how many MCP calls a question takes
+SEARCH_ENV = (
+    "SEARCH_MODE",
+    "SEARCH_PAGE_SIZE",
+    "SEARCH_MAX_RESULTS",
+    "FETCH_TOP_K",
+    "CONTEXT_TOKEN_BUDGET",
+    "SEARCH_MIN_RANKING",
+    "LOCAL_INDEX_MODE",
+    "COLLECTION_ROUTING_ENABLED",
+)
+
+
+def _document(index: int, text: str, number: bool = True) -> str:
+    return (
+        f"{f'{index}. ' if number else ''}**Page {index}**\n"
+        f"   URL: https://wiki.local/doc/{index}\n"
+        f"   ID: doc-{index}\n"
+        f"   Updated: 2024-01-01T00:00:00.000Z\n"
+        f"   Ranking: {1.0 / index:.3f}\n"
+        f"   Text: {text}"
+    )
+
+
+class FakeSession:
+    """Answers `search` with snippets and `fetch_document` with a full text."""
+
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        self.calls.append((name, arguments))
+        if name == "search":
+            limit = arguments.get("limit", 10)
+            hits = range(arguments.get("offset", 0) + 1, 11)[:limit]
+            text = "\n\n".join(_document(i, "VPN snippet") for i in hits)
+        else:
+            index = int(arguments["id"].removeprefix("doc-"))
+            text = _document(index, "Full VPN guide. " * 50, number=False)
+        return {"content": [{"type": "text", "text": text}]}
+
+
+def test_default_search_takes_one_page_and_top_k_fetches(monkeypatch):
+    monkeypatch.setenv("MCP_URL", "http://127.0.0.1:9")
+    for name in SEARCH_ENV:
+        monkeypatch.delenv(name, raising=False)
+
+    calls = []
+
+    @asynccontextmanager
+    async def fake_session(self):
+        yield FakeSession(calls)
+
+    async def fake_acompletion(**kwargs):
+        message = {"content": "VPN, setup"}
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(McpSearchClient, "_session", fake_session)
+    monkeypatch.setattr(wiki_assistant, "acompletion", fake_acompletion)
+
+    async def run() -> list:
+        assistant = wiki_assistant.WikiAssistant(mcp_server_url="http://127.0.0.1:9")
+        try:
+            return await assistant._enhanced_retriever.invoke("How do I set up VPN?")
+        finally:
+            await assistant.close()
+
+    documents = asyncio.run(run())
+
+    searches = [arguments for name, arguments in calls if name == "search"]
+    fetches = [arguments["id"] for name, arguments in calls if name == "fetch_document"]
+    # One page with every candidate, then the FETCH_TOP_K best in full
+    assert searches == [{"query": "VPN, setup", "limit": 4, "mode": "snippet"}]
+    assert sorted(fetches) == ["doc-1", "doc-2"]
+    assert len(calls) == 3
+    assert len(documents) == 4
+
+
+def test_search_and_fetch_share_one_deadline():
+    from assistant.retrievers import McpKeywordEnhancedRetriever
+
+    class SlowClient:
+        """Each call takes 0.3s; the fetch only fits a fresh deadline of 0.5s."""
+
+        fetched = False
+
+        async def search(self, query, **kwargs):
+            await asyncio.sleep(0.3)
+            text = "\n\n".join(_document(i, "VPN snippet") for i in (1, 2))
+            return {"content": [{"type": "text", "text": text}]}
+
+        async def fetch_documents(self, ids):
+            await asyncio.sleep(0.3)
+            SlowClient.fetched = True
+            return {}
+
+    async def keywords(question: str) -> str:
+        return "vpn"
+
+    retriever = McpKeywordEnhancedRetriever(
+        SlowClient(), keywords, search_deadline=0.5, snippet_mode=True
+    )
+    documents = asyncio.run(retriever.invoke("How do I set up VPN?"))
+
+    # The fetch was cut off by what the search left of the deadline
+    assert not SlowClient.fetched
+    assert [d.metadata["full_text"] for d in documents] == [False, False]
@@ -0,0 +1,63 @@
+import pytest
+
+from assistant.retrievers import McpKeywordEnhancedRetriever
+from assistant.tiering import EscalationPolicy
+
+REFUSALS = [
+    "В найденных документах нет информации о настройке VPN. Попробуйте "
+    "переформулировать вопрос или обратитесь к администраторам вики.",
+    "I could not find information about VPN in the provided documents.",
+    "Документы не содержат ответа на этот вопрос.",
+]
+PARTIAL_ANSWERS = [
+    "Чтобы настроить VPN, установите клиент OpenVPN и импортируйте профиль "
+    "с портала. Документы не содержат инструкций для macOS.",
+    "To set up mail, open Settings, add an account and enter the server "
+    "mail.corp.local. The documents do not mention mobile clients.",
+]
+
+
+def test_before_skips_small_model_for_large_inputs():
+    policy = EscalationPolicy(max_context_tokens=3000, max_documents=3)
+    assert policy.before(3, 3000) is None
+    assert policy.before(2, 3001) == "context"
+    assert policy.before(4, 100) == "documents"
+    assert (
+        EscalationPolicy(max_context_tokens=0, max_documents=0).before(50, 10**6)
+        is None
+    )
+
+
+@pytest.mark.parametrize("answer", REFUSALS)
+def test_after_escalates_refusals(answer):
+    assert EscalationPolicy().after(answer, documents=2) == "no_answer"
+
+
+@pytest.mark.parametrize("answer", PARTIAL_ANSWERS)
+def test_after_keeps_partial_answers(answer):
+    assert EscalationPolicy().after(answer, documents=2) is None
+
+
+def test_after_refusal_without_documents_is_kept():
+    assert EscalationPolicy().after(REFUSALS[0], documents=0) is None
+    policy = EscalationPolicy(escalate_no_answer=False)
+    assert policy.after(REFUSALS[0], documents=2) is None
+
+
+def test_after_escalates_empty_and_truncated_answers():
+    policy = EscalationPolicy()
+    assert policy.after("  ", documents=1) == "empty"
+    assert policy.after("Partial", documents=1, finish_reason="length") == "truncated"
+    assert policy.after("Done.", documents=1, finish_reason="stop") is None
+
+
+def test_full_text_result_counts_its_documents():
+    text = "\n\n".join(
+        f"{i}. **Page {i}**\n   URL: https://wiki.local/doc/{i}\n   Text: body {i}"
+        for i in range(1, 5)
+    )
+    retriever = McpKeywordEnhancedRetriever(None, None)
+    (document,) = retriever._parse_mcp_response(
+        {"content": [{"type": "text", "text": text}]}
+    )
+    assert document.metadata["results"] == 4
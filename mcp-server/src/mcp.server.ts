@@ -14,16 +14,43 @@ export function createMcpServer() {
         "Search for content using search string. Use it to find information in your wiki through elasticsearch search string. Example query: 'free tier'. Use a comma to search for multiple terms. Example query: 'free tier, AI'",
       inputSchema: {
         query: z.string().min(1, "Search query cannot be empty"),
+        limit: z
+          .number()
+          .int()
+          .min(1)
+          .max(100)
+          .optional()
+          .describe(`Max results per page (default ${SEARCH_LIMIT})`),
+        offset: z
+          .number()
+          .int()
+          .min(0)
+          .optional()
+          .describe("Number of results to skip, for fetching the next page"),
+        mode: z
+          .enum(["full", "snippet"])
+          .optional()
+          .describe(
+            "full: whole document text; snippet: matching excerpt plus document id, use fetch_document for the text",
+          ),
+        collectionId: z
+          .string()
+          .min(1)
+          .optional()
+          .describe("Only search documents of this collection"),
       },
     },
-    async ({ query }) => {
+    async ({ query, limit, offset, mode, collectionId }) => {
       // Search tool called
+      const pageLimit = limit ?? SEARCH_LIMIT;
+      const pageOffset = offset ?? SEARCH_OFFSET;
 
       try {
         const results = await outlineSearchService.search({
           query,
-          limit: SEARCH_LIMIT,
-          offset: SEARCH_OFFSET,
+          limit: pageLimit,
+          offset: pageOffset,
+          ...(collectionId ? { collectionId } : {}),
         });
 
         if (results.length === 0) {
@@ -39,11 +66,17 @@ export function createMcpServer() {
 
         const formattedResults = results
           .map((result, index) => {
-            const title = result.document.title;
-            const url = result.document.url;
-            const text = result.document.text;
+            const { id, title, url, collectionId, updatedAt } =
+              result.document;
+            const position = pageOffset + index + 1;
+
+            if (mode === "snippet") {
+              const snippet = stripHighlight(result.context);
+              return `${position}. **${title}**\n   URL: ${url}\n   ID: ${id}\n   Collection: ${collectionId}\n   Updated: ${updatedAt}\n   Ranking: ${result.ranking}\n   Text: ${snippet}`;
+            }
 
-            return `${index + 1}. **${title}**\n   URL: ${url}\n   Text: ${text}`;
+            const text = result.document.text;
+            return `${position}. **${title}**\n   URL: ${url}\n   ID: ${id}\n   Collection: ${collectionId}\n   Updated: ${updatedAt}\n   Ranking: ${result.ranking}\n   Text: ${text}`;
           })
           .join("\n\n");
 
@@ -69,5 +102,46 @@ export function createMcpServer() {
     }
   );
 
+  mcp.registerTool(
+    "fetch_document",
+    {
+      title: "Fetch document",
+      description:
+        "Fetch the full text of a wiki document by the id returned from search in snippet mode.",
+      inputSchema: {
+        id: z.string().min(1, "Document id cannot be empty"),
+      },
+    },
+    async ({ id }) => {
+      try {
+        const document = await outlineSearchService.fetchDocument(id);
+
+        return {
+          content: [
+            {
+              type: "text",
+              text: `**${document.title}**\n   URL: ${document.url}\n   ID: ${document.id}\n   Collection: ${document.collectionId}\n   Updated: ${document.updatedAt}\n   Text: ${document.text}`,
+            },
+          ],
+        };
+      } catch (error) {
+        return {
+          content: [
+            {
+              type: "text",
+              text: `Fetch failed: ${error instanceof Error ? error.message : "Unknown error"}`,
+            },
+          ],
+          isError: true,
+        };
+      }
+    }
+  );
+
   return mcp;
 }
+
+// Outline marks matched words in search contexts with <b> tags
+function stripHighlight(context: string): string {
+  return context.replace(/<\/?b>/g, "");
+}
@@ -10,23 +10,27 @@ export interface OutlineSearchRequest {
   limit?: number;
   /** Pagination cursor returned by previous call. */
   offset?: number;
+  /** Only search documents of this collection. */
+  collectionId?: string;
+}
+
+export interface OutlineDocument {
+  id: string;
+  title: string;
+  url: string;
+  collectionId: string;
+  text: string;
+  createdAt: string;
+  updatedAt: string;
+  createdBy: {
+    name: string;
+  };
 }
 
 export interface OutlineSearchResult {
   ranking: number;
   context: string;
-  document: {
-    id: string;
-    title: string;
-    url: string;
-    collectionId: string;
-    text: string;
-    createdAt: string;
-    updatedAt: string;
-    createdBy: {
-      name: string;
-    };
-  };
+  document: OutlineDocument;
 }
 
 export interface OutlineSearchResponse {
@@ -42,6 +46,12 @@ export interface OutlineSearchResponse {
   ok: boolean;
 }
 
+export interface OutlineDocumentInfoResponse {
+  data: OutlineDocument;
+  status: number;
+  ok: boolean;
+}
+
 export interface IHttpClient {
   post<T>(url: string, data: unknown): Promise<{ data: T }>;
 }
@@ -93,6 +103,7 @@ export class AxiosHttpClient implements IHttpClient {
 
 export interface ISearchService {
   search(params: OutlineSearchRequest): Promise<OutlineSearchResult[]>;
+  fetchDocument(id: string): Promise<OutlineDocument>;
 }
 
 export class OutlineSearchService implements ISearchService {
@@ -122,6 +133,19 @@ export class OutlineSearchService implements ISearchService {
     }
   }
 
+  async fetchDocument(id: string): Promise<OutlineDocument> {
+    const response = await this.httpClient.post<OutlineDocumentInfoResponse>(
+      "/documents.info",
+      { id },
+    );
+
+    if (!response.data || !response.data.data) {
+      throw new Error("Invalid response structure from Outline API");
+    }
+
+    return response.data.data;
+  }
+
   private handleSearchError(_error: unknown): void {
     // Outline search failed
     // Response data available if needed for debugging
@@ -1,5 +1,11 @@
+import asyncio
+import atexit
+import contextlib
+import hmac
 import logging
+import logging.handlers
 import os
+import queue
 from typing import Any
 from uuid import uuid4
 
@@ -15,13 +21,22 @@ from a2a.types import (
     SendMessageRequest,
 )
 
+from send_queue import SendQueue
+from update_processor import PerChatUpdateProcessor
+
 # Load environment variables
 load_dotenv()
 
-# Configure logging
+# Configure logging: handlers only enqueue records, a background thread writes them
+_log_queue = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+    handlers=[logging.handlers.QueueHandler(_log_queue)],
+    level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
 )
 logger = logging.getLogger(__name__)
 
@@ -30,11 +45,27 @@ class TelegramBot:
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.agent_base_url = os.getenv('AGENT_BASE_URL')
         self.agent_auth_token = os.getenv('AGENT_AUTH_TOKEN')
+        self.mode = os.getenv('BOT_MODE', 'polling').lower()
+        self.concurrent_updates = int(os.getenv('BOT_CONCURRENT_UPDATES', '16'))
+        self.typing_interval = float(os.getenv('TYPING_INTERVAL', '4'))
+        self.send_queue = SendQueue.from_env()
         
         if not all([self.bot_token, self.agent_base_url, self.agent_auth_token]):
             raise ValueError("Missing required environment variables. Please check your .env file.")
+        if self.mode not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE must be either 'polling' or 'webhook'.")
         
-        self.application = Application.builder().token(self.bot_token).build()
+        builder = (
+            Application.builder()
+            .token(self.bot_token)
+            .concurrent_updates(PerChatUpdateProcessor(self.concurrent_updates))
+            # Updates are no longer processed; send the answers still queued
+            .post_stop(self.close_send_queue)
+        )
+        if self.mode == 'webhook':
+            # Updates are pushed to our own ASGI server instead of the built-in Updater
+            builder = builder.updater(None)
+        self.application = builder.build()
         self.setup_handlers()
     
     def setup_handlers(self):
@@ -53,7 +84,7 @@ class TelegramBot:
             "Просто отправь мне сообщение, и я передам его агенту для обработки.\n\n"
             "Используй /help для получения дополнительной информации."
         )
-        await update.message.reply_text(welcome_message)
+        await self.send_queue.reply(update.message, welcome_message)
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
@@ -63,33 +94,63 @@ class TelegramBot:
             "/help - Показать это сообщение\n\n"
             "💬 Просто отправь любое текстовое сообщение, и я передам его AI-агенту для обработки."
         )
-        await update.message.reply_text(help_message)
+        await self.send_queue.reply(update.message, help_message)
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle incoming text messages"""
         user_message = update.message.text
         user_id = update.effective_user.id
         
-        logger.info(f"Received message from user {user_id}: {user_message}")
+        logger.info("Received message from user %s; length=%d", user_id, len(user_message))
+        logger.debug("Message text from user %s: %r", user_id, user_message)
         
-        # Send "typing" indicator
-        await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+        try:
+            # Keep the "typing" indicator alive while the agent works
+            async with self.keep_typing(context.bot, update.effective_chat.id):
+                agent_response = await self.get_agent_response(user_message, update.effective_chat.id)
+            reply = agent_response or "Извините, не удалось получить ответ от агента. Попробуйте еще раз."
+        except Exception as e:
+            logger.error("Error processing message: %s", e)
+            reply = "Произошла ошибка при обработке вашего сообщения. Попробуйте еще раз."
         
+        # Sending goes through the queue, which waits out flood limits, so a
+        # computed answer is not lost to a RetryAfter
         try:
-            # Get response from agent
-            agent_response = await self.get_agent_response(user_message)
-            
-            if agent_response:
-                await update.message.reply_text(agent_response)
-            else:
-                await update.message.reply_text("Извините, не удалось получить ответ от агента. Попробуйте еще раз.")
-                
+            await self.send_queue.reply(update.message, reply)
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            await update.message.reply_text("Произошла ошибка при обработке вашего сообщения. Попробуйте еще раз.")
+            logger.error("Failed to send reply to user %s: %s", user_id, e)
     
-    async def get_agent_response(self, message: str) -> str:
-        """Get response from the AI agent"""
+    @contextlib.asynccontextmanager
+    async def keep_typing(self, bot, chat_id: int):
+        """Send the "typing" chat action until the wrapped block finishes.
+
+        Telegram clears the indicator after about five seconds, so it is
+        re-sent every ``TYPING_INTERVAL`` seconds while the agent call runs.
+        Indicators go through the send queue behind any pending answers.
+        """
+        async def refresh():
+            while True:
+                self.send_queue.typing(bot, chat_id)
+                await asyncio.sleep(self.typing_interval)
+
+        task = asyncio.create_task(refresh())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def close_send_queue(self, application: Application = None) -> None:
+        """Send the replies still queued, then stop the send queue."""
+        await self.send_queue.close()
+
+    async def get_agent_response(self, message: str, chat_id: int) -> str:
+        """Get response from the AI agent
+
+        Messages of one chat share an A2A context, so the agent can answer
+        follow-up questions from the documents it found for the previous one.
+        """
         timeout_config = httpx.Timeout(5 * 60.0)
         
         async with httpx.AsyncClient(timeout=timeout_config) as httpx_client:
@@ -112,6 +173,7 @@ class TelegramBot:
                         "role": "user",
                         "parts": [{"kind": "text", "text": message}],
                         "messageId": uuid4().hex,
+                        "contextId": f"telegram-{chat_id}",
                     },
                 }
                 
@@ -139,17 +201,87 @@ class TelegramBot:
                 return "Не удалось получить ответ от агента."
                 
             except Exception as e:
-                logger.error(f"Error communicating with agent: {e}")
+                logger.error("Error communicating with agent: %s", e)
                 raise
     
 
+    async def run_webhook(self):
+        """Serve Telegram webhooks with a built-in ASGI server (Starlette + uvicorn)"""
+        import uvicorn
+        from starlette.applications import Starlette
+        from starlette.requests import Request
+        from starlette.responses import JSONResponse, PlainTextResponse, Response
+        from starlette.routing import Route
+
+        webhook_url = os.getenv('WEBHOOK_URL')
+        if not webhook_url:
+            raise ValueError("WEBHOOK_URL is required when BOT_MODE=webhook.")
+        webhook_path = os.getenv('WEBHOOK_PATH', '/telegram')
+        webhook_secret = os.getenv('WEBHOOK_SECRET') or None
+        host = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+        port = int(os.getenv('PORT', '8080'))
+
+        async def telegram(request: Request) -> Response:
+            token = request.headers.get('X-Telegram-Bot-Api-Secret-Token') or ''
+            if webhook_secret and not hmac.compare_digest(token.encode(), webhook_secret.encode()):
+                return Response(status_code=403)
+            try:
+                data = await request.json()
+            except ValueError:
+                return Response(status_code=400)
+            if not isinstance(data, dict):
+                return Response(status_code=400)
+            update = Update.de_json(data=data, bot=self.application.bot)
+            await self.application.update_queue.put(update)
+            return Response()
+
+        async def health(_: Request) -> PlainTextResponse:
+            return PlainTextResponse('ok')
+
+        async def send_stats(_: Request) -> JSONResponse:
+            return JSONResponse(self.send_queue.stats())
+
+        starlette_app = Starlette(
+            routes=[
+                Route(webhook_path, telegram, methods=['POST']),
+                Route('/healthcheck', health, methods=['GET']),
+                Route('/metrics', send_stats, methods=['GET']),
+            ]
+        )
+        webserver = uvicorn.Server(
+            config=uvicorn.Config(app=starlette_app, host=host, port=port, use_colors=False)
+        )
+
+        async with self.application:
+            await self.application.bot.set_webhook(
+                url=webhook_url.rstrip('/') + webhook_path,
+                secret_token=webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info("Webhook set; listening on %s:%d%s", host, port, webhook_path)
+            await self.application.start()
+            try:
+                await webserver.serve()
+            finally:
+                await self.application.stop()
+                await self.close_send_queue()
+
+    def run(self):
+        """Run the bot in the configured mode"""
+        logger.info("Starting bot in %s mode; concurrent_updates=%d", self.mode, self.concurrent_updates)
+        if self.mode == 'webhook':
+            asyncio.run(self.run_webhook())
+        else:
+            self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+    
+
 def main():
     """Main function to run the bot"""
     try:
         bot = TelegramBot()
-        bot.application.run_polling()
+        bot.run()
     except Exception as e:
-        logger.error(f"Failed to start bot: {e}")
+        logger.error("Failed to start bot: %s", e)
         raise
 
 if __name__ == "__main__":
@@ -0,0 +1,291 @@
+import asyncio
+import bisect
+import contextlib
+import itertools
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects longer text messages
+MESSAGE_LIMIT = 4096
+
+# Lower value is sent first
+ANSWER = 0
+TYPING = 1
+_PRIORITY_NAMES = {ANSWER: 'answer', TYPING: 'typing'}
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Split ``text`` into messages of at most ``limit`` characters.
+
+    Cuts at the last paragraph break, line break or space in the second half
+    of each chunk, and mid-word only when there is none.
+    """
+    parts = []
+    while len(text) > limit:
+        window = text[:limit]
+        cut = -1
+        for separator in ('\n\n', '\n', ' '):
+            cut = window.rfind(separator, limit // 2)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+def _seconds(retry_after: Any) -> float:
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class _Job:
+    __slots__ = ('chat_id', 'send', 'priority', 'queued', 'future', 'attempts')
+
+    def __init__(self, chat_id: int, send: Callable[[], Awaitable], priority: int):
+        self.chat_id = chat_id
+        self.send = send
+        self.priority = priority
+        self.queued = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.attempts = 0
+
+
+class SendQueue:
+    """Outbound scheduler for everything the bot sends to Telegram.
+
+    Sends are paced to at most ``rate`` per second overall and one message
+    per ``chat_interval`` seconds per private chat (``group_interval`` for
+    groups), which keeps bursts under Telegram's flood limits. When Telegram
+    answers with ``RetryAfter`` anyway, all sending pauses for the requested
+    time and the message is retried (up to ``max_retries`` times) instead of
+    being lost.
+
+    Answers go before typing indicators. A chat has at most one indicator
+    queued, and indicators older than ``typing_max_age`` seconds are dropped
+    since Telegram would already have cleared them. Answers longer than
+    Telegram's limit are split and sent in order.
+
+    Queue latency (from enqueue to send) is logged every
+    ``report_interval`` seconds and returned by ``stats()``.
+    """
+
+    def __init__(
+        self,
+        rate: float = 25.0,
+        chat_interval: float = 1.0,
+        group_interval: float = 3.0,
+        max_retries: int = 3,
+        typing_max_age: float = 4.0,
+        report_interval: float = 60.0,
+    ):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self.typing_max_age = typing_max_age
+        self.report_interval = report_interval
+        # (priority, sequence, job), kept sorted
+        self._pending: List[Tuple[int, int, _Job]] = []
+        self._sequence = itertools.count()
+        self._typing_chats: Set[int] = set()
+        self._busy_chats: Set[int] = set()
+        self._chat_ready: Dict[int, float] = {}
+        self._next_send = 0.0
+        self._sending: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+        self._latencies: Dict[int, Deque[float]] = {p: deque(maxlen=1000) for p in _PRIORITY_NAMES}
+        self._counts: Dict[str, int] = dict.fromkeys(
+            ('sent', 'retried', 'failed', 'typing_dropped'), 0
+        )
+        self._next_report = time.monotonic() + report_interval
+
+    @classmethod
+    def from_env(cls) -> 'SendQueue':
+        return cls(
+            rate=float(os.getenv('SEND_RATE', '25')),
+            chat_interval=float(os.getenv('SEND_CHAT_INTERVAL', '1')),
+            group_interval=float(os.getenv('SEND_GROUP_INTERVAL', '3')),
+            max_retries=int(os.getenv('SEND_MAX_RETRIES', '3')),
+            report_interval=float(os.getenv('SEND_REPORT_INTERVAL', '60')),
+        )
+
+    async def reply(self, message, text: str) -> list:
+        """Reply to ``message`` with ``text``, split as needed; returns the sent messages.
+
+        Raises the error of the first part that could not be sent.
+        """
+        futures = [
+            self.submit(message.chat_id, lambda part=part: message.reply_text(part), ANSWER)
+            for part in split_text(text)
+        ]
+        return list(await asyncio.gather(*futures))
+
+    def typing(self, bot, chat_id: int) -> None:
+        """Queue a "typing" indicator for ``chat_id`` unless one is already queued."""
+        if chat_id in self._typing_chats:
+            return
+        self._typing_chats.add(chat_id)
+        future = self.submit(
+            chat_id, lambda: bot.send_chat_action(chat_id=chat_id, action='typing'), TYPING
+        )
+        future.add_done_callback(lambda f: self._typing_done(chat_id, f))
+
+    def submit(self, chat_id: int, send: Callable[[], Awaitable], priority: int) -> asyncio.Future:
+        """Queue one API call; the future resolves with its result once sent."""
+        job = _Job(chat_id, send, priority)
+        bisect.insort(self._pending, (priority, next(self._sequence), job), key=lambda e: e[:2])
+        if self._worker is None or self._worker.done():
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return job.future
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Send what is queued (for up to ``timeout`` seconds), then stop."""
+        deadline = time.monotonic() + timeout
+        while (self._pending or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._worker is not None:
+            # The worker checks the flag on every pass; cancelling it is the
+            # last resort, as a cancellation can be lost in its wait
+            self._closing = True
+            self._wakeup.set()
+            _, running = await asyncio.wait({self._worker}, timeout=1.0)
+            if running:
+                self._worker.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self._worker
+        for _, _, job in self._pending:
+            if not job.future.done():
+                job.future.cancel()
+        self._pending.clear()
+        self._report()
+
+    def stats(self) -> Dict[str, Any]:
+        """Send counters and queue latency percentiles (ms) per priority."""
+        stats: Dict[str, Any] = dict(self._counts, queued=len(self._pending))
+        for priority, name in _PRIORITY_NAMES.items():
+            latencies = sorted(self._latencies[priority])
+            if latencies:
+                stats[f'{name}_latency_ms'] = {
+                    'p50': round(statistics.median(latencies) * 1000, 1),
+                    'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                    'max': round(latencies[-1] * 1000, 1),
+                }
+        return stats
+
+    def _typing_done(self, chat_id: int, future: asyncio.Future) -> None:
+        self._typing_chats.discard(chat_id)
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning('Failed to send typing indicator: %s', future.exception())
+
+    def _interval(self, chat_id: int) -> float:
+        # Group and channel ids are negative
+        return self.group_interval if chat_id < 0 else self.chat_interval
+
+    def _next_job(self, now: float) -> Tuple[Optional[_Job], Optional[float]]:
+        """The next job that may be sent now, or how long to wait for one."""
+        if now < self._next_send:
+            return None, self._next_send - now
+        wait = None
+        index = 0
+        while index < len(self._pending):
+            job = self._pending[index][2]
+            if job.priority == TYPING and now - job.queued > self.typing_max_age:
+                del self._pending[index]
+                self._counts['typing_dropped'] += 1
+                job.future.cancel()
+                continue
+            if job.priority == ANSWER and job.chat_id in self._busy_chats:
+                # The previous message to this chat is still being sent
+                index += 1
+                continue
+            # Indicators are not messages; only the global rate applies to them
+            ready = 0.0 if job.priority == TYPING else self._chat_ready.get(job.chat_id, 0.0)
+            if ready <= now:
+                del self._pending[index]
+                return job, None
+            wait = ready - now if wait is None else min(wait, ready - now)
+            index += 1
+        return None, wait
+
+    async def _run(self) -> None:
+        while not self._closing:
+            now = time.monotonic()
+            if now >= self._next_report:
+                self._report()
+            job, wait = self._next_job(now)
+            if job is None:
+                if not self._pending:
+                    # Forget chats whose interval has passed
+                    self._chat_ready = {c: t for c, t in self._chat_ready.items() if t > now}
+                self._wakeup.clear()
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(wait):
+                        await self._wakeup.wait()
+                continue
+
+            self._next_send = now + 1.0 / self.rate
+            if job.priority == ANSWER:
+                self._busy_chats.add(job.chat_id)
+                self._chat_ready[job.chat_id] = now + self._interval(job.chat_id)
+            task = asyncio.create_task(self._send(job))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, job: _Job) -> None:
+        started = time.monotonic()
+        try:
+            result = await job.send()
+        except RetryAfter as e:
+            delay = _seconds(e.retry_after)
+            self._next_send = max(self._next_send, time.monotonic() + delay)
+            if job.priority == TYPING or job.attempts >= self.max_retries:
+                logger.warning('Flood limit hit; giving up on %s for chat %s', _PRIORITY_NAMES[job.priority], job.chat_id)
+                self._counts['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                return
+            logger.warning('Flood limit hit; pausing sends for %.1fs', delay)
+            job.attempts += 1
+            self._counts['retried'] += 1
+            # The job keeps its place: before later parts of the same answer
+            bisect.insort(self._pending, (job.priority, -1 - job.attempts, job), key=lambda e: e[:2])
+            self._wakeup.set()
+            return
+        except Exception as e:
+            self._counts['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        finally:
+            if job.priority == ANSWER:
+                self._busy_chats.discard(job.chat_id)
+                self._wakeup.set()
+
+        self._counts['sent'] += 1
+        self._latencies[job.priority].append(started - job.queued)
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _report(self) -> None:
+        self._next_report = time.monotonic() + self.report_interval
+        if self._counts['sent'] or self._pending:
+            logger.info('Send queue: %s', self.stats())
@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+from send_queue import SendQueue
+
+
+def _message(chat_id: int, sent: list) -> SimpleNamespace:
+    async def reply_text(text):
+        sent.append(text)
+        return text
+
+    return SimpleNamespace(chat_id=chat_id, reply_text=reply_text)
+
+
+def test_close_after_send_stops_worker():
+    sent = []
+
+    async def run() -> None:
+        # A slow rate keeps the worker in a timed wait after the send
+        queue = SendQueue(rate=1.0)
+        assert await queue.reply(_message(1, sent), 'hello') == ['hello']
+        await asyncio.sleep(0.05)
+        # The worker's wait finishes just as close() stops it; a cancellation
+        # arriving then is swallowed by asyncio.wait_for on Python 3.11
+        queue._wakeup.set()
+        closing = asyncio.ensure_future(queue.close())
+        done, _ = await asyncio.wait({closing}, timeout=3)
+        assert closing in done
+        assert queue._worker.done()
+
+    asyncio.run(run())
+    assert sent == ['hello']
+
+
+def test_close_sends_queued_answers_in_order():
+    sent = []
+
+    async def run() -> None:
+        queue = SendQueue(chat_interval=0.01)
+        message = _message(1, sent)
+        replies = [asyncio.ensure_future(queue.reply(message, text)) for text in ('one', 'two')]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(queue.close(), 5)
+        assert all(reply.done() for reply in replies)
+
+    asyncio.run(run())
+    assert sent == ['one', 'two']
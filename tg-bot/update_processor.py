@@ -0,0 +1,55 @@
+import asyncio
+from typing import Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently while keeping per-chat ordering.
+
+    Up to ``max_concurrent_updates`` updates run at the same time, but updates
+    from the same chat are handled strictly one after another in arrival order.
+    A queued update waits on its chat lock *before* taking a global slot, so a
+    user sending several messages in a row cannot starve other chats.
+    """
+
+    __slots__ = ('_chat_locks', '_chat_waiters')
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_waiters: Dict[int, int] = {}
+
+    @staticmethod
+    def _chat_id(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    async def process_update(self, update: object, coroutine: Awaitable) -> None:
+        chat_id = self._chat_id(update)
+        if chat_id is None:
+            await super().process_update(update, coroutine)
+            return
+
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_waiters[chat_id] = self._chat_waiters.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._chat_waiters[chat_id] -= 1
+            if not self._chat_waiters[chat_id]:
+                # Drop idle chats so the maps do not grow with the user base
+                del self._chat_waiters[chat_id]
+                del self._chat_locks[chat_id]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass